@@ -0,0 +1,115 @@
+"""
+Module contains batched rRAPTOR implementation (profile queries on the dense-index network).
+"""
+from RAPTOR.raptor_functions import *
+
+
+def batched_rraptor(SOURCE: int, DESTINATION: int, departures_by_stop: dict, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
+                    CHANGE_TIME_SEC: int, PRINT_ITINERARY: int, OPTIMIZED: int, dense_network: dict, footpath_dict: dict,
+                    BATCH_SIZE: int = 32, window_start=None, window_end=None, MAX_DURATION=None) -> list:
+    '''
+    Batched rRaptor implementation. Departure times are processed in blocks of BATCH_SIZE, latest first. The labels of a
+    block are kept as (departures x stops) arrays so that every route scan updates all departures of the block at once,
+    and domination between consecutive departures is applied as a vector operation after every round.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION (int): stop id of destination stop.
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        OPTIMIZED (int): 1 or 0. 1 means collect trips and 0 means collect routes.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        BATCH_SIZE (int): number of departure times processed together.
+        window_start (pandas.datetime): optional. Earliest departure time to be considered.
+        window_end (pandas.datetime): optional. Latest departure time to be considered.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than the departure time + MAX_DURATION are not set.
+
+    Returns:
+        if OPTIMIZED==1:
+            out (list):  list of trips required to cover all optimal journeys Format: [trip_id]
+        elif OPTIMIZED==0:
+            out (list):  list of routes required to cover all optimal journeys. Format: [route_id]
+
+    Examples:
+        >>> output = batched_rraptor(36, 52, departures_by_stop, 4, 1, 0, 1, 0, dense_network, footpath_dict, 32)
+        >>> print(output)
+
+    See Also:
+        rRAPTOR
+    '''
+    out = []
+    d_time_list, edge_time = get_departures(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, window_start, window_end)
+    change_time = CHANGE_TIME_SEC * 10 ** 9
+    source, destination = dense_network["stop_index"][SOURCE], dense_network["stop_index"][DESTINATION]
+    walk_time = {dense_network["stop_index"][to_stop]: to_pdash_time.value for to_stop, to_pdash_time in footpath_dict.get(SOURCE, [])
+                 if to_stop in dense_network["stop_index"]}
+    # Boarding stops of every departure time (as in rRAPTOR). Format {departure time: set of dense stop indices}
+    seeds_by_time = {}
+    for start_tid, d_time, s_idx in d_time_list:
+        r_idx = np.searchsorted(dense_network["route_ids"], int(start_tid.split("_")[0]))
+        seeds_by_time.setdefault(d_time.value, set()).add(int(dense_network["route_stops"][r_idx][s_idx]))
+    d_times = sorted(seeds_by_time.keys(), reverse=True)
+    if edge_time is not None:
+        d_times.insert(0, edge_time.value)  # Window edge. Only seeds the labels.
+        seeds_by_time[edge_time.value] = None
+    _, carry_label, carry_star, carry_pi, inf_time = initialize_dense_raptor(dense_network, MAX_TRANSFER)
+    carry = {"label": carry_label, "star_label": carry_star, "pi_label": carry_pi}
+
+    for block_start in range(0, len(d_times), BATCH_SIZE):
+        block = np.array(d_times[block_start: block_start + BATCH_SIZE], dtype=np.int64)
+        destinations = np.full(len(block), destination)
+        marked, label, star_label, pi_label, _ = initialize_dense_raptor(dense_network, MAX_TRANSFER, len(block))
+        if MAX_DURATION is not None:
+            star_label[:, destination] = np.minimum(star_label[:, destination], block + MAX_DURATION * 10 ** 9)  # Travel-duration budget
+        for row, d_time in enumerate(block.tolist()):
+            if seeds_by_time[d_time] is None:
+                # Any trip departing after the window edge can be boarded from SOURCE (or its walkable stops).
+                for stop in [source, *walk_time.keys()]:
+                    label[0, row, stop], star_label[row, stop] = d_time - change_time, d_time - change_time
+                    marked[row, stop] = True
+                continue
+            # Every departure seeds its boarding stop. A walkable stop is reached from SOURCE just in time (d_time - change_time).
+            for stop in seeds_by_time[d_time]:
+                if stop == source:
+                    label[0, row, stop], star_label[row, stop] = d_time, d_time
+                else:
+                    label[0, row, stop], star_label[row, stop] = d_time - change_time, d_time - change_time
+                    pi_label["mode"][0, row, stop], pi_label["from_stop"][0, row, stop], pi_label["time"][0, row, stop] = 2, source, walk_time[stop]
+                marked[row, stop] = True
+        apply_departure_domination(0, label, star_label, pi_label, marked, carry)
+        for k in range(1, MAX_TRANSFER + 1):
+            # Main code part 1
+            Q = collect_routes_dense(marked.any(axis=0), dense_network, 1)
+            marked[:] = False
+            # Main code part 2
+            scan_routes_batch(k, Q, label, star_label, pi_label, marked, destinations, change_time, dense_network)
+            # Main code part 3
+            relax_footpaths_batch(k, label, star_label, pi_label, marked, destinations, dense_network)
+            apply_departure_domination(k, label, star_label, pi_label, marked, carry)
+            # Main code End
+            if not marked.any():
+                for n in range(k + 1, MAX_TRANSFER + 1):
+                    apply_departure_domination(n, label, star_label, pi_label, marked, carry)
+                break
+        later_best = np.concatenate(([carry["star_label"][destination]], star_label[:-1, destination]))
+        carry = {"label": label[:, -1].copy(), "star_label": star_label[-1].copy(), "pi_label": {key: value[:, -1].copy() for key, value in pi_label.items()}}
+
+        # A departure only reports arrivals strictly better than all later departures and its own earlier rounds.
+        for row, d_time in enumerate(block.tolist()):
+            best_arrival = later_best[row]
+            for k in range(MAX_TRANSFER + 1):
+                if pi_label["mode"][k, row, destination] != 0 and label[k, row, destination] < best_arrival:
+                    best_arrival = label[k, row, destination]
+                else:
+                    pi_label["mode"][k, row, destination] = 0
+            if edge_time is not None and d_time == edge_time.value:
+                continue
+            pi_label_dict, label_dict = get_pi_label_dense(destination, label[:, row], {key: value[:, row] for key, value in pi_label.items()}, dense_network)
+            if PRINT_ITINERARY == 1:
+                print(f"SOURCE, DESTINATION, d_time: {SOURCE, DESTINATION, pd.Timestamp(d_time)}")
+            out.extend(post_processing_rraptor(DESTINATION, pi_label_dict, PRINT_ITINERARY, label_dict, OPTIMIZED))
+    return out
@@ -6,7 +6,7 @@ from RAPTOR.raptor_functions import *
 
 def hypraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int,
               PRINT_ITINERARY: int, stop_out: dict, route_groups: dict, routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict,
-              footpath_dict: dict, idx_by_route_stop_dict: dict) -> list:
+              footpath_dict: dict, idx_by_route_stop_dict: dict, MAX_DURATION=None, lower_bound=None) -> list:
     """
     Standard HypRaptor implementation
 
@@ -19,12 +19,15 @@ def hypraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_
         CHANGE_TIME_SEC (int): change-time in seconds.
         PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
         stop_out (dict): key: stop-id (int), value: stop-cell id of key (int). Note: stop-cell id=-1 denotes cut stop.
-        route_groups (dict): key: tuple of all possible combinations of stop cell id, value: set of route ids belonging to the stop cell combination.
+        route_groups (dict): bitsets of the routes in every partition (see build_partition_masks).
         routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
         stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
+        lower_bound (dict): optional. Lower bounds on travel time to DESTINATION (see get_lower_bounds). Labels that cannot
+        improve the arrival at DESTINATION even with these bounds are pruned.
 
     Returns:
         out (list): list of pareto-optimal arrival Timestamps.
@@ -37,11 +40,13 @@ def hypraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_
     """
     out = []
     # Initialization
-    reduced_routes = route_groups[tuple(sorted((stop_out[SOURCE], stop_out[DESTINATION])))]
+    reduced_routes = get_partition_mask(route_groups, stop_out[SOURCE], stop_out[DESTINATION])  # Indexed by route id
 
     marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
     change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
     (label[0][SOURCE], star_label[SOURCE]) = (D_TIME, D_TIME)
+    if MAX_DURATION is not None:
+        star_label[DESTINATION] = min(star_label[DESTINATION], D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
     Q = {}
     if WALKING_FROM_SOURCE == 1:
         try:
@@ -67,7 +72,7 @@ def hypraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_
             try:
                 routes_serving_p = routes_by_stop_dict[p]
                 for route in routes_serving_p:
-                    if route not in reduced_routes:
+                    if not reduced_routes[route]:
                         continue
                     stp_idx = idx_by_route_stop_dict[(route, p)]
                     if route in Q.keys() and Q[route] != stp_idx:
@@ -80,7 +85,8 @@ def hypraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_
         for route, current_stopindex_by_route in Q.items():
             current_trip_t = -1
             for p_i in stops_dict[route][current_stopindex_by_route:]:
-                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], star_label[DESTINATION]):
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], star_label[DESTINATION]) \
+                        and (lower_bound is None or (p_i in lower_bound and current_trip_t[current_stopindex_by_route][1] + lower_bound[p_i] < star_label[DESTINATION])):
                     arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
                     label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
                     pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
@@ -104,7 +110,8 @@ def hypraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_
                 for i in trans_info:
                     (p_dash, to_pdash_time) = i
                     new_p_dash_time = label[k][p] + to_pdash_time
-                    if (label[k][p_dash] > new_p_dash_time) and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]):
+                    if (label[k][p_dash] > new_p_dash_time) and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]) \
+                            and (lower_bound is None or (p_dash in lower_bound and new_p_dash_time + lower_bound[p_dash] < star_label[DESTINATION])):
                         label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
                         pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
                         if marked_stop_dict[p_dash] == 0:
@@ -47,11 +47,12 @@ class Journey:
 
         else:
             self.journey_start_time = self._get_pseudo_start_time(journey)
-        self.journey_seq = []
+        self.journey_seq = self._build_legs(journey, self.journey_start_time)
 
-        start_time = self.journey_start_time
-
-        for leg in journey:
+    @staticmethod
+    def _build_legs(journey_list, start_time) -> list:
+        legs = []
+        for leg in journey_list:
             if leg[0] == 'walking':
                 mode = 'walk'
                 duration = leg[3].total_seconds()
@@ -63,7 +64,7 @@ class Journey:
                     mode, start_time, end_time,
                     duration, start_id, stop_id
                 )
-                self.journey_seq.append(thisLeg)
+                legs.append(thisLeg)
                 start_time = end_time
 
             else:
@@ -79,9 +80,11 @@ class Journey:
                     mode, start_time, end_time,
                     duration, start_id, stop_id, trip_id
                 )
-                self.journey_seq.append(thisLeg)
+                legs.append(thisLeg)
                 start_time = end_time
 
+        return legs
+
     def _get_pseudo_start_time(self, journey_list):
         first_leg = journey_list[0]
 
@@ -202,3 +205,166 @@ class Leg:
                               trip_id=self.trip_id
                           )
         return return_val
+
+
+class LazyJourney(Journey):
+    """
+    Journey whose pointer labels are backtracked from pi_label, and whose
+    legs are built, only when they are accessed. Travel times are computed
+    directly from the pointer labels without building the legs.
+
+    Attributes
+    ----------
+    transfers (int): the number of transfers in the journey.
+    journey (list): sequence of `pointer_labels' (backtracked on access).
+    journey_seq (list[Legs]): list of steps in the journey (built on access).
+    """
+
+    def __init__(self, transfers: int, k: int, DESTINATION: int,
+                 pi_label: dict, D_TIME=None):
+        """
+        Parameters
+        ----------
+        transfers (int): the number of transfers.
+        k (int): round in which DESTINATION is reached.
+        DESTINATION (int): stop id of destination stop.
+        pi_label (dict): Nested dict used for backtracking.
+                         Format- {round : {stop_id: pointer_label}}
+        D_TIME (datetime.datetime): starting time of the journey(optional)
+        """
+        self.transfers = transfers
+        self._round = k
+        self._destination = DESTINATION
+        self._pi_label = pi_label
+        self._D_TIME = D_TIME
+        self._journey = None
+        self._journey_seq = None
+
+    @property
+    def journey(self) -> list:
+        if self._journey is None:
+            journey = []
+            k, stop = self._round, self._destination
+            while self._pi_label[k][stop] != -1:
+                journey.append(self._pi_label[k][stop])
+                if self._pi_label[k][stop][0] != 'walking':
+                    stop = self._pi_label[k][stop][1]
+                    k = k - 1
+                else:
+                    stop = self._pi_label[k][stop][1]
+            journey.reverse()
+            self._journey = journey
+        return self._journey
+
+    @property
+    def journey_seq(self) -> list:
+        if self._journey_seq is None:
+            self._journey_seq = self._build_legs(self.journey,
+                                                 self.journey_start_time)
+        return self._journey_seq
+
+    @property
+    def journey_start_time(self):
+        if self._D_TIME is not None:
+            return self._D_TIME.to_pydatetime()
+        return self._get_pseudo_start_time(self.journey)
+
+    def __getstate__(self):
+        # Pickling does not backtrack. Once the pointer labels are
+        # backtracked, pi_label (one label per stop and round) is dropped.
+        state = self.__dict__.copy()
+        if self._journey is not None:
+            state['_pi_label'] = None
+        return state
+
+    def get_walk_time(self) -> float:
+        """
+        returns total walking time in seconds.
+        """
+        tt = 0
+        for leg in self.journey:
+            if leg[0] == 'walking':
+                tt += leg[3].total_seconds()
+
+        return round(tt, 2)
+
+    def get_wait_time(self) -> float:
+        """
+        returns total wait time in seconds.
+        """
+        wt = 0
+        if self._D_TIME is not None:
+            prev_end_time = self._D_TIME
+        else:
+            prev_end_time = self._get_pseudo_start_time(self.journey)
+        for leg in self.journey:
+            if leg[0] == 'walking':
+                prev_end_time = leg[4]
+            else:
+                wt += (leg[0] - prev_end_time).total_seconds()
+                prev_end_time = leg[3]
+
+        return round(wt, 2)
+
+    def get_ivtt(self) -> float:
+        """
+        returns inside vehicle travel time in seconds.
+        """
+        tt = 0
+        for leg in self.journey:
+            if leg[0] != 'walking':
+                tt += (leg[3] - leg[0]).total_seconds()
+
+        return round(tt, 2)
+
+
+class RaptorOutput:
+    """
+    Lightweight output of post_processing_dhanus. Supports the keys of the
+    old output dict (`old', `tt', `journeys'). Journeys are LazyJourney
+    objects, so nothing is backtracked until it is accessed. Reading `tt'
+    or `trip_set' backtracks every journey.
+
+    Attributes
+    ----------
+    old (list): pareto-optimal arrival timestamps.
+    journeys (list[LazyJourney]): pareto-optimal journeys.
+    tt (list): travel time information. Format [(num_transfers, travel_time_dict)]
+    trip_set (list): trip ids required to cover the pareto-optimal journeys.
+    """
+
+    def __init__(self, rounds_inwhich_desti_reached: list, DESTINATION: int,
+                 pi_label: dict, label: dict):
+        """
+        Parameters
+        ----------
+        rounds_inwhich_desti_reached (list): rounds in which DESTINATION is reached.
+        DESTINATION (int): stop id of destination stop.
+        pi_label (dict): Nested dict used for backtracking.
+                         Format- {round : {stop_id: pointer_label}}
+        label (dict): nested dict to maintain label.
+                      Format {round : {stop_id: pandas.datetime}}.
+        """
+        self.old = [label[k][DESTINATION]
+                    for k in rounds_inwhich_desti_reached]
+        self.journeys = [LazyJourney(k - 1, k, DESTINATION, pi_label)
+                         for k in rounds_inwhich_desti_reached]
+
+    @property
+    def tt(self) -> list:
+        return [(journey.transfers,
+                 {'walk_time': journey.get_walk_time(),
+                  'wait_time': journey.get_wait_time(),
+                  'ovtt': journey.get_ovtt(),
+                  'ivtt': journey.get_ivtt()})
+                for journey in self.journeys]
+
+    @property
+    def trip_set(self) -> list:
+        return [leg[-1] for journey in self.journeys
+                for leg in journey.journey if leg[0] != 'walking']
+
+    def __getitem__(self, key):
+        if key not in ('old', 'tt', 'journeys'):
+            raise KeyError(key)
+        return getattr(self, key)
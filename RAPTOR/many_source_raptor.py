@@ -0,0 +1,73 @@
+"""
+Module contains batched many-source RAPTOR implementation (independent queries on the dense-index network).
+"""
+from RAPTOR.raptor_functions import *
+
+
+def many_source_raptor(SOURCE_LIST: list, DESTINATION_LIST: list, D_TIME_LIST: list, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
+                       CHANGE_TIME_SEC: int, PRINT_ITINERARY: int, dense_network: dict, MAX_DURATION=None) -> list:
+    '''
+    Batched Raptor implementation for S independent queries. The labels of all queries are kept as (sources x stops)
+    arrays so that every route is scanned once per round for all queries at once. Queries should share a departure time
+    bucket so that they touch mostly the same routes.
+
+    Args:
+        SOURCE_LIST (list): list of stop ids of source stops.
+        DESTINATION_LIST (list): list of stop ids of destination stops (one per source).
+        D_TIME_LIST (list): list of departure times (pandas.datetime, one per source).
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
+
+    Returns:
+        out (list): one entry per source. Every entry is the output of raptor_dhanus_par, i.e. [rap_out] where rap_out
+        is the dict returned by post_processing_dhanus (None if DESTINATION is not reached).
+
+    Examples:
+        >>> output = many_source_raptor([36, 43], [52, 17], [pd.to_datetime('2022-06-30 05:41:00')] * 2, 4, 1, 0, 0, dense_network)
+        >>> print(output[0][0]['journeys'])
+
+    See Also:
+        RAPTOR, Batched rRAPTOR
+    '''
+    out = []
+    # Initialization
+    marked, label, star_label, pi_label, inf_time = initialize_dense_raptor(dense_network, MAX_TRANSFER, len(SOURCE_LIST))
+    change_time = CHANGE_TIME_SEC * 10 ** 9
+    rows = np.arange(len(SOURCE_LIST))
+    sources = np.array([dense_network["stop_index"][SOURCE] for SOURCE in SOURCE_LIST], dtype=np.int64)
+    destinations = np.array([dense_network["stop_index"][DESTINATION] for DESTINATION in DESTINATION_LIST], dtype=np.int64)
+    d_times = np.array([D_TIME.value for D_TIME in D_TIME_LIST], dtype=np.int64)
+    label[0, rows, sources], star_label[rows, sources] = d_times, d_times
+    if MAX_DURATION is not None:
+        star_label[rows, destinations] = np.minimum(star_label[rows, destinations], d_times + MAX_DURATION * 10 ** 9)  # Travel-duration budget
+    marked[rows, sources] = True
+    if WALKING_FROM_SOURCE == 1:
+        fp_ptr, fp_to, fp_time = dense_network["fp_ptr"], dense_network["fp_to"], dense_network["fp_time"]
+        for row, source in enumerate(sources.tolist()):
+            for e in range(fp_ptr[source], fp_ptr[source + 1]):
+                p_dash = fp_to[e]
+                label[0, row, p_dash], star_label[row, p_dash] = d_times[row] + fp_time[e], d_times[row] + fp_time[e]
+                pi_label["mode"][0, row, p_dash], pi_label["from_stop"][0, row, p_dash], pi_label["time"][0, row, p_dash] = 2, source, fp_time[e]
+                marked[row, p_dash] = True
+
+    # Main Code
+    for k in range(1, MAX_TRANSFER + 1):
+        # Main code part 1
+        Q = collect_routes_dense(marked.any(axis=0), dense_network, 1)
+        marked[:] = False
+        # Main code part 2
+        scan_routes_batch(k, Q, label, star_label, pi_label, marked, destinations, change_time, dense_network)
+        # Main code part 3
+        relax_footpaths_batch(k, label, star_label, pi_label, marked, destinations, dense_network)
+        # Main code End
+        if not marked.any():
+            break
+    for row, DESTINATION in enumerate(DESTINATION_LIST):
+        pi_label_dict, label_dict = get_pi_label_dense(destinations[row], label[:, row], {key: value[:, row] for key, value in pi_label.items()}, dense_network)
+        _, _, rap_out = post_processing_dhanus(DESTINATION, pi_label_dict, PRINT_ITINERARY, label_dict)
+        out.append([rap_out])
+    return out
@@ -0,0 +1,101 @@
+"""
+Module contains McRAPTOR implementation (pareto bags over arrival time, transfers, walking time and in-vehicle time).
+"""
+from RAPTOR.raptor_functions import *
+
+
+def mcraptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int,
+             PRINT_ITINERARY: int, OPTIMIZE_IVTT: int, dense_network: dict, MAX_DURATION=None) -> list:
+    '''
+    McRaptor implementation on the dense-index network. Every stop keeps a bag of pareto-optimal labels per round
+    (the round gives the number of transfers). Labels are integer tuples (arrival, walking time[, in-vehicle time]) in
+    nanoseconds, so the travel-time breakdown of every journey is known without reconstructing it.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION (int): stop id of destination stop.
+        D_TIME (pandas.datetime): departure time.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        OPTIMIZE_IVTT (int): 1 or 0. 1 means in-vehicle time is also a pareto criterion, 0 means it is only reported.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
+
+    Returns:
+        out (list): [mc_out] where mc_out is the list of pareto-optimal journeys (see post_processing_mcraptor).
+
+    Examples:
+        >>> output = mcraptor(36, 52, pd.to_datetime('2022-06-30 05:41:00'), 4, 1, 0, 1, 0, dense_network)
+        >>> print(f"Pareto-optimal journeys are: {output}")
+
+    See Also:
+        RAPTOR
+    '''
+    out = []
+    # Initialization
+    bag = {k: {} for k in range(MAX_TRANSFER + 1)}  # Format {round: {stop index: [[key], [label]]}}
+    best_bag = defaultdict(lambda: [[], []])
+    marked_stop = set()
+    change_time = CHANGE_TIME_SEC * 10 ** 9
+    source, destination = dense_network["stop_index"][SOURCE], dense_network["stop_index"][DESTINATION]
+    inc_ptr, inc_route, inc_pos = dense_network["inc_ptr"], dense_network["inc_route"], dense_network["inc_pos"]
+    fp_ptr, fp_to, fp_time = dense_network["fp_ptr"], dense_network["fp_to"], dense_network["fp_time"]
+    no_of_criteria = 3 if OPTIMIZE_IVTT == 1 else 2
+    budget = None if MAX_DURATION is None else D_TIME.value + MAX_DURATION * 10 ** 9  # Travel-duration budget
+    source_label = (D_TIME.value, 0, 0, None, None)
+    insert_mc_label(0, source, source_label[:no_of_criteria], source_label, bag, best_bag, destination, marked_stop, budget)
+    if WALKING_FROM_SOURCE == 1:
+        for e in range(fp_ptr[source], fp_ptr[source + 1]):
+            p_dash, to_pdash_time = int(fp_to[e]), int(fp_time[e])
+            new_label = (D_TIME.value + to_pdash_time, to_pdash_time, 0, (2, source, p_dash, to_pdash_time), source_label)
+            insert_mc_label(0, p_dash, new_label[:no_of_criteria], new_label, bag, best_bag, destination, marked_stop, budget)
+
+    # Main Code
+    for k in range(1, MAX_TRANSFER + 1):
+        # Main code part 1
+        Q = {}  # Format of Q is {route index: stop index in route}
+        for p in marked_stop:
+            for e in range(inc_ptr[p], inc_ptr[p + 1]):
+                route, stp_idx = int(inc_route[e]), int(inc_pos[e])
+                if route not in Q or stp_idx < Q[route]:
+                    Q[route] = stp_idx
+        marked_stop = set()
+
+        # Main code part 2
+        for route, current_stopindex_by_route in Q.items():
+            route_times = dense_network["route_times"][route]
+            route_bag = [[], []]  # Route labels. Format (trip index, walking time, in-vehicle time - boarding time, boarding stop, boarding time, parent label)
+            for p_i in dense_network["route_stops"][route][current_stopindex_by_route:].tolist():
+                for trip_idx, walk_time, ivtt_offset, boarding_point, boarding_time, parent in route_bag[1]:
+                    arr_by_t_at_pi = int(route_times[current_stopindex_by_route, trip_idx])
+                    new_label = (arr_by_t_at_pi, walk_time, ivtt_offset + arr_by_t_at_pi,
+                                 (1, boarding_point, p_i, route, trip_idx, boarding_time), parent)
+                    insert_mc_label(k, p_i, new_label[:no_of_criteria], new_label, bag, best_bag, destination, marked_stop, budget)
+                for label in bag[k - 1].get(p_i, [[], []])[1]:
+                    boardable = route_times[current_stopindex_by_route] >= label[0] + change_time
+                    trip_idx = int(boardable.argmax())
+                    if boardable[trip_idx]:
+                        boarding_time = int(route_times[current_stopindex_by_route, trip_idx])
+                        route_label = (trip_idx, label[1], label[2] - boarding_time, p_i, boarding_time, label)
+                        merge_bag(route_bag, route_label[:no_of_criteria], route_label)
+                current_stopindex_by_route = current_stopindex_by_route + 1
+
+        # Main code part 3
+        new_labels = []
+        for p in marked_stop:
+            for label in bag[k][p][1]:
+                if label[3][0] != 1:
+                    continue
+                for e in range(fp_ptr[p], fp_ptr[p + 1]):
+                    p_dash, to_pdash_time = int(fp_to[e]), int(fp_time[e])
+                    new_labels.append((p_dash, (label[0] + to_pdash_time, label[1] + to_pdash_time, label[2], (2, p, p_dash, to_pdash_time), label)))
+        for p_dash, new_label in new_labels:
+            insert_mc_label(k, p_dash, new_label[:no_of_criteria], new_label, bag, best_bag, destination, marked_stop, budget)
+        # Main code End
+        if not marked_stop:
+            break
+    mc_out = post_processing_mcraptor(destination, D_TIME, bag, PRINT_ITINERARY, dense_network)
+    out.append(mc_out)
+    return out
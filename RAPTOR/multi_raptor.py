@@ -0,0 +1,131 @@
+"""
+Module contains multi-source multi-target RAPTOR implementation (location-based queries).
+"""
+from RAPTOR.raptor_functions import *
+
+
+def multi_raptor(SOURCE_LIST: list, DESTINATION_LIST: list, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int,
+                 PRINT_ITINERARY: int, routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict,
+                 idx_by_route_stop_dict: dict, MAX_DURATION=None) -> list:
+    '''
+    Multi-source multi-target Raptor implementation. All origin stops are seeded in round 0 with their access time and
+    the target location is reached through any of the destination stops after its egress time. An origin stop that is
+    also a destination stop is reported with a zero-transfer label.
+
+    Args:
+        SOURCE_LIST (list): list of origin stops with access times. Format [(stop id, access time in seconds)].
+        DESTINATION_LIST (list): list of target stops with egress times. Format [(stop id, egress time in seconds)].
+        D_TIME (pandas.datetime): departure time from the origin location.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from the origin stops is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
+
+    Returns:
+        out (list): list of pareto-optimal arrival timestamps at the target location.
+
+    Examples:
+        >>> output = multi_raptor([(36, 120), (43, 300)], [(52, 60), (17, 240)], pd.to_datetime('2022-06-30 05:41:00'), 4, 1, 0, 1, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
+        >>> print(f"Optimal arrival time are: {output}")
+
+    See Also:
+        RAPTOR, One-To-Many rRAPTOR
+    '''
+    out = []
+    # Initialization
+    marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE_LIST[0][0], MAX_TRANSFER)
+    change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
+    access_dict = initialize_access_stops(SOURCE_LIST, D_TIME, label, star_label, marked_stop, marked_stop_dict)
+    egress_dict = initialize_egress_stops(DESTINATION_LIST)
+    best_arrival = min([star_label[stop] + egress_time for stop, egress_time in egress_dict.items()])  # Best arrival at target location
+    if MAX_DURATION is not None:
+        best_arrival = min(best_arrival, D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
+    Q = {}  # Format of Q is {route:stop index}
+    if WALKING_FROM_SOURCE == 1:
+        for source in access_dict.keys():
+            try:
+                trans_info = footpath_dict[source]
+                for i in trans_info:
+                    (p_dash, to_pdash_time) = i
+                    new_p_dash_time = label[0][source] + to_pdash_time
+                    if new_p_dash_time < star_label[p_dash]:
+                        label[0][p_dash] = new_p_dash_time
+                        star_label[p_dash] = new_p_dash_time
+                        pi_label[0][p_dash] = ('walking', source, p_dash, to_pdash_time, new_p_dash_time)
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            except KeyError:
+                pass
+
+    # Main Code
+    # Main code part 1
+    for k in range(1, MAX_TRANSFER + 1):
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            try:
+                routes_serving_p = routes_by_stop_dict[p]
+                for route in routes_serving_p:
+                    stp_idx = idx_by_route_stop_dict[(route, p)]
+                    try:
+                        Q[route] = min(stp_idx, Q[route])
+                    except KeyError:
+                        Q[route] = stp_idx
+            except KeyError:
+                continue
+
+        # Main code part 2
+        for route, current_stopindex_by_route in Q.items():
+            current_trip_t = -1
+            for p_i in stops_dict[route][current_stopindex_by_route:]:
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], best_arrival):
+                    arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
+                    label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
+                    if p_i in egress_dict and arr_by_t_at_pi + egress_dict[p_i] < best_arrival:
+                        best_arrival = arr_by_t_at_pi + egress_dict[p_i]
+                    if marked_stop_dict[p_i] == 0:
+                        marked_stop.append(p_i)
+                        marked_stop_dict[p_i] = 1
+                if current_trip_t == -1 or label[k - 1][p_i] + change_time < current_trip_t[current_stopindex_by_route][
+                    1]:  # assuming arrival_time = departure_time
+                    tid, current_trip_t = get_latest_trip_new(stoptimes_dict, route, label[k - 1][p_i], current_stopindex_by_route, change_time)
+                    if current_trip_t == -1:
+                        boarding_time, boarding_point = -1, -1
+                    else:
+                        boarding_point = p_i
+                        boarding_time = current_trip_t[current_stopindex_by_route][1]
+                current_stopindex_by_route = current_stopindex_by_route + 1
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            try:
+                trans_info = footpath_dict[p]
+                for i in trans_info:
+                    (p_dash, to_pdash_time) = i
+                    new_p_dash_time = label[k][p] + to_pdash_time
+                    if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], best_arrival):
+                        label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
+                        if p_dash in egress_dict and new_p_dash_time + egress_dict[p_dash] < best_arrival:
+                            best_arrival = new_p_dash_time + egress_dict[p_dash]
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            except KeyError:
+                continue
+        # Main code End
+        if marked_stop == deque([]):
+            break
+    _, _, rap_out = post_processing_multi(egress_dict, pi_label, PRINT_ITINERARY, label, access_dict)
+    out.append(rap_out)
+    return out
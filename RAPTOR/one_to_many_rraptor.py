@@ -0,0 +1,74 @@
+"""
+Module contains One-To-Many rRAPTOR implementation
+"""
+from itertools import groupby
+
+from RAPTOR.raptor_functions import *
+
+
+def onetomany_rraptor(SOURCE: int, DESTINATION_LIST: list, departures_by_stop: dict, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
+                      CHANGE_TIME_SEC: int, PRINT_ITINERARY: int, OPTIMIZED: int, routes_by_stop_dict: dict, stops_dict: dict,
+                      stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, window_start=None, window_end=None, MAX_DURATION=None, lower_bound=None) -> list:
+    '''
+    One-To-Many rRaptor implementation. Labels are shared across departures (as in rRAPTOR) and a label is only kept if it
+    is better than the current arrival at the worst destination in DESTINATION_LIST.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION_LIST (list): list of stop ids of destination stop.
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        OPTIMIZED (int): 1 or 0. 1 means collect trips and 0 means collect routes.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        window_start (pandas.datetime): optional. Earliest departure time to be considered.
+        window_end (pandas.datetime): optional. Latest departure time to be considered.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than the departure time + MAX_DURATION are not set.
+        lower_bound (dict): optional. Lower bounds on travel time to the nearest destination (see get_lower_bounds with DESTINATION_LIST).
+        Labels that cannot improve the arrival at the destinations even with these bounds are pruned.
+
+    Returns:
+        if OPTIMIZED==1:
+            out (list):  list of trips required to cover all optimal journeys Format: [trip_id]
+        elif OPTIMIZED==0:
+            out (list):  list of routes required to cover all optimal journeys. Format: [route_id]
+
+    Examples:
+        >>> output = onetomany_rraptor(36, [52, 43], departures_by_stop, 4, 1, 0, 1, 0, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
+        >>> print(output)
+
+    See Also:
+        rRAPTOR, One-To-Many rTBTR
+    '''
+    out = []
+
+    d_time_list, edge_time = get_departures(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, window_start, window_end)
+    if edge_time is not None:
+        d_time_list.insert(0, [None, edge_time, None])  # Window edge. Only seeds the labels.
+
+    # Labels and pointers are allocated once and shared across departures (see rraptor_rounds).
+    marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
+    pi_written = []  # Format [(round, stop id)]
+    desti_heap = initialize_desti_bound(DESTINATION_LIST, star_label)  # Labels later than the worst destination cannot improve any destination.
+    change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
+
+    for d_time, dep_group in groupby(d_time_list, key=lambda x: x[1]):
+        dep_group = list(dep_group)  # All departures at d_time are solved together.
+        start_tid = dep_group[0][0]
+        if PRINT_ITINERARY == 1 and start_tid is not None:
+            print(f"SOURCE, DESTINATION_LIST, d_time: {SOURCE, DESTINATION_LIST, d_time}")
+        rraptor_rounds(dep_group, SOURCE, desti_heap, MAX_TRANSFER, WALKING_FROM_SOURCE, change_time, routes_by_stop_dict, stops_dict,
+                       stoptimes_dict, footpath_dict, idx_by_route_stop_dict, marked_stop, marked_stop_dict, label, pi_label, star_label,
+                       pi_written, MAX_DURATION, PRINT_ITINERARY, lower_bound)
+        if start_tid is None:
+            continue
+        out.extend(post_processing_onetomany_rraptor(DESTINATION_LIST, pi_label, PRINT_ITINERARY, label, OPTIMIZED))
+        if PRINT_ITINERARY == 1:
+            print('------------------------------------')
+    return out
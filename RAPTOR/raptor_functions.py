@@ -4,11 +4,16 @@ Created for Dhanus. This also contains functionality to get IVTT, OVTT etc.
 There are 3 additional funcitons: update_record, _calculate_tt, _waiting_time, _calcuLATE_ivtt.
 update_record will be called after line 205
 """
-from collections import deque as deque
-from RAPTOR.journey_rep import Journey
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque as deque, OrderedDict
+from heapq import heapify, heappop, heappush
+from RAPTOR.journey_rep import Journey, LazyJourney, RaptorOutput
 
+import numpy as np
 import pandas as pd
 
+PARTITION_MASK_CACHE_SIZE = 16  # Maximum number of unpacked stop-cell pair masks kept by get_partition_mask (per groups)
+
 
 def initialize_raptor(routes_by_stop_dict: dict, SOURCE: int, MAX_TRANSFER: int) -> tuple:
     '''
@@ -45,6 +50,909 @@ def initialize_raptor(routes_by_stop_dict: dict, SOURCE: int, MAX_TRANSFER: int)
     return marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time
 
 
+def initialize_access_stops(SOURCE_LIST: list, D_TIME, label: dict, star_label: dict, marked_stop, marked_stop_dict: dict) -> dict:
+    '''
+    Seeds round 0 of RAPTOR with the access stops of a location-based query.
+
+    Args:
+        SOURCE_LIST (list): list of origin stops with access times. Format [(stop id, access time in seconds)].
+        D_TIME (pandas.datetime): departure time from the origin location.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        star_label (dict): dict to maintain best arrival label {stop id: pandas.datetime}.
+        marked_stop (deque): deque to store marked stop.
+        marked_stop_dict (dict): Binary variable indicating if a stop is marked. Keys: stop Id, value: 0 or 1.
+
+    Returns:
+        access_dict (dict): access time of every origin stop. Format {stop id: pandas.timedelta}.
+
+    Examples:
+        >>> output = initialize_access_stops([(36, 120), (43, 300)], pd.to_datetime('2022-06-30 05:41:00'), label, star_label, marked_stop, marked_stop_dict)
+    '''
+    access_dict = {}
+    for stop, access_sec in SOURCE_LIST:
+        access_time = pd.to_timedelta(access_sec, unit='seconds')
+        if stop in access_dict and access_dict[stop] <= access_time:
+            continue
+        access_dict[stop] = access_time
+        (label[0][stop], star_label[stop]) = (D_TIME + access_time, D_TIME + access_time)
+        if marked_stop_dict[stop] == 0:
+            marked_stop.append(stop)
+            marked_stop_dict[stop] = 1
+    return access_dict
+
+
+def initialize_egress_stops(DESTINATION_LIST: list) -> dict:
+    '''
+    Collects the egress time of every target stop of a location-based query. If a stop is repeated, the smallest egress time is kept.
+
+    Args:
+        DESTINATION_LIST (list): list of target stops with egress times. Format [(stop id, egress time in seconds)].
+
+    Returns:
+        egress_dict (dict): egress time of every target stop. Format {stop id: pandas.timedelta}.
+
+    Examples:
+        >>> output = initialize_egress_stops([(52, 60), (17, 240)])
+    '''
+    egress_dict = {}
+    for stop, egress_sec in DESTINATION_LIST:
+        egress_time = pd.to_timedelta(egress_sec, unit='seconds')
+        if stop not in egress_dict or egress_time < egress_dict[stop]:
+            egress_dict[stop] = egress_time
+    return egress_dict
+
+
+def initialize_reverse_raptor(routes_by_stop_dict: dict, DESTINATION: int, MAX_TRANSFER: int) -> tuple:
+    '''
+    Initialize values for reverse (arrive-by) RAPTOR. Labels store latest departure times, hence they start at minus infinity.
+
+    Args:
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        DESTINATION (int): stop id of destination stop.
+        MAX_TRANSFER (int): maximum transfer limit.
+
+    Returns:
+        marked_stop (deque): deque to store marked stop.
+        marked_stop_dict (dict): Binary variable indicating if a stop is marked. Keys: stop Id, value: 0 or 1.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        pi_label (dict): Nested dict used for forward tracking labels. Format {round : {stop_id: pointer_label}}
+        if next stop is reached by walking, pointer_label= ('walking', stop id, next stop id, time, arrival time at next stop)}} else pointer_label= (trip departure time, stop id, alighting point, alighting time, trip id)
+        star_label (dict): dict to maintain best departure label {stop id: pandas.datetime}.
+        neg_inf_time (pd.timestamp): Variable indicating minus infinite time (pandas.datetime).
+
+    Examples:
+        >>> output = initialize_reverse_raptor(routes_by_stop_dict, 1482, 4)
+    '''
+    neg_inf_time = pd.to_datetime("1900-01-01")  # must stay below any GTFS service date
+
+    pi_label = {x: {stop: -1 for stop in routes_by_stop_dict.keys()} for x in range(0, MAX_TRANSFER + 1)}
+    label = {x: {stop: neg_inf_time for stop in routes_by_stop_dict.keys()} for x in range(0, MAX_TRANSFER + 1)}
+    star_label = {stop: neg_inf_time for stop in routes_by_stop_dict.keys()}
+
+    marked_stop = deque()
+    marked_stop_dict = {stop: 0 for stop in routes_by_stop_dict.keys()}
+    marked_stop.append(DESTINATION)
+    marked_stop_dict[DESTINATION] = 1
+    return marked_stop, marked_stop_dict, label, pi_label, star_label, neg_inf_time
+
+
+def get_reversed_footpath_dict(footpath_dict: dict) -> dict:
+    '''
+    Reverses the footpath graph. Build it once and pass it to the reverse RAPTOR queries.
+
+    Args:
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+
+    Returns:
+        rev_footpath_dict (dict): reversed footpaths. Format {to_stop_id: [(from_stop_id, footpath_time)]}.
+
+    Examples:
+        >>> rev_footpath_dict = get_reversed_footpath_dict(footpath_dict)
+    '''
+    rev_footpath_dict = {}
+    for from_stop, connections in footpath_dict.items():
+        for to_stop, footpath_time in connections:
+            rev_footpath_dict.setdefault(to_stop, []).append((from_stop, footpath_time))
+    return rev_footpath_dict
+
+
+def get_departures(departures_by_stop: dict, SOURCE: int, WALKING_FROM_SOURCE: int, footpath_dict: dict, window_start=None, window_end=None) -> tuple:
+    '''
+    Collects the departures of a range query from the departure index. Used in rRAPTOR, rTBTR and One-To-Many rTBTR.
+
+    Args:
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+        SOURCE (int): stop id of source stop.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means departures from stops walkable from SOURCE are also collected.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        window_start (pandas.datetime): earliest departure time to be considered. None means no lower bound.
+        window_end (pandas.datetime): latest departure time to be considered. None means no upper bound.
+
+    Returns:
+        d_time_list (list): departures inside the window sorted by decreasing departure time. Format [(trip id, departure time, stop index)]
+        edge_time (pandas.datetime): earliest departure time after window_end. Labels must be seeded from this time so
+        that journeys dominated by a departure after the window are not reported. None if no such departure exists.
+
+    Examples:
+        >>> output = get_departures(departures_by_stop, 36, 1, footpath_dict, pd.to_datetime('2022-06-30 07:00:00'), pd.to_datetime('2022-06-30 10:00:00'))
+    '''
+    stops = [SOURCE]
+    if WALKING_FROM_SOURCE == 1:
+        stops.extend([connection[0] for connection in footpath_dict.get(SOURCE, [])])
+    d_time_list, edge_time = [], None
+    for stop in stops:
+        try:
+            departure_times, departures = departures_by_stop[stop]
+        except KeyError:
+            continue
+        first = 0 if window_start is None else bisect_left(departure_times, window_start)
+        last = len(departure_times) if window_end is None else bisect_right(departure_times, window_end)
+        d_time_list.extend(departures[first:last])
+        if last < len(departure_times) and (edge_time is None or departure_times[last] < edge_time):
+            edge_time = departure_times[last]
+    d_time_list.sort(key=lambda x: x[1], reverse=True)
+    return d_time_list, edge_time
+
+
+def get_partition_mask(groups: dict, source_cell: int, desti_cell: int) -> np.ndarray:
+    '''
+    Unpacks the routes (or trips) of a stop-cell pair from the partition bitsets. Used in HypRAPTOR and HypTBTR. The
+    last PARTITION_MASK_CACHE_SIZE unpacked masks are cached (LRU) in groups["cache"], so memory stays linear in the
+    number of partitions.
+
+    Args:
+        groups (dict): route_groups or trip_groups (see build_partition_masks).
+        source_cell (int): stop-cell id of SOURCE.
+        desti_cell (int): stop-cell id of DESTINATION.
+
+    Returns:
+        mask (np.ndarray): read-only bool array. True for every route id (or dense trip index) belonging to the stop-cell pair.
+
+    Examples:
+        >>> output = get_partition_mask(route_groups, stop_out[36], stop_out[52])
+    '''
+    cache = groups.setdefault("cache", OrderedDict())
+    key = (source_cell, desti_cell)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    rows, masks = groups["rows"], groups["masks"]
+    bits = masks[rows[source_cell]] | masks[rows[desti_cell]] | masks[rows[-1]]
+    mask = np.unpackbits(bits, count=groups["size"]).astype(bool)
+    mask.flags.writeable = False
+    cache[key] = mask
+    while len(cache) > PARTITION_MASK_CACHE_SIZE:
+        cache.popitem(last=False)
+    return mask
+
+
+def get_lower_bounds(min_time_graph: dict, DESTINATION: int) -> dict:
+    '''
+    Backward Dijkstra from DESTINATION over the minimum-travel-time stop graph. The result is a lower bound on the travel
+    time from every stop to DESTINATION and is used for target pruning in the RAPTOR and TBTR engines. For a list of
+    destinations, the bound is to the nearest destination (used by the one-to-many engines).
+
+    Args:
+        min_time_graph (dict): preprocessed dict. Format {to_stop_id: [(from_stop_id, minimum travel time in seconds)]}.
+        DESTINATION (int or list): stop id of destination stop (or list of stop ids).
+
+    Returns:
+        lower_bound (dict): keys: stop id, value: lower bound on travel time to DESTINATION (pandas.timedelta). Stops that cannot reach DESTINATION are absent.
+
+    Examples:
+        >>> lower_bound = get_lower_bounds(min_time_graph, 52)
+    '''
+    DESTINATION_LIST = DESTINATION if isinstance(DESTINATION, list) else [DESTINATION]
+    distance = {desti: 0 for desti in DESTINATION_LIST}
+    heap = [(0, desti) for desti in distance.keys()]
+    while heap:
+        dist, stop = heappop(heap)
+        if dist > distance[stop]:
+            continue
+        for from_stop, travel_time in min_time_graph.get(stop, []):
+            if dist + travel_time < distance.get(from_stop, float("inf")):
+                distance[from_stop] = dist + travel_time
+                heappush(heap, (dist + travel_time, from_stop))
+    return {stop: pd.to_timedelta(int(dist), unit='seconds') for stop, dist in distance.items()}  # floor keeps the bound valid under float error
+
+
+def relax_walking_dijkstra(k: int, seed_stops: list, footpath_dict: dict, label: dict, star_label: dict, pi_label: dict, DESTINATION: int,
+                           marked_stop, marked_stop_dict: dict, lower_bound=None) -> None:
+    '''
+    Phase 3 of a RAPTOR round over a walking graph which need not be transitively closed. Runs a multi-source Dijkstra
+    from seed_stops (keyed by label[k]) and stops expanding a stop once it cannot improve star_label of DESTINATION.
+    Walks can chain over several footpaths, each link gets its own 'walking' pointer in round k.
+
+    Args:
+        k (int): current round.
+        seed_stops (list): stop ids marked in round k.
+        footpath_dict (dict): walking graph. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        star_label (dict): dict to maintain best arrival label {stop id: pandas.datetime}.
+        pi_label (dict): Nested dict used for backtracking labels. Format {round : {stop_id: pointer_label}}
+        DESTINATION (int): stop id of destination stop.
+        marked_stop (deque): deque of marked stops.
+        marked_stop_dict (dict): Binary variable indicating if a stop is marked. Keys: stop Id, value: 0 or 1.
+        lower_bound (dict): optional. Lower bounds on travel time to DESTINATION (see get_lower_bounds).
+
+    Returns:
+        None
+    '''
+    heap = [(label[k][p], p) for p in seed_stops]
+    heap.sort()
+    while heap:
+        p_time, p = heappop(heap)
+        if p_time > label[k][p] or p_time >= star_label[DESTINATION]:
+            continue
+        for p_dash, to_pdash_time in footpath_dict.get(p, []):
+            new_p_dash_time = p_time + to_pdash_time
+            if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]) \
+                    and (lower_bound is None or (p_dash in lower_bound and new_p_dash_time + lower_bound[p_dash] < star_label[DESTINATION])):
+                label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
+                heappush(heap, (new_p_dash_time, p_dash))
+                if marked_stop_dict[p_dash] == 0:
+                    marked_stop.append(p_dash)
+                    marked_stop_dict[p_dash] = 1
+    return None
+
+
+def initialize_desti_bound(DESTINATION_LIST: list, star_label: dict) -> list:
+    '''
+    Builds the heap used to track the arrival at the worst destination of rRAPTOR and One-To-Many rRAPTOR.
+
+    Args:
+        DESTINATION_LIST (list): list of stop ids of destination stop.
+        star_label (dict): dict to maintain best arrival label {stop id: pandas.datetime}.
+
+    Returns:
+        desti_heap (list): heap of destinations keyed by latest arrival. Format [(-arrival time in ns, stop id)]
+
+    Examples:
+        >>> desti_heap = initialize_desti_bound([52, 43], star_label)
+    '''
+    desti_heap = [(-star_label[desti].value, desti) for desti in set(DESTINATION_LIST)]
+    heapify(desti_heap)
+    return desti_heap
+
+
+def get_desti_bound(desti_heap: list, star_label: dict):
+    '''
+    Returns the arrival at the worst destination. Outdated heap entries are dropped lazily, so a label improvement
+    costs O(log |DESTINATION_LIST|).
+
+    Args:
+        desti_heap (list): heap of destinations keyed by latest arrival (see initialize_desti_bound).
+        star_label (dict): dict to maintain best arrival label {stop id: pandas.datetime}.
+
+    Returns:
+        desti_bound (pandas.datetime): latest arrival over all destinations.
+    '''
+    while -desti_heap[0][0] != star_label[desti_heap[0][1]].value:
+        heappop(desti_heap)
+    return star_label[desti_heap[0][1]]
+
+
+def rraptor_rounds(dep_group: list, SOURCE: int, desti_heap: list, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, change_time,
+                   routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict,
+                   marked_stop, marked_stop_dict: dict, label: dict, pi_label: dict, star_label: dict, pi_written: list,
+                   MAX_DURATION=None, PRINT_ITINERARY: int = 0, lower_bound=None) -> None:
+    '''
+    Round loop of one departure time of rRAPTOR and One-To-Many rRAPTOR. All departures with this departure time are
+    seeded together, so a journey is not reported if another trip leaving at the same time dominates it. Labels and pointers
+    are shared across departure times. Only pointers written for the previous departure time are invalidated (pi_written),
+    so each departure time costs its incremental work. A label is only kept if it is earlier than the arrival at the worst destination.
+
+    Args:
+        dep_group (list): departures with the same departure time. Format [[trip id, departure time, stop index]]. For the
+        window edge, dep_group is [[None, edge time, None]].
+        SOURCE (int): stop id of source stop.
+        desti_heap (list): heap of destinations keyed by latest arrival (see initialize_desti_bound).
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        change_time (pandas.timedelta): change-time.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        marked_stop (deque): deque to store marked stop.
+        marked_stop_dict (dict): Binary variable indicating if a stop is marked. Keys: stop Id, value: 0 or 1.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        pi_label (dict): Nested dict used for backtracking labels. Format {round : {stop_id: pointer_label}}
+        star_label (dict): dict to maintain best arrival label {stop id: pandas.datetime}.
+        pi_written (list): pointers written by the previous departure. Format [(round, stop id)]
+        MAX_DURATION (int): optional. Maximum travel duration in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print the termination message.
+        lower_bound (dict): optional. Lower bounds on travel time to the nearest destination (see get_lower_bounds). Labels
+        that cannot improve the worst destination even with these bounds are pruned.
+
+    Returns:
+        None
+    '''
+    for k, stop in pi_written:
+        pi_label[k][stop] = -1
+    pi_written.clear()
+    while marked_stop:
+        marked_stop_dict[marked_stop.pop()] = 0
+    start_tid, d_time, _ = dep_group[0]
+    desti_set = set([desti for _, desti in desti_heap])
+    if MAX_DURATION is not None:
+        budget = d_time + pd.to_timedelta(MAX_DURATION, unit='seconds')  # Travel-duration budget
+        for desti in desti_set:
+            if budget < star_label[desti]:
+                star_label[desti] = budget
+                heappush(desti_heap, (-budget.value, desti))
+    seed_stops = []
+    if start_tid is None:
+        # Any trip departing after the window edge can be boarded from SOURCE (or its walkable stops).
+        seed_stops = [SOURCE]
+        if WALKING_FROM_SOURCE == 1:
+            seed_stops.extend([connection[0] for connection in footpath_dict.get(SOURCE, [])])
+        for stop in seed_stops:
+            label[0][stop] = d_time - change_time
+            star_label[stop] = d_time - change_time
+            if marked_stop_dict[stop] == 0:
+                marked_stop.append(stop)
+                marked_stop_dict[stop] = 1
+    for dep_tid, _, s_idx in dep_group:
+        if dep_tid is None:
+            continue
+        first_stop = stops_dict[int(dep_tid.split("_")[0])][s_idx]
+        seed_stops.append(first_stop)
+        if marked_stop_dict[first_stop] == 0:
+            marked_stop.append(first_stop)
+            marked_stop_dict[first_stop] = 1
+        if first_stop != SOURCE:
+            to_pdash_time = [foot_connect[1] for foot_connect in footpath_dict[SOURCE] if foot_connect[0]==first_stop][0]
+            label[0][first_stop] = d_time - change_time
+            star_label[first_stop] = d_time - change_time
+            pi_label[0][first_stop] = ('walking', SOURCE, first_stop, to_pdash_time, d_time - change_time)
+            pi_written.append((0, first_stop))
+        else:
+            (label[0][SOURCE], star_label[SOURCE]) = (d_time, d_time)
+    for stop in seed_stops:
+        if stop in desti_set:
+            heappush(desti_heap, (-star_label[stop].value, stop))
+    desti_bound = get_desti_bound(desti_heap, star_label)
+    Q = {}
+    # Main Code
+    # Main code part 1
+    for k in range(1, MAX_TRANSFER + 1):
+        Q.clear()  # Format of Q is {route:stop}
+        if k == 1 and start_tid is not None:
+            # Only the routes of the departures are boarded in the first round.
+            while marked_stop:
+                marked_stop_dict[marked_stop.pop()] = 0
+            for dep_tid, _, s_idx in dep_group:
+                route = int(dep_tid.split('_')[0])
+                Q[route] = min(s_idx, Q.get(route, s_idx))
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            try:
+                routes_serving_p = routes_by_stop_dict[p]
+                for route in routes_serving_p:
+                    stp_idx = idx_by_route_stop_dict[(route, p)]
+                    if route in Q.keys() and Q[route] != stp_idx:
+                        Q[route] = min(stp_idx, Q[route])
+                    else:
+                        Q[route] = stp_idx
+            except KeyError:
+                continue
+        # Main code part 2
+        for route, current_stopindex_by_route in Q.items():
+            current_trip_t = -1
+            for p_i in stops_dict[route][current_stopindex_by_route:]:
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], desti_bound) \
+                        and (lower_bound is None or (p_i in lower_bound and current_trip_t[current_stopindex_by_route][1] + lower_bound[p_i] < desti_bound)):
+                    arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
+                    label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    if p_i in desti_set:
+                        heappush(desti_heap, (-arr_by_t_at_pi.value, p_i))
+                        desti_bound = get_desti_bound(desti_heap, star_label)
+                    pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
+                    pi_written.append((k, p_i))
+                    if marked_stop_dict[p_i] == 0:
+                        marked_stop.append(p_i)
+                        marked_stop_dict[p_i] = 1
+                if current_trip_t == -1 or label[k - 1][p_i] + change_time < current_trip_t[current_stopindex_by_route][1]: # assuming arrival_time = departure_time
+                    tid, current_trip_t = get_latest_trip_new(stoptimes_dict, route, label[k - 1][p_i], current_stopindex_by_route, change_time)
+                    if current_trip_t == -1:
+                        boarding_time, boarding_point = -1, -1
+                    else:
+                        boarding_point = p_i
+                        boarding_time = current_trip_t[current_stopindex_by_route][1]
+                current_stopindex_by_route = current_stopindex_by_route + 1
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            try:
+                trans_info = footpath_dict[p]
+                for i in trans_info:
+                    (p_dash, to_pdash_time) = i
+                    new_p_dash_time = label[k][p] + to_pdash_time
+                    if (label[k][p_dash] > new_p_dash_time) and new_p_dash_time < min(star_label[p_dash], desti_bound) \
+                            and (lower_bound is None or (p_dash in lower_bound and new_p_dash_time + lower_bound[p_dash] < desti_bound)):
+                        label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        if p_dash in desti_set:
+                            heappush(desti_heap, (-new_p_dash_time.value, p_dash))
+                            desti_bound = get_desti_bound(desti_heap, star_label)
+                        pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
+                        pi_written.append((k, p_dash))
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            except KeyError:
+                continue
+        # Main code End
+        if marked_stop == deque([]):
+            if PRINT_ITINERARY == 1:
+                print('code ended with termination condition')
+            break
+    return None
+
+
+def initialize_dense_raptor(dense_network: dict, MAX_TRANSFER: int, no_of_rows=None) -> tuple:
+    '''
+    Initialize values for RAPTOR on the dense-index network. Labels are int64 nanoseconds.
+
+    Args:
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        MAX_TRANSFER (int): maximum transfer limit.
+        no_of_rows (int): optional. Number of label rows for the batched engines (one row per departure or source).
+
+    Returns:
+        marked (np.ndarray): boolean mask of marked stops. Format marked[stop index] (marked[row, stop index] if no_of_rows is given).
+        label (np.ndarray): label array. Format label[round, stop index] (label[round, row, stop index] if no_of_rows is given).
+        star_label (np.ndarray): best arrival at every stop. Format star_label[stop index] (star_label[row, stop index] if no_of_rows is given).
+        pi_label (dict): dict of pointer arrays with the same shape as label. Keys: 'mode' (0: unset, 1: trip, 2: walking),
+        'from_stop' (boarding stop or walking origin), 'route', 'trip', 'time' (boarding time or walking duration).
+        inf_time (int): Variable indicating infinite time.
+
+    Examples:
+        >>> output = initialize_dense_raptor(dense_network, 4)
+    '''
+    inf_time = np.iinfo(np.int64).max // 4
+    shape = (len(dense_network["stop_ids"]),) if no_of_rows is None else (no_of_rows, len(dense_network["stop_ids"]))
+    marked = np.zeros(shape, dtype=bool)
+    label = np.full((MAX_TRANSFER + 1,) + shape, inf_time, dtype=np.int64)
+    star_label = np.full(shape, inf_time, dtype=np.int64)
+    pi_label = {"mode": np.zeros((MAX_TRANSFER + 1,) + shape, dtype=np.int8)}
+    for key in ["from_stop", "route", "trip", "time"]:
+        pi_label[key] = np.zeros((MAX_TRANSFER + 1,) + shape, dtype=np.int64)
+    return marked, label, star_label, pi_label, inf_time
+
+
+def collect_routes_dense(marked, dense_network: dict, VECTORIZED: int) -> dict:
+    '''
+    Phase 1 of a RAPTOR round on the dense-index network. Collects the routes serving marked stops along with the earliest
+    marked stop index in each route and unmarks all stops.
+
+    Args:
+        marked (np.ndarray): boolean mask of marked stops. Format marked[stop index].
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        VECTORIZED (int): 1 or 0. 1 means use a np.minimum.at over the route/stop incidence arrays, 0 means plain loops.
+
+    Returns:
+        Q (dict): Format {route index: stop index in route}.
+
+    Examples:
+        >>> Q = collect_routes_dense(marked, dense_network, 1)
+    '''
+    inc_ptr, inc_route, inc_pos = dense_network["inc_ptr"], dense_network["inc_route"], dense_network["inc_pos"]
+    if VECTORIZED == 1:
+        selected = marked[dense_network["inc_stop"]]
+        Q_array = np.full(len(dense_network["route_ids"]), len(inc_pos), dtype=np.int64)
+        np.minimum.at(Q_array, inc_route[selected], inc_pos[selected])
+        routes = np.flatnonzero(Q_array < len(inc_pos))
+        Q = dict(zip(routes.tolist(), Q_array[routes].tolist()))
+    else:
+        Q = {}
+        for p in np.flatnonzero(marked).tolist():
+            for e in range(inc_ptr[p], inc_ptr[p + 1]):
+                route, stp_idx = int(inc_route[e]), int(inc_pos[e])
+                if route not in Q or stp_idx < Q[route]:
+                    Q[route] = stp_idx
+    marked[:] = False
+    return Q
+
+
+def scan_routes_dense(k: int, Q: dict, label, star_label, pi_label: dict, marked, DESTINATION: int, change_time: int, dense_network: dict) -> None:
+    '''
+    Phase 2 of a RAPTOR round on the dense-index network. Updates label, star_label, pi_label and marked in place.
+
+    Args:
+        k (int): current round.
+        Q (dict): Format {route index: stop index in route}.
+        label (np.ndarray): label array. Format label[round, stop index].
+        star_label (np.ndarray): best arrival at every stop. Format star_label[stop index].
+        pi_label (dict): dict of pointer arrays (see initialize_dense_raptor).
+        marked (np.ndarray): boolean mask of marked stops.
+        DESTINATION (int): dense stop index of destination stop.
+        change_time (int): change-time in nanoseconds.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+
+    Returns:
+        None
+    '''
+    for route, current_stopindex_by_route in Q.items():
+        route_times = dense_network["route_times"][route]
+        current_trip_t = -1
+        for p_i in dense_network["route_stops"][route][current_stopindex_by_route:].tolist():
+            if current_trip_t != -1:
+                arr_by_t_at_pi = route_times[current_stopindex_by_route, current_trip_t]
+                if arr_by_t_at_pi < min(star_label[p_i], star_label[DESTINATION]):
+                    label[k, p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    pi_label["mode"][k, p_i], pi_label["from_stop"][k, p_i], pi_label["time"][k, p_i] = 1, boarding_point, boarding_time
+                    pi_label["route"][k, p_i], pi_label["trip"][k, p_i] = route, current_trip_t
+                    marked[p_i] = True
+            if current_trip_t == -1 or label[k - 1, p_i] + change_time < route_times[current_stopindex_by_route, current_trip_t]:
+                boardable = route_times[current_stopindex_by_route] >= label[k - 1, p_i] + change_time
+                trip_idx = int(boardable.argmax())
+                if boardable[trip_idx]:
+                    current_trip_t = trip_idx
+                    boarding_point = p_i
+                    boarding_time = route_times[current_stopindex_by_route, current_trip_t]
+                else:
+                    current_trip_t = -1
+            current_stopindex_by_route = current_stopindex_by_route + 1
+    return None
+
+
+def relax_footpaths_dense(k: int, label, star_label, pi_label: dict, marked, DESTINATION: int, dense_network: dict, VECTORIZED: int,
+                          UNRESTRICTED_WALKING: int = 0) -> None:
+    '''
+    Phase 3 of a RAPTOR round on the dense-index network. Relaxes the footpaths of all marked stops and updates label,
+    star_label, pi_label and marked in place.
+    With UNRESTRICTED_WALKING==0 a footpath is taken only from a stop marked before this phase, as in raptor, so the
+    footpath graph must be transitively closed (both modes then give the same labels). With UNRESTRICTED_WALKING==1 stops
+    improved by walking are relaxed again until no label improves, so walks are chained over non-closed graphs.
+
+    Args:
+        k (int): current round.
+        label (np.ndarray): label array. Format label[round, stop index].
+        star_label (np.ndarray): best arrival at every stop. Format star_label[stop index].
+        pi_label (dict): dict of pointer arrays (see initialize_dense_raptor).
+        marked (np.ndarray): boolean mask of marked stops.
+        DESTINATION (int): dense stop index of destination stop.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        VECTORIZED (int): 1 or 0. 1 means relax all CSR footpaths in bulk, 0 means plain loops.
+        UNRESTRICTED_WALKING (int): 1 or 0. 1 means walks are chained over several footpaths.
+
+    Returns:
+        None
+    '''
+    fp_ptr, fp_to, fp_time = dense_network["fp_ptr"], dense_network["fp_to"], dense_network["fp_time"]
+    marked_stop_copy = np.flatnonzero(marked)
+    if VECTORIZED == 1:
+        while len(marked_stop_copy):
+            starts = fp_ptr[marked_stop_copy]
+            counts = fp_ptr[marked_stop_copy + 1] - starts
+            if counts.sum() == 0:
+                return None
+            edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            from_stop, to_stop = np.repeat(marked_stop_copy, counts), fp_to[edges]
+            new_p_dash_time = label[k, from_stop] + fp_time[edges]
+            order = np.lexsort((new_p_dash_time, to_stop))  # best footpath into every stop comes first
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = to_stop[order][1:] != to_stop[order][:-1]
+            best = order[first]
+            p_dash, new_p_dash_time = to_stop[best], new_p_dash_time[best]
+            improved = (label[k, p_dash] > new_p_dash_time) & (new_p_dash_time < np.minimum(star_label[p_dash], star_label[DESTINATION]))
+            best, p_dash, new_p_dash_time = best[improved], p_dash[improved], new_p_dash_time[improved]
+            label[k, p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+            pi_label["mode"][k, p_dash], pi_label["from_stop"][k, p_dash], pi_label["time"][k, p_dash] = 2, from_stop[best], fp_time[edges[best]]
+            marked[p_dash] = True
+            marked_stop_copy = p_dash if UNRESTRICTED_WALKING == 1 else []  # Walks continue from the improved stops
+    else:
+        marked_stop_copy = deque(marked_stop_copy.tolist())
+        while marked_stop_copy:
+            p = marked_stop_copy.popleft()
+            for e in range(fp_ptr[p], fp_ptr[p + 1]):
+                p_dash = fp_to[e]
+                new_p_dash_time = label[k, p] + fp_time[e]
+                if label[k, p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]):
+                    label[k, p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                    pi_label["mode"][k, p_dash], pi_label["from_stop"][k, p_dash], pi_label["time"][k, p_dash] = 2, p, fp_time[e]
+                    marked[p_dash] = True
+                    if UNRESTRICTED_WALKING == 1:
+                        marked_stop_copy.append(p_dash)  # Walks continue from the improved stops
+    return None
+
+
+def scan_routes_batch(k: int, Q: dict, label, star_label, pi_label: dict, marked, destinations, change_time: int, dense_network: dict) -> None:
+    '''
+    Phase 2 of a RAPTOR round for a batch of label rows (departures or sources). Every route is scanned once and all rows
+    are updated together. Updates label, star_label, pi_label and marked in place.
+
+    Args:
+        k (int): current round.
+        Q (dict): Format {route index: stop index in route}.
+        label (np.ndarray): label array. Format label[round, row, stop index].
+        star_label (np.ndarray): best arrival at every stop. Format star_label[row, stop index].
+        pi_label (dict): dict of pointer arrays (see initialize_dense_raptor).
+        marked (np.ndarray): boolean mask of marked stops. Format marked[row, stop index].
+        destinations (np.ndarray): dense stop index of the destination of every row.
+        change_time (int): change-time in nanoseconds.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+
+    Returns:
+        None
+    '''
+    rows = np.arange(len(destinations))
+    inf_time = np.iinfo(np.int64).max // 4
+    for route, current_stopindex_by_route in Q.items():
+        route_times = dense_network["route_times"][route]
+        current_trip_t = np.full(len(rows), -1)
+        boarding_point, boarding_time = np.zeros(len(rows), dtype=np.int64), np.zeros(len(rows), dtype=np.int64)
+        for p_i in dense_network["route_stops"][route][current_stopindex_by_route:].tolist():
+            on_trip = current_trip_t != -1
+            arr_by_t_at_pi = np.where(on_trip, route_times[current_stopindex_by_route, current_trip_t], inf_time)
+            improved = on_trip & (arr_by_t_at_pi < np.minimum(star_label[:, p_i], star_label[rows, destinations]))
+            if improved.any():
+                label[k, improved, p_i], star_label[improved, p_i] = arr_by_t_at_pi[improved], arr_by_t_at_pi[improved]
+                pi_label["mode"][k, improved, p_i], pi_label["from_stop"][k, improved, p_i] = 1, boarding_point[improved]
+                pi_label["time"][k, improved, p_i] = boarding_time[improved]
+                pi_label["route"][k, improved, p_i], pi_label["trip"][k, improved, p_i] = route, current_trip_t[improved]
+                marked[improved, p_i] = True
+            reboard = np.flatnonzero((label[k - 1, :, p_i] + change_time < arr_by_t_at_pi) & (label[k - 1, :, p_i] < inf_time))
+            if reboard.size:
+                boardable = route_times[current_stopindex_by_route][None, :] >= (label[k - 1, reboard, p_i] + change_time)[:, None]
+                trip_idx = boardable.argmax(axis=1)
+                found = boardable[np.arange(reboard.size), trip_idx]
+                current_trip_t[reboard] = np.where(found, trip_idx, -1)
+                boarding_point[reboard[found]] = p_i
+                boarding_time[reboard[found]] = route_times[current_stopindex_by_route, trip_idx[found]]
+            current_stopindex_by_route = current_stopindex_by_route + 1
+    return None
+
+
+def relax_footpaths_batch(k: int, label, star_label, pi_label: dict, marked, destinations, dense_network: dict) -> None:
+    '''
+    Phase 3 of a RAPTOR round for a batch of label rows. The CSR footpaths of all marked (row, stop) pairs are relaxed in
+    bulk. Updates label, star_label, pi_label and marked in place.
+
+    Args:
+        k (int): current round.
+        label (np.ndarray): label array. Format label[round, row, stop index].
+        star_label (np.ndarray): best arrival at every stop. Format star_label[row, stop index].
+        pi_label (dict): dict of pointer arrays (see initialize_dense_raptor).
+        marked (np.ndarray): boolean mask of marked stops. Format marked[row, stop index].
+        destinations (np.ndarray): dense stop index of the destination of every row.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+
+    Returns:
+        None
+    '''
+    fp_ptr, fp_to, fp_time = dense_network["fp_ptr"], dense_network["fp_to"], dense_network["fp_time"]
+    marked_row, marked_stop_copy = np.nonzero(marked)
+    starts = fp_ptr[marked_stop_copy]
+    counts = fp_ptr[marked_stop_copy + 1] - starts
+    if counts.sum() == 0:
+        return None
+    edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    row, from_stop, to_stop = np.repeat(marked_row, counts), np.repeat(marked_stop_copy, counts), fp_to[edges]
+    new_p_dash_time = label[k, row, from_stop] + fp_time[edges]
+    key = row * marked.shape[1] + to_stop
+    order = np.lexsort((new_p_dash_time, key))  # best footpath into every (row, stop) comes first
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = key[order][1:] != key[order][:-1]
+    best = order[first]
+    row, p_dash, new_p_dash_time = row[best], to_stop[best], new_p_dash_time[best]
+    improved = (label[k, row, p_dash] > new_p_dash_time) & (new_p_dash_time < np.minimum(star_label[row, p_dash], star_label[row, destinations[row]]))
+    best, row, p_dash, new_p_dash_time = best[improved], row[improved], p_dash[improved], new_p_dash_time[improved]
+    label[k, row, p_dash], star_label[row, p_dash] = new_p_dash_time, new_p_dash_time
+    pi_label["mode"][k, row, p_dash], pi_label["from_stop"][k, row, p_dash], pi_label["time"][k, row, p_dash] = 2, from_stop[best], fp_time[edges[best]]
+    marked[row, p_dash] = True
+    return None
+
+
+def apply_departure_domination(k: int, label, star_label, pi_label: dict, marked, carry: dict) -> None:
+    '''
+    Domination between consecutive departures of a batched profile query. Rows are sorted by decreasing departure time
+    and a label of a row is only kept if it is strictly better than the labels of all later departures (earlier rows and
+    carry). Dominated labels and their pointers are inherited from the later departure and are unmarked.
+
+    Args:
+        k (int): current round.
+        label (np.ndarray): label array. Format label[round, row, stop index].
+        star_label (np.ndarray): best arrival at every stop. Format star_label[row, stop index].
+        pi_label (dict): dict of pointer arrays (see initialize_dense_raptor).
+        marked (np.ndarray): boolean mask of marked stops. Format marked[row, stop index].
+        carry (dict): labels of the latest departure before this batch. Keys: 'label', 'star_label', 'pi_label' (same
+        layout as above without the row axis).
+
+    Returns:
+        None
+    '''
+    stacked = np.vstack((carry["label"][k][None, :], label[k]))
+    prefix = np.minimum.accumulate(stacked, axis=0)
+    new = np.vstack((np.ones((1, stacked.shape[1]), dtype=bool), stacked[1:] < prefix[:-1]))
+    source_row = np.maximum.accumulate(np.where(new, np.arange(len(stacked))[:, None], -1), axis=0)[1:]
+    for key in pi_label:
+        pi_label[key][k] = np.take_along_axis(np.vstack((carry["pi_label"][key][k][None, :], pi_label[key][k])), source_row, axis=0)
+    label[k] = prefix[1:]
+    marked &= new[1:]
+    star_label[:] = np.minimum.accumulate(np.vstack((carry["star_label"][None, :], star_label)), axis=0)[1:]
+    return None
+
+
+def get_pi_label_dense(DESTINATION: int, label, pi_label: dict, dense_network: dict) -> tuple:
+    '''
+    Converts the pointer arrays of a dense RAPTOR query into the pi_label/label dicts used by post_processing and
+    post_processing_dhanus. Only the entries on the backtracking paths from DESTINATION are materialized.
+
+    Args:
+        DESTINATION (int): dense stop index of destination stop.
+        label (np.ndarray): label array. Format label[round, stop index].
+        pi_label (dict): dict of pointer arrays (see initialize_dense_raptor).
+        dense_network (dict): dense-index network (see build_save_dense_network).
+
+    Returns:
+        pi_label_dict (dict): Nested dict used for backtracking. Format- {round : {stop_id: pointer_label}}
+        label_dict (dict): nested dict with the arrival at DESTINATION. Format {round : {stop_id: pandas.datetime}}.
+
+    Examples:
+        >>> pi_label_dict, label_dict = get_pi_label_dense(dense_network["stop_index"][52], label, pi_label, dense_network)
+    '''
+    stop_ids, route_ids = dense_network["stop_ids"], dense_network["route_ids"]
+    pi_label_dict = {k: defaultdict(lambda: -1) for k in range(len(label))}
+    label_dict = {k: {} for k in range(len(label))}
+    for k in range(len(label)):
+        if pi_label["mode"][k, DESTINATION] == 0:
+            continue
+        label_dict[k][int(stop_ids[DESTINATION])] = pd.Timestamp(int(label[k, DESTINATION]))
+        stop, n = DESTINATION, k
+        while pi_label["mode"][n, stop] != 0:
+            from_stop = int(pi_label["from_stop"][n, stop])
+            if pi_label["mode"][n, stop] == 2:
+                pi_label_dict[n][int(stop_ids[stop])] = ('walking', int(stop_ids[from_stop]), int(stop_ids[stop]),
+                                                         pd.to_timedelta(int(pi_label["time"][n, stop]), unit='ns'), pd.Timestamp(int(label[n, stop])))
+            else:
+                pi_label_dict[n][int(stop_ids[stop])] = (pd.Timestamp(int(pi_label["time"][n, stop])), int(stop_ids[from_stop]), int(stop_ids[stop]),
+                                                         pd.Timestamp(int(label[n, stop])),
+                                                         f'{route_ids[pi_label["route"][n, stop]]}_{pi_label["trip"][n, stop]}')
+                n = n - 1
+            stop = from_stop
+    return pi_label_dict, label_dict
+
+
+def check_bag_domination(bag: list, key: tuple) -> bool:
+    '''
+    Checks if a label key is weakly dominated by some label in a pareto bag. Bags with two criteria are kept sorted by
+    the first criterion (so the second one is strictly decreasing) and are checked with a binary search.
+
+    Args:
+        bag (list): pareto bag. Format [[key], [label]].
+        key (tuple): integer criteria of the label. Smaller is better in every criterion.
+
+    Returns:
+        True if key is dominated, else False.
+
+    Examples:
+        >>> output = check_bag_domination(bag, (1656567660000000000, 120000000000))
+    '''
+    keys = bag[0]
+    if len(key) == 2:
+        i = bisect_right(keys, key)
+        return i > 0 and keys[i - 1][1] <= key[1]
+    for other in keys:
+        if all(a <= b for a, b in zip(other, key)):
+            return True
+    return False
+
+
+def merge_bag(bag: list, key: tuple, label: tuple) -> bool:
+    '''
+    Inserts a label in a pareto bag if it is not dominated and removes the labels dominated by it.
+
+    Args:
+        bag (list): pareto bag. Format [[key], [label]].
+        key (tuple): integer criteria of the label. Smaller is better in every criterion.
+        label (tuple): label to be inserted.
+
+    Returns:
+        True if the label was inserted, else False.
+
+    Examples:
+        >>> output = merge_bag(bag, (1656567660000000000, 120000000000), label)
+    '''
+    if check_bag_domination(bag, key):
+        return False
+    keys, labels = bag
+    if len(key) == 2:
+        i = j = bisect_right(keys, key)
+        while j < len(keys) and keys[j][1] >= key[1]:
+            j = j + 1
+        keys[i:j], labels[i:j] = [key], [label]
+    else:
+        keep = [x for x, other in enumerate(keys) if not all(a <= b for a, b in zip(key, other))]
+        bag[0], bag[1] = [keys[x] for x in keep] + [key], [labels[x] for x in keep] + [label]
+    return True
+
+
+def insert_mc_label(k: int, p: int, key: tuple, label: tuple, bag: dict, best_bag: dict, DESTINATION: int, marked_stop: set,
+                    budget=None) -> bool:
+    '''
+    Inserts a McRAPTOR label at stop p in round k. The label is pruned if it is dominated by the best bag of p or of
+    DESTINATION (target pruning), or if it does not arrive before budget.
+
+    Args:
+        k (int): current round.
+        p (int): dense stop index.
+        key (tuple): integer criteria of the label.
+        label (tuple): Format (arrival, walking time, in-vehicle time, pointer, parent label). pointer is
+        (1, boarding stop, alighting stop, route index, trip index, boarding time) for trips, (2, from stop, to stop, duration)
+        for footpaths and None at SOURCE.
+        bag (dict): round bags. Format {round: {stop index: [[key], [label]]}}.
+        best_bag (dict): best bag of every stop over all rounds. Format {stop index: [[key], [label]]}.
+        DESTINATION (int): dense stop index of destination stop.
+        marked_stop (set): set of marked stops.
+        budget (int): optional. Travel-duration budget in nanoseconds (D_TIME + MAX_DURATION).
+
+    Returns:
+        True if the label was inserted, else False.
+    '''
+    if budget is not None and label[0] >= budget:
+        return False
+    if check_bag_domination(best_bag[DESTINATION], key) or not merge_bag(best_bag[p], key, label):
+        return False
+    merge_bag(bag[k].setdefault(p, [[], []]), key, label)
+    marked_stop.add(p)
+    return True
+
+
+def post_processing_mcraptor(DESTINATION: int, D_TIME, bag: dict, PRINT_ITINERARY: int, dense_network: dict) -> list:
+    '''
+    Post processing for McRAPTOR. The travel-time breakdown is read directly from the label criteria. Legs are only
+    backtracked when the itinerary is printed.
+
+    Args:
+        DESTINATION (int): dense stop index of destination stop.
+        D_TIME (pandas.datetime): departure time.
+        bag (dict): round bags. Format {round: {stop index: [[key], [label]]}}.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+
+    Returns:
+        mc_out (list): pareto-optimal journeys. Format [{'arrival', 'transfers', 'walk_time', 'wait_time', 'ovtt', 'ivtt'}]
+        with arrival as pandas.datetime and times in seconds (wait_time includes the initial wait after D_TIME).
+
+    Examples:
+        >>> output = post_processing_mcraptor(dense_network["stop_index"][52], D_TIME, bag, 1, dense_network)
+    '''
+    stop_ids, route_ids = dense_network["stop_ids"], dense_network["route_ids"]
+    mc_out, pareto_set = [], []
+    for k in bag.keys():
+        for label in bag[k].get(DESTINATION, [[], []])[1]:
+            arrival, walk_time, ivtt = label[0:3]
+            wait_time = arrival - D_TIME.value - walk_time - ivtt
+            mc_out.append({"arrival": pd.Timestamp(arrival),
+                           "transfers": k - 1,
+                           "walk_time": round(walk_time / 10 ** 9, 2),
+                           "wait_time": round(wait_time / 10 ** 9, 2),
+                           "ovtt": round((walk_time + wait_time) / 10 ** 9, 2),
+                           "ivtt": round(ivtt / 10 ** 9, 2)})
+            if PRINT_ITINERARY == 1:
+                journey = []
+                while label[3] is not None:
+                    pointer = label[3]
+                    if pointer[0] == 2:
+                        journey.append(('walking', int(stop_ids[pointer[1]]), int(stop_ids[pointer[2]]), pd.to_timedelta(pointer[3], unit='ns'), pd.Timestamp(label[0])))
+                    else:
+                        journey.append((pd.Timestamp(pointer[5]), int(stop_ids[pointer[1]]), int(stop_ids[pointer[2]]), pd.Timestamp(label[0]),
+                                        f'{route_ids[pointer[3]]}_{pointer[4]}'))
+                    label = label[4]
+                journey.reverse()
+                pareto_set.append((k - 1, journey))
+    if mc_out == [] and PRINT_ITINERARY == 1:
+        print('DESTINATION cannot be reached with given MAX_TRANSFERS')
+    if PRINT_ITINERARY == 1:
+        _print_Journey_legs(pareto_set)
+    return mc_out
+
+
 def check_stop_validity(stops, SOURCE: int, DESTINATION: int) -> None:
     '''
     Check if the entered SOURCE and DESTINATION stop id are present in stop list or not.
@@ -95,6 +1003,36 @@ def get_latest_trip_new(stoptimes_dict: dict, route: int, arrival_time_at_pi, pi
         return -1, -1  # No trip exsist for this route. in this case check tripid from trip file for this route and then look waybill.ID. Likely that trip is across days thats why it is rejected in stoptimes builder while checking
 
 
+def get_latest_arrival_trip(stoptimes_dict: dict, route: int, departure_time_at_pi, pi_index: int, change_time) -> tuple:
+    '''
+    Get latest trip reaching the given stop of a route before a certain timestamp. Used by reverse RAPTOR.
+
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        route (int): id of route.
+        departure_time_at_pi (pandas.datetime): latest departure time from stop pi.
+        pi_index (int): index of the stop at which route is alighted.
+        change_time (pandas.datetime): change time at stop (set to 0).
+
+    Returns:
+        If a trip exists:
+            trip index, trip
+        else:
+            -1,-1   (e.g. when there is no trip before the given timestamp)
+
+    Examples:
+        >>> output = get_latest_arrival_trip(stoptimes_dict, 1000, pd.to_datetime('2019-06-10 17:40:00'), 5, pd.to_timedelta(0, unit='seconds'))
+    '''
+    try:
+        route_trips = stoptimes_dict[route]
+        for trip_idx in range(len(route_trips) - 1, -1, -1):
+            if route_trips[trip_idx][pi_index][1] <= departure_time_at_pi - change_time:
+                return f'{route}_{trip_idx}', route_trips[trip_idx]
+        return -1, -1  # No trip is found before departure_time_at_pi
+    except KeyError:
+        return -1, -1
+
+
 def post_processing(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, label: dict) -> tuple:
     '''
     Post processing for std_RAPTOR. Currently supported functionality:
@@ -110,7 +1048,7 @@ def post_processing(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, labe
 
     Returns:
         rounds_inwhich_desti_reached (list): list of rounds in which DESTINATION is reached. Format - [int]
-        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]
+        trip_set (list): list of trips ids required to cover optimal journeys (only if PRINT_ITINERARY == 1, else None). Format - [char]
         rap_out (list): list of pareto-optimal arrival timestamps. Format = [(pandas.datetime)]
 
     Examples:
@@ -124,28 +1062,12 @@ def post_processing(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, labe
         return None, None, None
     else:
         rounds_inwhich_desti_reached.reverse()
-        pareto_set = []
-        trip_set = []
         rap_out = [label[k][DESTINATION] for k in rounds_inwhich_desti_reached]
-        for k in rounds_inwhich_desti_reached:
-            transfer_needed = k - 1
-            journey = []
-            stop = DESTINATION
-            while pi_label[k][stop] != -1:
-                journey.append(pi_label[k][stop])
-                mode = pi_label[k][stop][0]
-                if mode == 'walking':
-                    stop = pi_label[k][stop][1]
-                else:
-                    trip_set.append(pi_label[k][stop][-1])
-                    stop = pi_label[k][stop][1]
-                    k = k - 1
-            journey.reverse()
-            pareto_set.append((transfer_needed, journey))
-
+        trip_set = None
         if PRINT_ITINERARY == 1:
-            _print_Journey_legs(pareto_set)
-        #        _save_routesExplored(save_routes, routes_exp)
+            journeys = [LazyJourney(k - 1, k, DESTINATION, pi_label) for k in rounds_inwhich_desti_reached]
+            trip_set = [leg[-1] for journey in journeys for leg in journey.journey if leg[0] != 'walking']
+            _print_Journey_legs([(journey.transfers, journey.journey) for journey in journeys])
         return rounds_inwhich_desti_reached, trip_set, rap_out
 
 
@@ -155,6 +1077,8 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
         1. Rounds in which DESTINATION is reached
         2. Trips for covering pareto optimal set
         3. Pareto optimal timestamps.
+    Journeys are not backtracked here (unless PRINT_ITINERARY == 1). rap_out keeps a reference to pi_label and the legs
+    of a journey and its travel times are only built when they are accessed.
 
     Args:
         DESTINATION (int): stop id of destination stop.
@@ -164,15 +1088,16 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
 
     Returns:
         rounds_inwhich_desti_reached (list): list of rounds in which DESTINATION is reached. Format - [int]
-        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]
-        rap_out (dict):
-            keys: 'old', 'tt'. rap_out['old'] is the output of rap_out of post_processing.
+        trip_set (list): list of trips ids required to cover optimal journeys (only if PRINT_ITINERARY == 1, else None,
+            rap_out.trip_set builds it on demand). Format - [char]
+        rap_out (RaptorOutput):
+            keys: 'old', 'tt', 'journeys'. rap_out['old'] is the output of rap_out of post_processing.
             rap_out['tt'] gives the travel time information in the form
             [(num_transfers, travel_time_dict)]. (see get_t_times for
-            description of travel_time_dict)
+            description of travel_time_dict). rap_out['journeys'] is the list of LazyJourney.
 
     Examples:
-        >>> output = post_processing(1482, pi_label, 1, label)
+        >>> output = post_processing_dhanus(1482, pi_label, 1, label)
     '''
     rounds_inwhich_desti_reached = [x for x in pi_label.keys() if pi_label[x][DESTINATION] != -1]
 
@@ -182,42 +1107,131 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
         return None, None, None
     else:
         rounds_inwhich_desti_reached.reverse()
+        rap_out = RaptorOutput(rounds_inwhich_desti_reached, DESTINATION, pi_label, label)
+        trip_set = None
+        if PRINT_ITINERARY == 1:
+            trip_set = rap_out.trip_set
+            _print_Journey_legs([(journey.transfers, journey.journey) for journey in rap_out.journeys])
+        return rounds_inwhich_desti_reached, trip_set, rap_out
+
+
+def post_processing_multi(egress_dict: dict, pi_label: dict, PRINT_ITINERARY: int, label: dict, access_dict: dict) -> tuple:
+    '''
+    Post processing for multi-source multi-target RAPTOR. Currently supported functionality:
+        1. Rounds in which the target location is reached
+        2. Trips for covering pareto optimal set
+        3. Pareto optimal timestamps (egress time included).
+    An origin stop that is also a target stop is reported in round 0 (access and egress walking only).
+
+    Args:
+        egress_dict (dict): egress time of every target stop. Format {stop id: pandas.timedelta}.
+        pi_label (dict): Nested dict used for backtracking. Primary keys: Round, Secondary keys: stop id. Format- {round : {stop_id: pointer_label}}
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        access_dict (dict): access time of every origin stop. Format {stop id: pandas.timedelta}.
+
+    Returns:
+        rounds_inwhich_desti_reached (list): list of rounds in which the target location is reached. Format - [int]
+        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]
+        rap_out (list): list of pareto-optimal arrival timestamps at the target location. Format = [(pandas.datetime)]
+
+    Examples:
+        >>> output = post_processing_multi(egress_dict, pi_label, 1, label, access_dict)
+    '''
+    pareto_rounds, best_arrival = [], None
+    for k in pi_label.keys():
+        reached = [(label[k][stop] + egress_time, stop) for stop, egress_time in egress_dict.items()
+                   if pi_label[k][stop] != -1 or (k == 0 and stop in access_dict)]
+        if not reached:
+            continue
+        arrival, stop = min(reached, key=lambda x: x[0])
+        if best_arrival is None or arrival < best_arrival:
+            best_arrival = arrival
+            pareto_rounds.append((k, stop, arrival))
+
+    if pareto_rounds == []:
+        if PRINT_ITINERARY == 1:
+            print('DESTINATION cannot be reached with given MAX_TRANSFERS')
+        return None, None, None
+    pareto_rounds.reverse()
+    pareto_set = []
+    trip_set = []
+    rap_out = [arrival for _, _, arrival in pareto_rounds]
+    for k, target_stop, arrival in pareto_rounds:
+        transfer_needed = max(k - 1, 0)
+        journey = []
+        if egress_dict[target_stop] > pd.to_timedelta(0, unit='seconds'):
+            journey.append(('walking', target_stop, 'DESTINATION', egress_dict[target_stop], arrival))
+        stop = target_stop
+        while pi_label[k][stop] != -1:
+            journey.append(pi_label[k][stop])
+            mode = pi_label[k][stop][0]
+            if mode == 'walking':
+                stop = pi_label[k][stop][1]
+            else:
+                trip_set.append(pi_label[k][stop][-1])
+                stop = pi_label[k][stop][1]
+                k = k - 1
+        if access_dict.get(stop, pd.to_timedelta(0, unit='seconds')) > pd.to_timedelta(0, unit='seconds'):
+            journey.append(('walking', 'SOURCE', stop, access_dict[stop], label[0][stop]))
+        journey.reverse()
+        pareto_set.append((transfer_needed, journey))
+
+    if PRINT_ITINERARY == 1:
+        _print_Journey_legs(pareto_set)
+    return [k for k, _, _ in pareto_rounds], trip_set, rap_out
+
+
+def post_processing_reverse(SOURCE: int, pi_label: dict, PRINT_ITINERARY: int, label: dict) -> tuple:
+    '''
+    Post processing for reverse RAPTOR. Currently supported functionality:
+        1. Rounds in which SOURCE is reached
+        2. Trips for covering pareto optimal set
+        3. Pareto optimal latest departure timestamps.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        pi_label (dict): Nested dict used for forward tracking. Primary keys: Round, Secondary keys: stop id. Format- {round : {stop_id: pointer_label}}
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+
+    Returns:
+        rounds_inwhich_source_reached (list): list of rounds in which SOURCE is reached. Format - [int]
+        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]
+        rap_out (list): list of pareto-optimal departure timestamps. Format = [(pandas.datetime)]
+
+    Examples:
+        >>> output = post_processing_reverse(36, pi_label, 1, label)
+    '''
+    rounds_inwhich_source_reached = [x for x in pi_label.keys() if pi_label[x][SOURCE] != -1]
+
+    if rounds_inwhich_source_reached == []:
+        if PRINT_ITINERARY == 1:
+            print('SOURCE cannot be reached with given MAX_TRANSFERS')
+        return None, None, None
+    else:
+        rounds_inwhich_source_reached.reverse()
         pareto_set = []
         trip_set = []
-        rap_out = [label[k][DESTINATION] for k in rounds_inwhich_desti_reached]
-        for k in rounds_inwhich_desti_reached:
+        rap_out = [label[k][SOURCE] for k in rounds_inwhich_source_reached]
+        for k in rounds_inwhich_source_reached:
             transfer_needed = k - 1
             journey = []
-            stop = DESTINATION
+            stop = SOURCE
             while pi_label[k][stop] != -1:
                 journey.append(pi_label[k][stop])
                 mode = pi_label[k][stop][0]
                 if mode == 'walking':
-                    stop = pi_label[k][stop][1]
+                    stop = pi_label[k][stop][2]
                 else:
                     trip_set.append(pi_label[k][stop][-1])
-                    stop = pi_label[k][stop][1]
+                    stop = pi_label[k][stop][2]
                     k = k - 1
-            journey.reverse()
             pareto_set.append((transfer_needed, journey))
 
         if PRINT_ITINERARY == 1:
             _print_Journey_legs(pareto_set)
-        #        _save_routesExplored(save_routes, routes_exp)
-
-        tt_data = []
-        journeys = []
-        for trans, journey in pareto_set:
-            journeys.append(Journey(trans, journey))
-
-            ans_dict = get_t_times(journey)
-            tt_data.append((trans, ans_dict))
-
-        rap_out_new = {"old": rap_out,
-                       "tt": tt_data,
-                       "journeys": journeys}
-
-        return rounds_inwhich_desti_reached, trip_set, rap_out_new
+        return rounds_inwhich_source_reached, trip_set, rap_out
 
 
 def _print_Journey_legs(pareto_journeys: list) -> None:
@@ -352,6 +1366,33 @@ def post_processing_onetomany_rraptor(DESTINATION_LIST: list, pi_label: dict, PR
         return list(set(final_routes))
 
 
+def get_rraptor_profile(DESTINATION: int, pi_label: dict, label: dict, d_time) -> list:
+    '''
+    Collects the journeys of one departure of rRAPTOR as profile records. Used for merging the results of departure
+    blocks (see parallel_range_query). Walking-only journeys (round 0) are not departures of the profile and are skipped.
+
+    Args:
+        DESTINATION (int): stop id of destination stop.
+        pi_label (dict): Nested dict used for backtracking. Primary keys: Round, Secondary keys: stop id. Format- {round : {stop_id: pointer_label}}
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        d_time (pandas.datetime): departure time of the boarded trip.
+
+    Returns:
+        profile (list): Format [(departure time, destination, round, arrival time, [trip ids])]
+
+    Examples:
+        >>> output = get_rraptor_profile(1482, pi_label, label, d_time)
+    '''
+    profile = []
+    for k in pi_label.keys():
+        if k != 0 and pi_label[k][DESTINATION] != -1:
+            journey = LazyJourney(k - 1, k, DESTINATION, pi_label).journey
+            trips = [leg[-1] for leg in journey if leg[0] != 'walking']
+            if trips:
+                profile.append((d_time, DESTINATION, k, label[k][DESTINATION], trips))
+    return profile
+
+
 def post_processing_rraptor(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, label: dict, OPTIMIZED: int) -> list:
     '''
     Full post processing for rRAPTOR. Currently supported functionality:
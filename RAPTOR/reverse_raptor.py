@@ -0,0 +1,123 @@
+"""
+Module contains reverse (arrive-by) RAPTOR implementation.
+"""
+from RAPTOR.raptor_functions import *
+
+
+def reverse_raptor(SOURCE: int, DESTINATION: int, A_TIME, MAX_TRANSFER: int, WALKING_TO_DESTINATION: int, CHANGE_TIME_SEC: int,
+                   PRINT_ITINERARY: int, routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, rev_footpath_dict: dict,
+                   idx_by_route_stop_dict: dict, MAX_DURATION=None) -> list:
+    '''
+    Reverse Raptor implementation. Routes are scanned in reverse stop order starting from the DESTINATION to find the
+    pareto-optimal latest departures from SOURCE such that DESTINATION is reached before A_TIME.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION (int): stop id of destination stop.
+        A_TIME (pandas.datetime): latest arrival time at DESTINATION.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_TO_DESTINATION (int): 1 or 0. 1 indicates walking to the DESTINATION is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        rev_footpath_dict (dict): reversed footpaths (see get_reversed_footpath_dict). Format {to_stop_id: [(from_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels earlier than A_TIME - MAX_DURATION are not set.
+
+    Returns:
+        out (list): list of pareto-optimal departure timestamps from SOURCE.
+
+    Examples:
+        >>> rev_footpath_dict = get_reversed_footpath_dict(footpath_dict)
+        >>> output = reverse_raptor(36, 52, pd.to_datetime('2022-06-30 09:00:00'), 4, 1, 0, 1, routes_by_stop_dict, stops_dict, stoptimes_dict, rev_footpath_dict, idx_by_route_stop_dict)
+        >>> print(f"Optimal departure time are: {output}")
+
+    See Also:
+        RAPTOR
+    '''
+    out = []
+    # Initialization
+    marked_stop, marked_stop_dict, label, pi_label, star_label, neg_inf_time = initialize_reverse_raptor(routes_by_stop_dict, DESTINATION, MAX_TRANSFER)
+    change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
+    (label[0][DESTINATION], star_label[DESTINATION]) = (A_TIME, A_TIME)
+    if MAX_DURATION is not None:
+        star_label[SOURCE] = max(star_label[SOURCE], A_TIME - pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
+    Q = {}  # Format of Q is {route:stop index}
+    if WALKING_TO_DESTINATION == 1:
+        try:
+            trans_info = rev_footpath_dict[DESTINATION]
+            for i in trans_info:
+                (p_dash, to_pdash_time) = i
+                new_p_dash_time = A_TIME - to_pdash_time
+                label[0][p_dash] = new_p_dash_time
+                star_label[p_dash] = new_p_dash_time
+                pi_label[0][p_dash] = ('walking', p_dash, DESTINATION, to_pdash_time, A_TIME)
+                if marked_stop_dict[p_dash] == 0:
+                    marked_stop.append(p_dash)
+                    marked_stop_dict[p_dash] = 1
+        except KeyError:
+            pass
+
+    # Main Code
+    # Main code part 1
+    for k in range(1, MAX_TRANSFER + 1):
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            try:
+                routes_serving_p = routes_by_stop_dict[p]
+                for route in routes_serving_p:
+                    stp_idx = idx_by_route_stop_dict[(route, p)]
+                    try:
+                        Q[route] = max(stp_idx, Q[route])
+                    except KeyError:
+                        Q[route] = stp_idx
+            except KeyError:
+                continue
+
+        # Main code part 2
+        for route, current_stopindex_by_route in Q.items():
+            current_trip_t = -1
+            for p_i in reversed(stops_dict[route][:current_stopindex_by_route + 1]):
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] > max(star_label[p_i], star_label[SOURCE]):
+                    dep_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
+                    label[k][p_i], star_label[p_i] = dep_by_t_at_pi, dep_by_t_at_pi
+                    pi_label[k][p_i] = (dep_by_t_at_pi, p_i, alighting_point, alighting_time, tid)
+                    if marked_stop_dict[p_i] == 0:
+                        marked_stop.append(p_i)
+                        marked_stop_dict[p_i] = 1
+                if current_trip_t == -1 or label[k - 1][p_i] - change_time > current_trip_t[current_stopindex_by_route][
+                    1]:  # assuming arrival_time = departure_time
+                    tid, current_trip_t = get_latest_arrival_trip(stoptimes_dict, route, label[k - 1][p_i], current_stopindex_by_route, change_time)
+                    if current_trip_t == -1:
+                        alighting_time, alighting_point = -1, -1
+                    else:
+                        alighting_point = p_i
+                        alighting_time = current_trip_t[current_stopindex_by_route][1]
+                current_stopindex_by_route = current_stopindex_by_route - 1
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            try:
+                trans_info = rev_footpath_dict[p]
+                for i in trans_info:
+                    (p_dash, to_pdash_time) = i
+                    new_p_dash_time = label[k][p] - to_pdash_time
+                    if label[k][p_dash] < new_p_dash_time and new_p_dash_time > max(star_label[p_dash], star_label[SOURCE]):
+                        label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        pi_label[k][p_dash] = ('walking', p_dash, p, to_pdash_time, label[k][p])
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            except KeyError:
+                continue
+        # Main code End
+        if marked_stop == deque([]):
+            break
+    _, _, rap_out = post_processing_reverse(SOURCE, pi_label, PRINT_ITINERARY, label)
+    out.append(rap_out)
+    return out
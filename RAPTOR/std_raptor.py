@@ -5,7 +5,8 @@ Module contains RAPTOR implementation.
 from RAPTOR.raptor_functions import *
 
 def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
-           routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict) -> list:
+           routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict,
+           lower_bound=None, MAX_DURATION=None, stop_cell=None, arc_flags=None, UNRESTRICTED_WALKING=0) -> list:
     '''
     Standard Raptor implementation
 
@@ -22,6 +23,15 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        lower_bound (dict): optional. Lower bounds on travel time to DESTINATION (see get_lower_bounds). Labels that cannot
+        improve the arrival at DESTINATION even with these bounds are pruned.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
+        stop_cell (dict): optional. Format {stop_id: cell id} (see build_save_route_arc_flags).
+        arc_flags (dict): optional. Format {cell id: set of route ids}. If given, routes whose flag for the cell of
+        DESTINATION is unset are not scanned.
+        UNRESTRICTED_WALKING (int): 1 or 0. 0 means a single footpath is taken after every trip, which requires a
+        transitively closed footpath graph (transfers.txt). 1 means walks are chained over several footpaths with a
+        Dijkstra search, so the sparse footpath graph (transfers_sparse.txt, see build_transfer_file.py) can be used.
 
     Returns:
         out (list): list of pareto-optimal arrival timestamps.
@@ -39,8 +49,14 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
     marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
     change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
     (label[0][SOURCE], star_label[SOURCE]) = (D_TIME, D_TIME)
+    if arc_flags is not None:
+        reduced_routes = arc_flags[stop_cell[DESTINATION]]
+    if MAX_DURATION is not None:
+        star_label[DESTINATION] = min(star_label[DESTINATION], D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
     Q = {}  # Format of Q is {route:stop index}
-    if WALKING_FROM_SOURCE == 1:
+    if WALKING_FROM_SOURCE == 1 and UNRESTRICTED_WALKING == 1:
+        relax_walking_dijkstra(0, [SOURCE], footpath_dict, label, star_label, pi_label, DESTINATION, marked_stop, marked_stop_dict)
+    elif WALKING_FROM_SOURCE == 1:
         try:
             trans_info = footpath_dict[SOURCE]
             for i in trans_info:
@@ -64,6 +80,8 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
             try:
                 routes_serving_p = routes_by_stop_dict[p]
                 for route in routes_serving_p:
+                    if arc_flags is not None and route not in reduced_routes:
+                        continue
                     stp_idx = idx_by_route_stop_dict[(route, p)]
                     try:
                         Q[route] = min(stp_idx, Q[route])
@@ -76,7 +94,8 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
         for route, current_stopindex_by_route in Q.items():
             current_trip_t = -1
             for p_i in stops_dict[route][current_stopindex_by_route:]:
-                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], star_label[DESTINATION]):
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], star_label[DESTINATION]) \
+                        and (lower_bound is None or (p_i in lower_bound and current_trip_t[current_stopindex_by_route][1] + lower_bound[p_i] < star_label[DESTINATION])):
                     arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
                     label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
                     pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
@@ -95,20 +114,24 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
 
         # Main code part 3
         marked_stop_copy = [*marked_stop]
-        for p in marked_stop_copy:
-            try:
-                trans_info = footpath_dict[p]
-                for i in trans_info:
-                    (p_dash, to_pdash_time) = i
-                    new_p_dash_time = label[k][p] + to_pdash_time
-                    if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]):
-                        label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
-                        pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
-                        if marked_stop_dict[p_dash] == 0:
-                            marked_stop.append(p_dash)
-                            marked_stop_dict[p_dash] = 1
-            except KeyError:
-                continue
+        if UNRESTRICTED_WALKING == 1:
+            relax_walking_dijkstra(k, marked_stop_copy, footpath_dict, label, star_label, pi_label, DESTINATION, marked_stop, marked_stop_dict, lower_bound)
+        else:
+            for p in marked_stop_copy:
+                try:
+                    trans_info = footpath_dict[p]
+                    for i in trans_info:
+                        (p_dash, to_pdash_time) = i
+                        new_p_dash_time = label[k][p] + to_pdash_time
+                        if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]) \
+                                and (lower_bound is None or (p_dash in lower_bound and new_p_dash_time + lower_bound[p_dash] < star_label[DESTINATION])):
+                            label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                            pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
+                            if marked_stop_dict[p_dash] == 0:
+                                marked_stop.append(p_dash)
+                                marked_stop_dict[p_dash] = 1
+                except KeyError:
+                    continue
         # Main code End
         if marked_stop == deque([]):
             if PRINT_ITINERARY == 1:
@@ -121,7 +144,7 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
 
 
 def raptor_dhanus(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
-           routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict) -> list:
+           routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, MAX_DURATION=None) -> list:
     '''
     Standard Raptor implementation
 
@@ -138,6 +161,7 @@ def raptor_dhanus(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALK
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
 
     Returns:
         out (list): list of pareto-optimal arrival timestamps.
@@ -155,6 +179,8 @@ def raptor_dhanus(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALK
     marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
     change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
     (label[0][SOURCE], star_label[SOURCE]) = (D_TIME, D_TIME)
+    if MAX_DURATION is not None:
+        star_label[DESTINATION] = min(star_label[DESTINATION], D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
     Q = {}  # Format of Q is {route:stop index}
     if WALKING_FROM_SOURCE == 1:
         try:
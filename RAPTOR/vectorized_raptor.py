@@ -0,0 +1,71 @@
+"""
+Module contains RAPTOR implementation on the dense-index (NumPy) network.
+"""
+from RAPTOR.raptor_functions import *
+
+
+def vectorized_raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int,
+                      PRINT_ITINERARY: int, dense_network: dict, VECTORIZED: int = 1, UNRESTRICTED_WALKING: int = 0,
+                      MAX_DURATION=None) -> list:
+    '''
+    Raptor implementation on the dense-index network. Phase 1 (route collection) and phase 3 (footpath relaxation) work on
+    marked-stop masks and can be run as bulk NumPy operations.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION (int): stop id of destination stop.
+        D_TIME (pandas.datetime): departure time.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        VECTORIZED (int): 1 or 0. 1 means phase 1 and phase 3 use NumPy bulk operations, 0 means plain loops.
+        UNRESTRICTED_WALKING (int): 1 or 0. 0 means a single footpath is taken after every trip, which requires a
+        transitively closed footpath graph (as in raptor). 1 means walks are chained over several footpaths.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Labels later than D_TIME + MAX_DURATION are not set.
+
+    Returns:
+        out (list): list of pareto-optimal arrival timestamps.
+
+    Examples:
+        >>> output = vectorized_raptor(36, 52, pd.to_datetime('2022-06-30 05:41:00'), 4, 1, 0, 1, dense_network, 1)
+        >>> print(f"Optimal arrival time are: {output}")
+
+    See Also:
+        RAPTOR
+    '''
+    out = []
+    # Initialization
+    marked, label, star_label, pi_label, inf_time = initialize_dense_raptor(dense_network, MAX_TRANSFER)
+    change_time = CHANGE_TIME_SEC * 10 ** 9
+    source, destination = dense_network["stop_index"][SOURCE], dense_network["stop_index"][DESTINATION]
+    label[0, source], star_label[source] = D_TIME.value, D_TIME.value
+    marked[source] = True
+    if MAX_DURATION is not None:
+        star_label[destination] = min(star_label[destination], D_TIME.value + MAX_DURATION * 10 ** 9)  # Travel-duration budget
+    if WALKING_FROM_SOURCE == 1 and UNRESTRICTED_WALKING == 1:
+        relax_footpaths_dense(0, label, star_label, pi_label, marked, destination, dense_network, VECTORIZED, UNRESTRICTED_WALKING)
+    elif WALKING_FROM_SOURCE == 1:
+        fp_ptr, fp_to, fp_time = dense_network["fp_ptr"], dense_network["fp_to"], dense_network["fp_time"]
+        for e in range(fp_ptr[source], fp_ptr[source + 1]):
+            p_dash = fp_to[e]
+            label[0, p_dash], star_label[p_dash] = D_TIME.value + fp_time[e], D_TIME.value + fp_time[e]
+            pi_label["mode"][0, p_dash], pi_label["from_stop"][0, p_dash], pi_label["time"][0, p_dash] = 2, source, fp_time[e]
+            marked[p_dash] = True
+
+    # Main Code
+    for k in range(1, MAX_TRANSFER + 1):
+        # Main code part 1
+        Q = collect_routes_dense(marked, dense_network, VECTORIZED)
+        # Main code part 2
+        scan_routes_dense(k, Q, label, star_label, pi_label, marked, destination, change_time, dense_network)
+        # Main code part 3
+        relax_footpaths_dense(k, label, star_label, pi_label, marked, destination, dense_network, VECTORIZED, UNRESTRICTED_WALKING)
+        # Main code End
+        if not marked.any():
+            break
+    pi_label_dict, label_dict = get_pi_label_dense(destination, label, pi_label, dense_network)
+    _, _, rap_out = post_processing(DESTINATION, pi_label_dict, PRINT_ITINERARY, label_dict)
+    out.append(rap_out)
+    return out
@@ -1,10 +1,77 @@
 """
 Module contains function related to TBTR, rTBTR, One-To-Many rTBTR, HypTBTR
 """
-from collections import defaultdict
+from array import array
+from collections import defaultdict, OrderedDict
+from types import MappingProxyType
 
+import numpy as np
 import pandas as pd
 
+from RAPTOR.journey_rep import Journey
+from RAPTOR.raptor_functions import get_departures, get_lower_bounds, get_partition_mask, get_t_times, _print_Journey_legs
+
+DESTI_CACHE_SIZE = 512  # Maximum number of destination L structures kept by initialize_from_desti
+_desti_cache = OrderedDict()  # Format {key (see _get_desti_key): (network dicts, L)}
+_desti_cache_stats = {'hits': 0, 'misses': 0}
+
+
+class TripSegmentQueue:
+    '''
+    Queue of trip-segments of one TBTR round stored as growable struct-of-arrays. Segment i covers the stop indices
+    [from_idx[i], to_idx[i]) of trip tid[i] (trip trip_idx[i] of route route[i]), and was reached from segment parent[i]
+    of the previous round by alighting at stop index parent_stop[i]. Seeds have parent -1.
+    The arrays are only grown (by doubling), so a cleared queue is reused without allocation.
+    '''
+    __slots__ = ('size', 'from_idx', 'to_idx', 'route', 'trip_idx', 'parent', 'parent_stop', 'tid')
+
+    def __init__(self, capacity: int = 64):
+        self.size = 0
+        self.from_idx = array('l', [0]) * capacity
+        self.to_idx = array('l', [0]) * capacity
+        self.route = array('l', [0]) * capacity
+        self.trip_idx = array('l', [0]) * capacity
+        self.parent = array('l', [0]) * capacity
+        self.parent_stop = array('l', [0]) * capacity
+        self.tid = [None] * capacity
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, from_idx: int, to_idx: int, route: int, trip_idx: int, tid: str, parent: int, parent_stop: int) -> None:
+        i = self.size
+        if i == len(self.tid):
+            for arr in (self.from_idx, self.to_idx, self.route, self.trip_idx, self.parent, self.parent_stop, self.tid):
+                arr.extend(arr)
+        self.from_idx[i] = from_idx
+        self.to_idx[i] = to_idx
+        self.route[i] = route
+        self.trip_idx[i] = trip_idx
+        self.tid[i] = tid
+        self.parent[i] = parent
+        self.parent_stop[i] = parent_stop
+        self.size = i + 1
+
+    def clear(self) -> None:
+        self.size = 0
+
+
+def initialize_queue(MAX_TRANSFER: int) -> list:
+    '''
+    Allocates the round queues of TBTR.
+
+    Args:
+        MAX_TRANSFER (int): maximum transfer limit.
+
+    Returns:
+        Q (list): list of TripSegmentQueue, one per round.
+
+    Examples:
+        >>> output = initialize_queue(4)
+    '''
+    return [TripSegmentQueue() for x in range(MAX_TRANSFER + 2)]
+
+
 def initialize_tbtr(MAX_TRANSFER: int)-> dict:
     '''
     Initialize values for TBTR.
@@ -45,6 +112,27 @@ def initialize_onemany(MAX_TRANSFER: int, DESTINATION_LIST: list) -> tuple:
     return J, inf_time
 
 
+def _get_desti_key(routes_by_stop_dict: dict, stops_dict: dict, DESTINATION: int, footpath_dict: dict, idx_by_route_stop_dict: dict) -> tuple:
+    '''
+    Key of the L structure of DESTINATION in the destination cache. It contains every input of initialize_from_desti: the
+    network dicts are identified by id and size, and the footpaths and routes of DESTINATION are included by value, so
+    that a dict rebuilt in place under the same id gets a new key.
+
+    Args:
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        DESTINATION (int): stop id of destination stop.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+
+    Returns:
+        key (tuple): cache key.
+    '''
+    network = (routes_by_stop_dict, stops_dict, footpath_dict, idx_by_route_stop_dict)
+    return (DESTINATION, tuple(footpath_dict.get(DESTINATION, ())), tuple(routes_by_stop_dict.get(DESTINATION, ())),
+            *[(id(x), len(x)) for x in network])
+
+
 def initialize_from_desti(routes_by_stop_dict: dict, stops_dict: dict, DESTINATION: int, footpath_dict: dict, idx_by_route_stop_dict: dict) -> dict:
     '''
     Initialize routes/footpath to leading to destination stop.
@@ -57,12 +145,22 @@ def initialize_from_desti(routes_by_stop_dict: dict, stops_dict: dict, DESTINATI
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
 
     Returns:
-        L (dict): A dict to track routes/leading to destination stop. Format {route_id: (from_stop_idx, travel time, stop id)}
+        L (mappingproxy): A read-only dict to track routes/leading to destination stop. Format {route_id: ((stop index in route, travel time, stop id), )}.
+        The stop index lets the engines check a trip segment with an index-range comparison.
+        L is served from a bounded LRU cache keyed by all inputs (see _get_desti_key).
 
     Examples:
         >>> output = initialize_from_desti(routes_by_stop_dict, stops_dict, 1482, footpath_dict, idx_by_route_stop_dict)
         >>> print(output)
     '''
+    key = _get_desti_key(routes_by_stop_dict, stops_dict, DESTINATION, footpath_dict, idx_by_route_stop_dict)
+    try:
+        L_dict = _desti_cache[key][1]
+        _desti_cache.move_to_end(key)
+        _desti_cache_stats['hits'] += 1
+        return L_dict
+    except KeyError:
+        _desti_cache_stats['misses'] += 1
     L_dict = defaultdict(lambda: [])
     try:
         transfer_to_desti = footpath_dict[DESTINATION]
@@ -78,7 +176,38 @@ def initialize_from_desti(routes_by_stop_dict: dict, stops_dict: dict, DESTINATI
     delta_tau = pd.to_timedelta(0, unit="seconds")
     for route in routes_by_stop_dict[DESTINATION]:
         L_dict[route].append((idx_by_route_stop_dict[(route, DESTINATION)], delta_tau, DESTINATION))
-    return dict(L_dict)
+    L_dict = MappingProxyType({route: tuple(last_legs) for route, last_legs in L_dict.items()})
+    # The network dicts are kept in the entry, so their ids cannot be reused while the entry is cached.
+    _desti_cache[key] = ((routes_by_stop_dict, stops_dict, footpath_dict, idx_by_route_stop_dict), L_dict)
+    while len(_desti_cache) > DESTI_CACHE_SIZE:
+        _desti_cache.popitem(last=False)
+    return L_dict
+
+
+def desti_cache_info() -> dict:
+    '''
+    Returns statistics of the destination cache used by initialize_from_desti.
+
+    Returns:
+        info (dict): keys: 'hits', 'misses', 'size', 'maxsize'.
+
+    Examples:
+        >>> output = desti_cache_info()
+        >>> print(output)
+    '''
+    return {'hits': _desti_cache_stats['hits'], 'misses': _desti_cache_stats['misses'], 'size': len(_desti_cache), 'maxsize': DESTI_CACHE_SIZE}
+
+
+def clear_desti_cache() -> None:
+    '''
+    Empties the destination cache used by initialize_from_desti and resets its statistics. Must be called if a network
+    dict is edited in place without changing its size or the footpaths and routes of the destination.
+
+    Returns:
+        None
+    '''
+    _desti_cache.clear()
+    _desti_cache_stats['hits'], _desti_cache_stats['misses'] = 0, 0
 
 
 def initialize_from_desti_onemany(routes_by_stop_dict: dict, stops_dict: dict, DESTINATION_LIST: list, footpath_dict: dict,
@@ -94,31 +223,18 @@ def initialize_from_desti_onemany(routes_by_stop_dict: dict, stops_dict: dict, D
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
 
     Returns:
-        L (nested dict): A dict to track routes/leading to destination stops. Key: route_id, value: {destination_stop_id: [(from_stop_idx, travel time, stop id)]}
+        L (dict): A dict to track routes leading to the destination stops, indexed by route so that a trip-segment only
+        touches the destinations its route serves. Format {route_id: [(stop index in route, travel time, stop id, destination stop id)]}
 
     Examples:
         >>> output = initialize_from_desti_onemany(routes_by_stop_dict, stops_dict, [1482], footpath_dict, idx_by_route_stop_dict)
         >>> print(output)
     '''
-    L_dict_final = {}
+    L_dict = defaultdict(lambda: [])
     for destination in DESTINATION_LIST:
-        L_dict = defaultdict(lambda: [])
-        try:
-            transfer_to_desti = footpath_dict[destination]
-            for from_stop, foot_time in transfer_to_desti:
-                try:
-                    walkalble_desti_route = routes_by_stop_dict[from_stop]
-                    for route in walkalble_desti_route:
-                        L_dict[route].append((idx_by_route_stop_dict[(route, from_stop)], foot_time, from_stop))
-                except KeyError:
-                    pass
-        except KeyError:
-            pass
-        delta_tau = pd.to_timedelta(0, unit="seconds")
-        for route in routes_by_stop_dict[destination]:
-            L_dict[route].append((idx_by_route_stop_dict[(route, destination)], delta_tau, destination))
-        L_dict_final[destination] = dict(L_dict)
-    return L_dict_final
+        for route, last_legs in initialize_from_desti(routes_by_stop_dict, stops_dict, destination, footpath_dict, idx_by_route_stop_dict).items():
+            L_dict[route].extend([(*last_leg, destination) for last_leg in last_legs])
+    return dict(L_dict)
 
 
 def initialize_from_source(footpath_dict: dict, SOURCE: int, routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict,
@@ -138,16 +254,15 @@ def initialize_from_source(footpath_dict: dict, SOURCE: int, routes_by_stop_dict
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
 
     Returns:
-        R_t (dict): dict to store first reached stop of every trip. Format {trip_id: first reached stop}
-        Q (list): list of trips segments
+        R_t (dict): dict to store first reached stop of every trip. Format {route_id: np.ndarray of first reached stop index by trip index}
+        Q (list): list of TripSegmentQueue, one per round.
 
     Examples:
         >>> output = initialize_from_source(footpath_dict, 20775, routes_by_stop_dict, stops_dict, stoptimes_dict, pd.to_datetime('2019-06-10 00:00:00'), 4, 1, idx_by_route_stop_dict)
         >>> print(output)
     '''
-    Q = [[] for x in range(MAX_TRANSFER + 2)]
-#    R_t = {f"{r}_{tid}": 1000 for r, r_trips in stoptimes_dict.items() for tid in range(len(r_trips))}
-    R_t = defaultdict(lambda: 1000) # assuming maximum route length is 1000
+    Q = initialize_queue(MAX_TRANSFER)
+    R_t = {}  # Arrays are allocated on first use (see get_reached_index)
     connection_list = []
     if WALKING_FROM_SOURCE == 1:
         try:
@@ -160,7 +275,7 @@ def initialize_from_source(footpath_dict: dict, SOURCE: int, routes_by_stop_dict
                     route_trip = stoptimes_dict[route]
                     for trip_idx, trip in enumerate(route_trip):
                         if D_TIME + footpath_time <= trip[stop_index][1]:
-                            connection_list.append((f'{route}_{trip_idx}', stop_index))
+                            connection_list.append((f'{route}_{trip_idx}', stop_index, -1))
                             break
         except KeyError:
             pass
@@ -170,36 +285,137 @@ def initialize_from_source(footpath_dict: dict, SOURCE: int, routes_by_stop_dict
         route_trip = stoptimes_dict[route]
         for trip_idx, trip in enumerate(route_trip):
             if D_TIME <= trip[stop_index][1]:
-                connection_list.append((f'{route}_{trip_idx}', stop_index))
+                connection_list.append((f'{route}_{trip_idx}', stop_index, -1))
                 break
-    enqueue(connection_list, 1, (0, 0), R_t, Q, stoptimes_dict)
+    enqueue(connection_list, 1, -1, R_t, Q, stoptimes_dict)
     return R_t, Q
 
 
-def enqueue(connection_list: list, nextround: int, predecessor_label: tuple, R_t: dict, Q: list, stoptimes_dict: dict) -> None:
+def get_reached_index(R_t: dict, route: int, stoptimes_dict: dict, no_of_rounds=None):
+    '''
+    Returns the first-reached-stop array of a route, allocating it on first use. Unreached trips hold the route length.
+
+    Args:
+        R_t (dict): Format {route_id: np.ndarray}.
+        route (int): id of route.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        no_of_rounds (int): optional. If given, the array is indexed by [round, trip index] (range queries),
+        otherwise by trip index.
+
+    Returns:
+        reached (np.ndarray): first reached stop index of every trip of route.
+    '''
+    try:
+        return R_t[route]
+    except KeyError:
+        shape = len(stoptimes_dict[route]) if no_of_rounds is None else (no_of_rounds, len(stoptimes_dict[route]))
+        R_t[route] = np.full(shape, len(stoptimes_dict[route][0]), dtype=np.int64)
+        return R_t[route]
+
+
+def enqueue(connection_list: list, nextround: int, parent: int, R_t: dict, Q: list, stoptimes_dict: dict, trip_mask=None,
+            trip_offset=None) -> None:
     '''
     Main enqueue function used in TBTR to add trips segments to next round and update first reached stop of each trip.
 
     Args:
-        connection_list (list): list of connections to be added. Format: [(to_trip_id, to_trip_id_stop_index)].
+        connection_list (list): list of connections to be added. Format: [(to_trip_id, to_trip_id_stop_index, from_trip_stop_index)].
         nextround (int): next round/transfer number to which trip-segments are added.
-        predecessor_label (tuple): used for backtracking journey ( To be developed ).
-        R_t (dict): dict with keys as trip id. Format {trip_id : first reached stop}.
-        Q (list): list of trips segments.
+        parent (int): index of the from trip-segment in Q[nextround - 1]. -1 for seeds.
+        R_t (dict): dict with keys as route id. Format {route_id: np.ndarray of first reached stop index by trip index}.
+        Q (list): list of TripSegmentQueue, one per round.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        trip_mask (np.ndarray): optional. Trips allowed by the partitions, indexed by dense trip index (HypTBTR).
+        trip_offset (np.ndarray): optional. First dense trip index of every route id (HypTBTR).
+
+    Returns:
+        None
+    '''
+    for to_trip_id, to_trip_id_stop, from_trip_stop in connection_list:
+        route, tid = [int(x) for x in to_trip_id.split("_")]
+        if trip_mask is not None and not trip_mask[trip_offset[route] + tid]:
+            continue
+        reached = get_reached_index(R_t, route, stoptimes_dict)
+        if to_trip_id_stop < reached[tid]:
+            Q[nextround].append(to_trip_id_stop, int(reached[tid]), route, tid, to_trip_id, parent, from_trip_stop)
+            # reached is non-increasing in trip index (FIFO), so the update stops at the first later trip reached earlier.
+            x = tid
+            while x < len(reached) and reached[x] > to_trip_id_stop:
+                reached[x] = to_trip_id_stop
+                x = x + 1
+
+
+def initialize_onetoall(MAX_TRANSFER: int, routes_by_stop_dict: dict, footpath_dict: dict) -> tuple:
+    '''
+    Initialize the per-round arrival arrays of one-to-all TBTR. Arrival times are int64 nanoseconds. Stops are mapped to
+    consecutive column indices, so the arrays only have one column per stop of the network.
+
+    Args:
+        MAX_TRANSFER (int): maximum transfer limit.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+
+    Returns:
+        label (np.ndarray): earliest arrival at every stop using at most round trips. Format label[round, stop_index[stop id]].
+        trip_label (np.ndarray): earliest arrival at every stop by a trip (without the final footpath). Same format as label.
+        stop_index (dict): column of every stop in label. Format {stop_id: column}.
+        inf_time (int): Variable indicating infinite time.
+
+    Examples:
+        >>> output = initialize_onetoall(4, routes_by_stop_dict, footpath_dict)
+    '''
+    inf_time = np.iinfo(np.int64).max // 4
+    stop_set = set(routes_by_stop_dict.keys())
+    for from_stop, connections in footpath_dict.items():
+        stop_set.add(int(from_stop))
+        stop_set.update([int(to_stop) for to_stop, _ in connections])
+    stop_index = {stop: column for column, stop in enumerate(sorted(stop_set))}
+    label = np.full((MAX_TRANSFER + 1, len(stop_index)), inf_time, dtype=np.int64)
+    trip_label = np.full((MAX_TRANSFER + 1, len(stop_index)), inf_time, dtype=np.int64)
+    return label, trip_label, stop_index, inf_time
+
+
+def update_stop_labels(trip: list, from_stop: int, to_stop: int, n: int, label, trip_label, footpath_dict: dict, stop_index: dict,
+                       budget: int, written=None) -> None:
+    '''
+    Writes the arrival times of a trip-segment to all the stops it covers and to their footpath neighbours. Used in
+    one-to-all TBTR. Footpaths are only relaxed from stops whose trip arrival improves, since a walk is never chained.
+
+    Args:
+        trip (list): stop times of the trip. Format [(stop id, pandas.datetime)].
+        from_stop (int): boarding stop index of the segment.
+        to_stop (int): end stop index of the segment (exclusive).
+        n (int): round number.
+        label (np.ndarray): Format label[round, column] (see initialize_onetoall).
+        trip_label (np.ndarray): Format trip_label[round, column] (see initialize_onetoall).
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        stop_index (dict): column of every stop in label. Format {stop_id: column}.
+        budget (int): arrivals at or after budget (int64 nanoseconds) are not written.
+        written (list): optional. Columns whose label is written are appended (used for range profiles).
 
     Returns:
         None
     '''
-    for to_trip_id, to_trip_id_stop in connection_list:
-        if to_trip_id_stop < R_t[to_trip_id]:
-            route, tid = [int(x) for x in to_trip_id.split("_")]
-            Q[nextround].append((to_trip_id_stop, to_trip_id, R_t[to_trip_id], route, tid, predecessor_label))
-            for x in range(tid, len(stoptimes_dict[route])):
-                new_tid = f"{route}_{x}"
-                # R_t[new_tid] = min(R_t[new_tid], to_trip_id_stop)
-                if R_t[new_tid] > to_trip_id_stop:
-                    R_t[new_tid] = to_trip_id_stop
+    label_n, trip_label_n = label[n], trip_label[n]
+    for stop_idx in range(from_stop + 1, to_stop):
+        stop, arrival_time = trip[stop_idx]
+        arrival_time = arrival_time.value
+        if arrival_time >= budget:
+            break
+        column = stop_index[stop]
+        if arrival_time < trip_label_n[column]:
+            trip_label_n[column] = arrival_time
+            if arrival_time < label_n[column]:
+                label_n[column] = arrival_time
+                if written is not None:
+                    written.append(column)
+            for p_dash, to_pdash_time in footpath_dict.get(stop, ()):
+                p_dash = stop_index[p_dash]
+                new_p_dash_time = arrival_time + to_pdash_time.value
+                if new_p_dash_time < label_n[p_dash] and new_p_dash_time < budget:
+                    label_n[p_dash] = new_p_dash_time
+                    if written is not None:
+                        written.append(p_dash)
 
 
 def update_label(label, no_of_transfer: int, predecessor_label: tuple, J: dict, MAX_TRANSFER: int) -> dict:
@@ -209,7 +425,7 @@ def update_label(label, no_of_transfer: int, predecessor_label: tuple, J: dict,
     Args:
         label (pandas.datetime): optimal arrival time .
         no_of_transfer (int): number of transfer.
-        predecessor_label (tuple): predecessor_label for backtracking (To be developed)
+        predecessor_label (tuple): parent pointer used for backtracking. Format (trip id, walking, index of the trip-segment in Q[no_of_transfer], alighting stop index)
         J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
         MAX_TRANSFER (int): maximum transfer limit.
 
@@ -232,7 +448,7 @@ def post_process_range(J: dict, Q: list, rounds_desti_reached: list, PRINT_ITINE
 
     Args:
         J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
-        Q (list): list of trips segments.
+        Q (list): list of TripSegmentQueue, one per round.
         rounds_desti_reached (list): Rounds in which DESTINATION is reached.
         PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
         DESTINATION (int): stop id of destination stop.
@@ -248,22 +464,41 @@ def post_process_range(J: dict, Q: list, rounds_desti_reached: list, PRINT_ITINE
         necessory_trips (set): trips needed to cover pareto-optimal journeys.
     '''
     rounds_desti_reached = list(set(rounds_desti_reached))
+    journeys = [(x - 1, get_tbtr_journey(J, Q, x, DESTINATION, SOURCE, footpath_dict, stoptimes_dict, d_time)) for x in reversed(rounds_desti_reached)]
     if PRINT_ITINERARY == 1:
-        _print_tbtr_journey(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, d_time, MAX_TRANSFER, trip_transfer_dict, rounds_desti_reached)
-    necessory_trips = []
-    for transfer_needed in reversed(rounds_desti_reached):
-        no_of_transfer = transfer_needed
-        current_trip = J[transfer_needed][1][0]
-        journey = []
-        while current_trip != 0:
-            journey.append(current_trip)
-            current_trip = [x for x in Q[no_of_transfer] if x[1] == current_trip][-1][-1][0]
-            no_of_transfer = no_of_transfer - 1
-        necessory_trips.extend(journey)
+        _print_Journey_legs(journeys)
+    necessory_trips = [leg[-1] for _, journey in journeys for leg in journey if leg[0] != 'walking']
     return set(necessory_trips)
 
 
-def initialize_from_source_range(dep_details: list, MAX_TRANSFER: int, stoptimes_dict: dict, R_t: dict) -> list:
+def get_range_profile(J: dict, Q: list, rounds_desti_reached: list, DESTINATION: int, SOURCE: int, footpath_dict: dict,
+                      stoptimes_dict: dict, d_time) -> list:
+    '''
+    Collects the journeys of one departure of a range query as profile records. Used for merging the results of departure
+    blocks (see parallel_range_query).
+
+    Args:
+        J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
+        Q (list): list of TripSegmentQueue, one per round.
+        rounds_desti_reached (list): Rounds in which DESTINATION is reached.
+        DESTINATION (int): stop id of destination stop.
+        SOURCE (int): stop id of source stop.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        d_time (pandas.datetime): departure time of the boarded trip.
+
+    Returns:
+        profile (list): Format [(departure time, destination, round, arrival time, [trip ids])]
+    '''
+    profile = []
+    for x in sorted(set(rounds_desti_reached)):
+        journey = get_tbtr_journey(J, Q, x, DESTINATION, SOURCE, footpath_dict, stoptimes_dict, d_time)
+        arrival_time = journey[-1][4] if journey[-1][0] == 'walking' else journey[-1][3]
+        profile.append((d_time, DESTINATION, x, arrival_time, [leg[-1] for leg in journey if leg[0] != 'walking']))
+    return profile
+
+
+def initialize_from_source_range(dep_details: list, MAX_TRANSFER: int, stoptimes_dict: dict, R_t: dict, Q: list) -> None:
     '''
     Initialize trips segments from source in rTBTR
 
@@ -271,45 +506,106 @@ def initialize_from_source_range(dep_details: list, MAX_TRANSFER: int, stoptimes
         dep_details (list): list of format [trip id, departure time, source index]
         MAX_TRANSFER (int): maximum transfer limit.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
-        R_t (nested dict): Nested_Dict with primary keys as trip id and secondary keys as number of transfers. Format {trip_id: {[round]: first reached stop}}
+        R_t (dict): dict with keys as route id. Format {route_id: np.ndarray of first reached stop index by [round, trip index]}
+        Q (list): list of TripSegmentQueue, one per round. Cleared and reused across departures.
 
     Returns:
-        Q (list): list of trips segments
+        None
     '''
-    Q = [[] for x in range(MAX_TRANSFER + 2)]
-    route, trip_idx = [int(x) for x in dep_details[0].split("_")]
-    stop_index = dep_details[2]
-    # _enqueue_range1(f'{route}_{trip_idx}', stop_index, n, (0, 0), R_t, Q, stoptimes_dict, MAX_TRANSFER)
-    connection_list = [(f'{route}_{trip_idx}', stop_index)]
-    enqueue_range(connection_list, 1, (0, 0), R_t, Q, stoptimes_dict, MAX_TRANSFER)
-    return Q
+    for queue in Q:
+        queue.clear()
+    connection_list = [(dep_details[0], dep_details[2], -1)]
+    enqueue_range(connection_list, 1, -1, R_t, Q, stoptimes_dict, MAX_TRANSFER)
+
 
+def get_window_edge_trips(footpath_dict: dict, SOURCE: int, routes_by_stop_dict: dict, stoptimes_dict: dict, edge_time,
+                          WALKING_FROM_SOURCE: int, idx_by_route_stop_dict: dict) -> list:
+    '''
+    Collects the first trip departing at or after edge_time on every route through SOURCE (and its walkable stops).
 
-def enqueue_range(connection_list: list, nextround: int, predecessor_label: tuple, R_t: dict, Q: list,
+    Args:
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        SOURCE (int): stop id of source stop.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        edge_time (pandas.datetime): earliest departure time after the window.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+
+    Returns:
+        edge_trips (list): Format [(trip id, stop index, boarding stop id, departure time)]
+    '''
+    seed_stops = [SOURCE]
+    if WALKING_FROM_SOURCE == 1:
+        seed_stops.extend([connection[0] for connection in footpath_dict.get(SOURCE, [])])
+    edge_trips = []
+    for stop in seed_stops:
+        for route in routes_by_stop_dict.get(stop, []):
+            stop_index = idx_by_route_stop_dict[(route, stop)]
+            for trip_idx, trip in enumerate(stoptimes_dict[route]):
+                if edge_time <= trip[stop_index][1]:
+                    edge_trips.append((f'{route}_{trip_idx}', stop_index, stop, trip[stop_index][1]))
+                    break
+    return edge_trips
+
+
+def initialize_window_edge_range(footpath_dict: dict, SOURCE: int, routes_by_stop_dict: dict, stoptimes_dict: dict, edge_time,
+                                 MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, idx_by_route_stop_dict: dict, R_t: dict, Q: list) -> None:
+    '''
+    Initialize trips segments for the window edge of a range query. The first trip departing at or after edge_time on every
+    route through SOURCE (and its walkable stops) is enqueued, so that J and R_t dominate all departures after the window.
+
+    Args:
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        SOURCE (int): stop id of source stop.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        edge_time (pandas.datetime): earliest departure time after the window.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        R_t (dict): dict with keys as route id. Format {route_id: np.ndarray of first reached stop index by [round, trip index]}
+        Q (list): list of TripSegmentQueue, one per round. Cleared and reused across departures.
+
+    Returns:
+        None
+    '''
+    for queue in Q:
+        queue.clear()
+    connection_list = [(tid, stop_index, -1) for tid, stop_index, _, _ in
+                       get_window_edge_trips(footpath_dict, SOURCE, routes_by_stop_dict, stoptimes_dict, edge_time, WALKING_FROM_SOURCE, idx_by_route_stop_dict)]
+    enqueue_range(connection_list, 1, -1, R_t, Q, stoptimes_dict, MAX_TRANSFER)
+
+
+def enqueue_range(connection_list: list, nextround: int, parent: int, R_t: dict, Q: list,
                   stoptimes_dict: dict, MAX_TRANSFER: int) -> None:
     '''
     Adds trips-segments to next round and update R_t. Used in range queries
 
     Args:
-        connection_list (list): list of connections to be added. Format: [(to_trip_id, to_trip_id_stop_index)].
+        connection_list (list): list of connections to be added. Format: [(to_trip_id, to_trip_id_stop_index, from_trip_stop_index)].
         nextround (int): next round/transfer number to which trip-segments are added
-        predecessor_label (tuple): predecessor_label for backtracking journey ( To be developed ).
-        R_t (nested dict): Nested_Dict with primary keys as trip id and secondary keys as number of transfers. Format {trip_id: {[round]: first reached stop}}
-        Q (list): list of trips segments
+        parent (int): index of the from trip-segment in Q[nextround - 1]. -1 for seeds.
+        R_t (dict): dict with keys as route id. Format {route_id: np.ndarray of first reached stop index by [round, trip index]}
+        Q (list): list of TripSegmentQueue, one per round.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
         MAX_TRANSFER (int): maximum transfer limit.
 
     Returns: None
     '''
-    for to_trip_id, to_trip_id_stop in connection_list:
-        if to_trip_id_stop < R_t[nextround][to_trip_id]:
-            route, tid = [int(x) for x in to_trip_id.split("_")]
-            Q[nextround].append((to_trip_id_stop, to_trip_id, R_t[nextround][to_trip_id], route, tid, predecessor_label))
-            for x in range(tid, len(stoptimes_dict[route]) + 1):
-                for r in range(nextround, MAX_TRANSFER + 1):
-                    new_tid = f"{route}_{x}"
-                    if R_t[r][new_tid] > to_trip_id_stop:
-                        R_t[r][new_tid] = to_trip_id_stop
+    for to_trip_id, to_trip_id_stop, from_trip_stop in connection_list:
+        route, tid = [int(x) for x in to_trip_id.split("_")]
+        reached = get_reached_index(R_t, route, stoptimes_dict, MAX_TRANSFER + 2)
+        if to_trip_id_stop < reached[nextround, tid]:
+            Q[nextround].append(to_trip_id_stop, int(reached[nextround, tid]), route, tid, to_trip_id, parent, from_trip_stop)
+            # reached is non-increasing in round and in trip index, so both loops stop at the first entry reached earlier.
+            for r in range(nextround, MAX_TRANSFER + 1):
+                if reached[r, tid] <= to_trip_id_stop:
+                    break
+                x = tid
+                while x < reached.shape[1] and reached[r, x] > to_trip_id_stop:
+                    reached[r, x] = to_trip_id_stop
+                    x = x + 1
 
 
 def post_process_range_onemany(J: dict, Q: list, rounds_desti_reached: list, PRINT_ITINERARY: int, desti: int,
@@ -322,7 +618,7 @@ def post_process_range_onemany(J: dict, Q: list, rounds_desti_reached: list, PRI
 
     Args:
         J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
-        Q (list): list of trips segments.
+        Q (list): list of TripSegmentQueue, one per round.
         rounds_desti_reached (list): Rounds in which DESTINATION is reached.
         PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
         desti (int): stop id of destination stop.
@@ -339,18 +635,10 @@ def post_process_range_onemany(J: dict, Q: list, rounds_desti_reached: list, PRI
 
     '''
     rounds_desti_reached = list(set(rounds_desti_reached))
-    if PRINT_ITINERARY==1:
-        _print_tbtr_journey_otm(J, Q, desti, SOURCE, footpath_dict, stops_dict, stoptimes_dict, d_time, MAX_TRANSFER, trip_transfer_dict, rounds_desti_reached)
-    TBTR_out = []
-    for transfer_needed in reversed(rounds_desti_reached):
-        no_of_transfer = transfer_needed
-        current_trip = J[desti][transfer_needed][1][0]
-        journey = []
-        while current_trip != 0:
-            journey.append(current_trip)
-            current_trip = [x for x in Q[no_of_transfer] if x[1] == current_trip][-1][-1][0]
-            no_of_transfer = no_of_transfer - 1
-        TBTR_out.extend(journey)
+    journeys = [(x - 1, get_tbtr_journey(J[desti], Q, x, desti, SOURCE, footpath_dict, stoptimes_dict, d_time)) for x in reversed(rounds_desti_reached)]
+    if PRINT_ITINERARY == 1:
+        _print_Journey_legs(journeys)
+    TBTR_out = [leg[-1] for _, journey in journeys for leg in journey if leg[0] != 'walking']
     return set(TBTR_out)
 
 
@@ -363,7 +651,7 @@ def post_process(J: dict, Q: list, DESTINATION: int, SOURCE: int, footpath_dict:
 
     Args:
         J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
-        Q (list): list of trips segments.
+        Q (list): list of TripSegmentQueue, one per round.
         DESTINATION (int): stop id of destination stop.
         SOURCE (int): stop id of source stop.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
@@ -384,328 +672,97 @@ def post_process(J: dict, Q: list, DESTINATION: int, SOURCE: int, footpath_dict:
 #        return -1
     else:
         if PRINT_ITINERARY == 1:
-            _print_tbtr_journey(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, D_TIME, MAX_TRANSFER, trip_transfer_dict, rounds_desti_reached)
+            _print_Journey_legs([(x - 1, get_tbtr_journey(J, Q, x, DESTINATION, SOURCE, footpath_dict, stoptimes_dict, D_TIME)) for x in reversed(rounds_desti_reached)])
         TBTR_out = []
         for x in reversed(rounds_desti_reached):
             TBTR_out.append(J[x][0])
         return TBTR_out
 
-def _print_tbtr_journey(J: dict, Q: list, DESTINATION: int, SOURCE: int, footpath_dict: dict, stops_dict: dict, stoptimes_dict: dict,
-                        D_TIME, MAX_TRANSFER: int, trip_transfer_dict: dict, rounds_desti_reached: list) -> None:
-    """
-    Prints the output of TBTR
+def post_process_dhanus(J: dict, Q: list, DESTINATION: int, SOURCE: int, footpath_dict: dict, stoptimes_dict: dict,
+                        PRINT_ITINERARY: int, D_TIME, MAX_TRANSFER: int) -> tuple:
+    '''
+    Post processing for TBTR with the output format of post_processing_dhanus (RAPTOR).
 
     Args:
         J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
-        Q (list): list of trips segments.
+        Q (list): list of TripSegmentQueue, one per round.
         DESTINATION (int): stop id of destination stop.
         SOURCE (int): stop id of source stop.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
-        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
         D_TIME (pandas.datetime): departure time.
         MAX_TRANSFER (int): maximum transfer limit.
-        trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
-        rounds_desti_reached (list): Rounds in which DESTINATION is reached.
 
     Returns:
-        None
+        rounds_desti_reached (list): list of rounds in which DESTINATION is reached. Format - [int]
+        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]
+        TBTR_out (dict): keys: 'old', 'tt', 'journeys'. TBTR_out['old'] is the list of pareto-optimal arrival timestamps,
+        TBTR_out['tt'] gives the travel time information in the form [(num_transfers, travel_time_dict)] (see get_t_times)
+        and TBTR_out['journeys'] is the list of Journey.
 
     Examples:
-        >>> _print_tbtr_journey(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, D_TIME, MAX_TRANSFER, trip_transfer_dict, rounds_desti_reached)
-
-    TODO:
-        Build a better backtracking system for TBTR
-    """
-    for x in reversed(rounds_desti_reached):
-        round_no = x
-        journey = []
-        trip_segement_counter = J[x][1][2]
-        while round_no>0:
-            pred = Q[round_no][trip_segement_counter]
-            journey.append((pred[5][0], pred[1], pred[0]))
-            trip_segement_counter = pred[5][1]
-            round_no = round_no - 1
-        from_stop_list = []
-        for id, t_transfer in enumerate(journey[:-1]):
-            from_Stop_onwards = journey[id+1][2]
-            for from_stop, trasnsfer_list in trip_transfer_dict[t_transfer[0]].items():
-                if from_stop<from_Stop_onwards:
-                    continue
-                else:
-                    if (t_transfer[1], t_transfer[2]) in trasnsfer_list:
-                        from_stop_list.append(from_stop)
-        journey_final = [(journey[counter][0], x, journey[counter][1], journey[counter][2]) for counter, x in enumerate(from_stop_list)]
-        # from source
-        from_trip, from_stop_idxx= journey[-1][1], journey[-1][2]
-        fromstopid = stops_dict[int(from_trip.split("_")[0])][from_stop_idxx]
-        if fromstopid==SOURCE:
-            journey_final.append(("trip",0, from_trip, from_stop_idxx))
-        else:
-            for to_stop, to_time in footpath_dict[fromstopid]:
-                if to_stop== SOURCE:
-                    journey_final.append(("walk", SOURCE, fromstopid, to_time+D_TIME))
-                    break
-        #Add final lag. Destination can either be along the route or at a walking distance from it.
-        if J[x][1][1] != (0, 0):    #Add here if the destination is at walking distance from final route
-            try:
-                final_route, boarded_from = int(journey_final[0][2].split("_")[0]), journey_final[0][3]
-                found = 0
-                for walking_from_stop_idx, stop_id in enumerate(stops_dict[final_route]):
-                    if walking_from_stop_idx<boarded_from:continue
-                    try:
-                        for to_stop, to_stop_time in footpath_dict[stop_id]:
-                            if to_stop==DESTINATION:
-                                found = 1
-                                journey_final.insert(0, ("walk", journey_final[0][2], boarded_from, walking_from_stop_idx, to_stop_time)) #walking_pointer, from_trip, from_stop, to_stop
-                                break
-                    except KeyError:continue
-                    if found==1:break
-            except AttributeError:
-                if len(journey_final)==1:
-                    final_route =int(J[x][1][0].split("_")[0])
-                    boarded_from = stops_dict[final_route].index(journey_final[0][2])
-                    found = 0
-                    for walking_from_stop_idx, stop_id in enumerate(stops_dict[final_route]):
-                        if walking_from_stop_idx<boarded_from:continue
-                        try:
-                            for to_stop, to_stop_time in footpath_dict[stop_id]:
-                                if to_stop==DESTINATION:
-                                    found = 1
-                                    journey_final.insert(0, ("walk", J[x][1][0], boarded_from, walking_from_stop_idx, to_stop_time)) #walking_pointer, from_trip, from_stop, to_stop
-                                    break
-                        except KeyError:continue
-                        if found==1:break
-                else:raise NameError
-        else:   #Destination is along the route.
-            try:
-                final_route, boarded_from = int(journey_final[0][2].split("_")[0]), journey_final[0][3]
-                desti_index = stops_dict[final_route].index(DESTINATION)
-                journey_final.insert(0, ("trip", journey_final[0][2], boarded_from, desti_index)) #walking_pointer, from_trip, from_stop, to_stop
-            except AttributeError:
-                if len(journey_final)==1:
-                    final_route =int(J[x][1][0].split("_")[0])
-                    boarded_from = stops_dict[final_route].index(journey_final[0][2])
-                    desti_index = stops_dict[final_route].index(DESTINATION)
-                    journey_final.insert(0, ("trip", J[x][1][0], boarded_from, desti_index)) #walking_pointer, from_trip, from_stop, to_stop
-        if journey_final==[]:
-            tid = [int(x) for x in journey[0][1].split("_")]
-            tostop_det = stops_dict[tid[0]].index(DESTINATION)
-            journey_final.append((journey[0][1], stoptimes_dict[tid[0]][tid[1]][journey[0][2]], stoptimes_dict[tid[0]][tid[1]][tostop_det]))
-        journey_final.reverse()
-        journey_final_copy = journey_final.copy()
-        journey_final.clear()
-        for c, leg in enumerate(journey_final_copy):
-            if c==0:
-                if leg[0]=="trip":
-                    [trip_route, numb], fromstopidx = [int(x) for x in leg[2].split("_")], leg[3]
-                    try:
-                        journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][1]]])
-                    except TypeError:
-                        try:
-                            journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][stops_dict[trip_route].index(DESTINATION)]])
-                            break
-                        except ValueError:
-                            journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][3]]])
-                elif leg[0]=="walk":
-                    journey_final.append(("walk", leg[1], leg[2], [time for stop, time in footpath_dict[leg[1]] if stop==leg[2]][0]))
-            elif c==len(journey_final_copy)-1:
-                if leg[0]=="trip":
-                    [trip_route, numb], fromstopidx, tostopidx = [int(x) for x in leg[1].split("_")], leg[2], leg[3]
-                    journey_final.append([leg[1], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]])
-                elif leg[0]=="walk":
-                    from_trip = [int(x) for x in leg[1].split("_")]
-                    journey_final.append((leg[1], stoptimes_dict[from_trip[0]][from_trip[1]][leg[2]], stoptimes_dict[from_trip[0]][from_trip[1]][leg[3]]))
-                    foot_connect = stoptimes_dict[from_trip[0]][from_trip[1]][leg[3]]
-                    last_foot_tme = [time for stop, time in footpath_dict[foot_connect[0]] if stop==DESTINATION][0]
-                    journey_final.append(("walk", foot_connect[0], DESTINATION, last_foot_tme, stoptimes_dict[from_trip[0]][from_trip[1]][leg[3]][1] + last_foot_tme))
-            else:
-                if c==1:
-                    if journey_final_copy[c-1][0]=="walk":
-                        [trip_route, numb], tostopidx = [int(x) for x in leg[0].split("_")], leg[1]
-                        fromstopidx = stops_dict[trip_route].index(journey_final_copy[c-1][2])
-                        journey_final.append([leg[0], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]])
-                    elif journey_final_copy[c-1][0]=="trip":
-                        [trip_route, numb], tostopidx = [int(x) for x in leg[0].split("_")], leg[1]
-                        fromstopidx = stops_dict[trip_route].index(SOURCE)
-                        if [leg[0], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]] not in journey_final:
-                            journey_final.append([leg[0], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]])
-                from_stop = stops_dict[int(journey_final_copy[c][0].split("_")[0])][int(journey_final_copy[c][1])]
-                to_stop = stops_dict[int(journey_final_copy[c][2].split("_")[0])][int(journey_final_copy[c][3])]
-                if from_stop!=to_stop:
-                    time_needed = [x[1] for x in footpath_dict[from_stop] if x[0]==to_stop][0]
-                    journey_final.append(("walk", from_stop, to_stop, time_needed))
-                    if c+1!=len(journey_final_copy)-1:
-                        [trip_route, numb], fromstopidx = [int(x) for x in leg[2].split("_")], leg[3]
-                        journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][1]]])
-                elif from_stop==to_stop:
-                    if c+1!=len(journey_final_copy)-1:
-                        [trip_route, numb], fromstopidx = [int(x) for x in leg[2].split("_")], leg[3]
-                        journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][1]]])
-        for leg in journey_final:
-            if leg[0]=="walk":
-                print(f"from {leg[1]} walk till  {leg[2]} for {leg[3].total_seconds()} seconds")
-            else:
-                print(f"from {leg[1][0]} board at {leg[1][1].time()} and get down on {leg[2][0]} at {leg[2][1].time()} along {leg[0]}")
-        print("####################################")
-    return None
-
-def _print_tbtr_journey_otm(J: dict, Q: list, DESTINATION: int, SOURCE: int, footpath_dict: dict, stops_dict: dict, stoptimes_dict: dict,
-                            D_TIME, MAX_TRANSFER: int, trip_transfer_dict: dict, rounds_desti_reached: list) -> None:
-    """
-    Prints the output of TBTR
+        >>> output = post_process_dhanus(J, Q, 1482, 36, footpath_dict, stoptimes_dict, 1, D_TIME, 4)
+    '''
+    rounds_desti_reached = [roundno for roundno in range(1, MAX_TRANSFER + 1) if J[roundno][1] != 0]
+    if rounds_desti_reached == []:
+        if PRINT_ITINERARY == 1:
+            print('DESTINATION cannot be reached with given MAX_TRANSFERS')
+        return None, None, None
+    rounds_desti_reached.reverse()
+    journeys = [(x - 1, get_tbtr_journey(J, Q, x, DESTINATION, SOURCE, footpath_dict, stoptimes_dict, D_TIME)) for x in rounds_desti_reached]
+    if PRINT_ITINERARY == 1:
+        _print_Journey_legs(journeys)
+    trip_set = [leg[-1] for _, journey in journeys for leg in journey if leg[0] != 'walking']
+    TBTR_out = {'old': [J[x][0] for x in rounds_desti_reached],
+                'tt': [(transfers, get_t_times(journey)) for transfers, journey in journeys],
+                'journeys': [Journey(transfers, journey) for transfers, journey in journeys]}
+    return rounds_desti_reached, trip_set, TBTR_out
+
+
+def get_tbtr_journey(J: dict, Q: list, round_no: int, DESTINATION: int, SOURCE: int, footpath_dict: dict, stoptimes_dict: dict, d_time) -> list:
+    '''
+    Backtracks the journey reaching DESTINATION in round round_no. Every trip-segment carries a parent pointer (index of the
+    parent segment in the previous round, alighting stop index in the parent trip), so the journey is rebuilt in O(legs).
 
     Args:
         J (dict): dict to store arrival timestamps. Keys: number of transfer, Values: arrival time
-        Q (list): list of trips segments.
+        Q (list): list of TripSegmentQueue, one per round.
+        round_no (int): round in which DESTINATION is reached.
         DESTINATION (int): stop id of destination stop.
         SOURCE (int): stop id of source stop.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
-        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
-        D_TIME (pandas.datetime): departure time.
-        MAX_TRANSFER (int): maximum transfer limit.
-        trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
-        rounds_desti_reached (list): Rounds in which DESTINATION is reached.
+        d_time (pandas.datetime): departure time from SOURCE (rTBTR: departure time of the boarded trip).
 
     Returns:
-        None
+        journey (list): pointer labels in RAPTOR format. Trip leg: (boarding time, boarding stop, alighting stop, arrival time, trip id).
+        Walking leg: ('walking', from stop, to stop, footpath time, arrival time).
 
     Examples:
-        >>> _print_tbtr_journey(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, D_TIME, MAX_TRANSFER, trip_transfer_dict, rounds_desti_reached)
-
-    TODO:
-        Build a better backtracking system for TBTR
-    """
-    for x in reversed(rounds_desti_reached):
-        round_no = x
-        journey = []
-        trip_segement_counter = J[DESTINATION][x][1][2]
-        while round_no>0:
-            pred = Q[round_no][trip_segement_counter]
-            journey.append((pred[5][0], pred[1], pred[0]))
-            trip_segement_counter = pred[5][1]
-            round_no = round_no - 1
-        from_stop_list = []
-        for id, t_transfer in enumerate(journey[:-1]):
-            from_Stop_onwards = journey[id+1][2]
-            for from_stop, trasnsfer_list in trip_transfer_dict[t_transfer[0]].items():
-                if from_stop<from_Stop_onwards:
-                    continue
-                else:
-                    if (t_transfer[1], t_transfer[2]) in trasnsfer_list:
-                        from_stop_list.append(from_stop)
-        journey_final = [(journey[counter][0], x, journey[counter][1], journey[counter][2]) for counter, x in enumerate(from_stop_list)]
-        # from source
-        from_trip, from_stop_idxx= journey[-1][1], journey[-1][2]
-        fromstopid = stops_dict[int(from_trip.split("_")[0])][from_stop_idxx]
-        if fromstopid==SOURCE:
-            journey_final.append(("trip",0, from_trip, from_stop_idxx))
+        >>> output = get_tbtr_journey(J, Q, 2, 1482, 36, footpath_dict, stoptimes_dict, D_TIME)
+    '''
+    journey = []
+    _, walking, counter, alighting_idx = J[round_no][1]
+    if walking != (0, 0):
+        queue = Q[round_no]
+        alighting_time = stoptimes_dict[queue.route[counter]][queue.trip_idx[counter]][alighting_idx][1]
+        journey.append(('walking', walking[1], DESTINATION, J[round_no][0] - alighting_time, J[round_no][0]))
+    while round_no > 0:
+        queue = Q[round_no]
+        boarding_idx, parent, from_alighting_idx = queue.from_idx[counter], queue.parent[counter], queue.parent_stop[counter]
+        trip = stoptimes_dict[queue.route[counter]][queue.trip_idx[counter]]
+        journey.append((trip[boarding_idx][1], trip[boarding_idx][0], trip[alighting_idx][0], trip[alighting_idx][1], queue.tid[counter]))
+        if round_no > 1:
+            from_queue = Q[round_no - 1]
+            from_stop, from_time = stoptimes_dict[from_queue.route[parent]][from_queue.trip_idx[parent]][from_alighting_idx]
         else:
-            for to_stop, to_time in footpath_dict[fromstopid]:
-                if to_stop== SOURCE:
-                    journey_final.append(("walk", SOURCE, fromstopid, to_time+D_TIME))
-                    break
-        #Add final lag. Destination can either be along the route or at a walking distance from it.
-        if J[DESTINATION][x][1][1] != (0, 0):    #Add here if the destination is at walking distance from final route
-            try:
-                final_route, boarded_from = int(journey_final[0][2].split("_")[0]), journey_final[0][3]
-                found = 0
-                for walking_from_stop_idx, stop_id in enumerate(stops_dict[final_route]):
-                    if walking_from_stop_idx<boarded_from:continue
-                    try:
-                        for to_stop, to_stop_time in footpath_dict[stop_id]:
-                            if to_stop==DESTINATION:
-                                found = 1
-                                journey_final.insert(0, ("walk", journey_final[0][2], boarded_from, walking_from_stop_idx, to_stop_time)) #walking_pointer, from_trip, from_stop, to_stop
-                                break
-                    except KeyError:continue
-                    if found==1:break
-            except AttributeError:
-                if len(journey_final)==1:
-                    final_route =int(J[DESTINATION][x][1][0].split("_")[0])
-                    boarded_from = stops_dict[final_route].index(journey_final[0][2])
-                    found = 0
-                    for walking_from_stop_idx, stop_id in enumerate(stops_dict[final_route]):
-                        if walking_from_stop_idx<boarded_from:continue
-                        try:
-                            for to_stop, to_stop_time in footpath_dict[stop_id]:
-                                if to_stop==DESTINATION:
-                                    found = 1
-                                    journey_final.insert(0, ("walk", J[DESTINATION][x][1][0], boarded_from, walking_from_stop_idx, to_stop_time)) #walking_pointer, from_trip, from_stop, to_stop
-                                    break
-                        except KeyError:continue
-                        if found==1:break
-                else:raise NameError
-        else:   #Destination is along the route.
-            try:
-                final_route, boarded_from = int(journey_final[0][2].split("_")[0]), journey_final[0][3]
-                desti_index = stops_dict[final_route].index(DESTINATION)
-                journey_final.insert(0, ("trip", journey_final[0][2], boarded_from, desti_index)) #walking_pointer, from_trip, from_stop, to_stop
-            except AttributeError:
-                if len(journey_final)==1:
-                    final_route =int(J[DESTINATION][x][1][0].split("_")[0])
-                    boarded_from = stops_dict[final_route].index(journey_final[0][2])
-                    desti_index = stops_dict[final_route].index(DESTINATION)
-                    journey_final.insert(0, ("trip", J[x][1][0], boarded_from, desti_index)) #walking_pointer, from_trip, from_stop, to_stop
-        if journey_final==[]:
-            tid = [int(x) for x in journey[0][1].split("_")]
-            tostop_det = stops_dict[tid[0]].index(DESTINATION)
-            journey_final.append((journey[0][1], stoptimes_dict[tid[0]][tid[1]][journey[0][2]], stoptimes_dict[tid[0]][tid[1]][tostop_det]))
-        journey_final.reverse()
-        journey_final_copy = journey_final.copy()
-        journey_final.clear()
-        for c, leg in enumerate(journey_final_copy):
-            if c==0:
-                if leg[0]=="trip":
-                    [trip_route, numb], fromstopidx = [int(x) for x in leg[2].split("_")], leg[3]
-                    try:
-                        journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][1]]])
-                    except TypeError:
-                        try:
-                            journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][stops_dict[trip_route].index(DESTINATION)]])
-                            break
-                        except ValueError:
-                            journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][3]]])
-                elif leg[0]=="walk":
-                    journey_final.append(("walk", leg[1], leg[2], [time for stop, time in footpath_dict[leg[1]] if stop==leg[2]][0]))
-            elif c==len(journey_final_copy)-1:
-                if leg[0]=="trip":
-                    [trip_route, numb], fromstopidx, tostopidx = [int(x) for x in leg[1].split("_")], leg[2], leg[3]
-                    journey_final.append([leg[1], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]])
-                elif leg[0]=="walk":
-                    from_trip = [int(x) for x in leg[1].split("_")]
-                    journey_final.append((leg[1], stoptimes_dict[from_trip[0]][from_trip[1]][leg[2]], stoptimes_dict[from_trip[0]][from_trip[1]][leg[3]]))
-                    foot_connect = stoptimes_dict[from_trip[0]][from_trip[1]][leg[3]]
-                    last_foot_tme = [time for stop, time in footpath_dict[foot_connect[0]] if stop==DESTINATION][0]
-                    journey_final.append(("walk", foot_connect[0], DESTINATION, last_foot_tme, stoptimes_dict[from_trip[0]][from_trip[1]][leg[3]][1] + last_foot_tme))
-            else:
-                if c==1:
-                    if journey_final_copy[c-1][0]=="walk":
-                        [trip_route, numb], tostopidx = [int(x) for x in leg[0].split("_")], leg[1]
-                        fromstopidx = stops_dict[trip_route].index(journey_final_copy[c-1][2])
-                        journey_final.append([leg[0], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]])
-                    elif journey_final_copy[c-1][0]=="trip":
-                        [trip_route, numb], tostopidx = [int(x) for x in leg[0].split("_")], leg[1]
-                        fromstopidx = stops_dict[trip_route].index(SOURCE)
-                        if [leg[0], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]] not in journey_final:
-                            journey_final.append([leg[0], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][tostopidx]])
-                from_stop = stops_dict[int(journey_final_copy[c][0].split("_")[0])][int(journey_final_copy[c][1])]
-                to_stop = stops_dict[int(journey_final_copy[c][2].split("_")[0])][int(journey_final_copy[c][3])]
-                if from_stop!=to_stop:
-                    time_needed = [x[1] for x in footpath_dict[from_stop] if x[0]==to_stop][0]
-                    journey_final.append(("walk", from_stop, to_stop, time_needed))
-                    if c+1!=len(journey_final_copy)-1:
-                        [trip_route, numb], fromstopidx = [int(x) for x in leg[2].split("_")], leg[3]
-                        journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][1]]])
-                elif from_stop==to_stop:
-                    if c+1!=len(journey_final_copy)-1:
-                        [trip_route, numb], fromstopidx = [int(x) for x in leg[2].split("_")], leg[3]
-                        journey_final.append([leg[2], stoptimes_dict[trip_route][numb][fromstopidx], stoptimes_dict[trip_route][numb][journey_final_copy[c+1][1]]])
-        for leg in journey_final:
-            if leg[0]=="walk":
-                print(f"from {leg[1]} walk till  {leg[2]} for {leg[3].total_seconds()} seconds")
-            else:
-                print(f"from {leg[1][0]} board at {leg[1][1].time()} and get down on {leg[2][0]} at {leg[2][1].time()} along {leg[0]}")
-        print("####################################")
-    return None
\ No newline at end of file
+            from_stop, from_time = SOURCE, d_time
+        if from_stop != trip[boarding_idx][0]:
+            footpath_time = [x[1] for x in footpath_dict[from_stop] if x[0] == trip[boarding_idx][0]][0]
+            # In range queries d_time is the departure of the boarded trip, so the walk from SOURCE ends at boarding.
+            journey.append(('walking', from_stop, trip[boarding_idx][0], footpath_time, min(from_time + footpath_time, trip[boarding_idx][1])))
+        alighting_idx, counter = from_alighting_idx, parent
+        round_no = round_no - 1
+    journey.reverse()
+    return journey
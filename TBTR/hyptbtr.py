@@ -6,7 +6,7 @@ from TBTR.TBTR_functions import *
 
 def hyptbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, PRINT_ITINERARY: int, stop_out: dict,
             trip_groups: dict, routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict,
-            idx_by_route_stop_dict: dict, trip_transfer_dict: dict, trip_set: set) -> list:
+            idx_by_route_stop_dict: dict, trip_transfer_dict: dict, trip_set: set, MAX_DURATION=None, lower_bound=None) -> list:
     """
     Hyptbtr implementation.
 
@@ -18,8 +18,7 @@ def hyptbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FR
         WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
         PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
         stop_out (dict): key: stop-id (int), value: stop-cell id of key (int). Note: stop-cell id=-1 denotes cut stop.
-        trip_groups (dict): key: tuple of all possible combinations of stop cell id,
-        value: set of trip ids belonging to the stop cell combination
+        trip_groups (dict): bitsets of the trips in every partition (see build_partition_masks).
         routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
         stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
@@ -28,6 +27,9 @@ def hyptbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FR
         trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
         of form (id of trip we are transferring to, stop number)}
         trip_set (set): set of trip ids from which trip-transfers are available.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Arrivals later than D_TIME + MAX_DURATION are pruned.
+        lower_bound (dict): optional. Lower bounds on travel time to DESTINATION (see get_lower_bounds). Transfers from stops
+        that cannot improve J even with these bounds are not enqueued.
 
     Returns:
         out (list): List of pareto-optimal arrival Timestamps
@@ -40,37 +42,37 @@ def hyptbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FR
         HypRAPTORz
     """
     out = []
-    final_trips = trip_groups[tuple(sorted((stop_out[SOURCE], stop_out[DESTINATION])))]
+    trip_mask = get_partition_mask(trip_groups, stop_out[SOURCE], stop_out[DESTINATION])  # Indexed by dense trip index
+    trip_offset = trip_groups["offset"]
     J = initialize_tbtr(MAX_TRANSFER)
+    if MAX_DURATION is not None:
+        for x in J.keys():
+            J[x][0] = D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds')  # Travel-duration budget
     L = initialize_from_desti(routes_by_stop_dict, stops_dict, DESTINATION, footpath_dict, idx_by_route_stop_dict)
     R_t, Q = initialize_from_source(footpath_dict, SOURCE, routes_by_stop_dict, stops_dict, stoptimes_dict,
                                         D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, idx_by_route_stop_dict)
 
     n = 1
     while n <= MAX_TRANSFER:
-        for counter, trip_segment in enumerate(Q[n]):
-            from_stop, tid, to_stop, trip_route, tid_idx = trip_segment[0: 5]
-            trip = stoptimes_dict[trip_route][tid_idx][from_stop:to_stop]
+        queue = Q[n]
+        for counter in range(queue.size):
+            from_stop, to_stop, trip_route, tid_idx, tid = queue.from_idx[counter], queue.to_idx[counter], queue.route[counter], queue.trip_idx[counter], queue.tid[counter]
+            trip = stoptimes_dict[trip_route][tid_idx]
             try:
-                L[trip_route]
-                stop_list, _ = zip(*trip)
                 for last_leg in L[trip_route]:
-                    idx = [x[0] for x in enumerate(stop_list) if x[1] == last_leg[2]]
-                    if idx and from_stop < last_leg[0] and trip[idx[0]][1] + last_leg[1] < J[n][0]:
+                    if from_stop < last_leg[0] < to_stop and trip[last_leg[0]][1] + last_leg[1] < J[n][0]:
                         if last_leg[1] == pd.to_timedelta(0, unit="seconds"):
                             walking = (0, 0)
                         else:
                             walking = (1, stops_dict[trip_route][last_leg[0]])
-                        J = update_label(trip[idx[0]][1] + last_leg[1], n, (tid, walking, counter), J, MAX_TRANSFER)
+                        J = update_label(trip[last_leg[0]][1] + last_leg[1], n, (tid, walking, counter, last_leg[0]), J, MAX_TRANSFER)
             except KeyError:
                 pass
-            try:
-                if tid in trip_set and trip[1][1] < J[n][0]:
-                    connection_list = [connection for from_stop_idx, transfer_stop_id in enumerate(trip[1:], from_stop + 1)
-                                       for connection in trip_transfer_dict[tid][from_stop_idx] if connection[0] in final_trips]
-                    enqueue(connection_list, n + 1, (tid, counter, 0), R_t, Q, stoptimes_dict)
-            except IndexError:
-                pass
+            if tid in trip_set and from_stop + 1 < to_stop and trip[from_stop + 1][1] < J[n][0]:
+                connection_list = [(*connection, from_stop_idx) for from_stop_idx in range(from_stop + 1, to_stop)
+                                   if lower_bound is None or (trip[from_stop_idx][0] in lower_bound and trip[from_stop_idx][1] + lower_bound[trip[from_stop_idx][0]] < J[n][0])
+                                   for connection in trip_transfer_dict[tid][from_stop_idx]]
+                enqueue(connection_list, n + 1, counter, R_t, Q, stoptimes_dict, trip_mask, trip_offset)
         n = n + 1
     tbtr_out = post_process(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, PRINT_ITINERARY,
                             D_TIME, MAX_TRANSFER, trip_transfer_dict)
@@ -4,16 +4,17 @@ Module contains One-To-Many rTBTR implementation
 from TBTR.TBTR_functions import *
 
 
-def onetomany_rtbtr(SOURCE: int, DESTINATION_LIST: list, d_time_groups, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
+def onetomany_rtbtr(SOURCE: int, DESTINATION_LIST: list, departures_by_stop: dict, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
                     PRINT_ITINERARY: int, OPTIMIZED: int, routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict,
-                    footpath_dict: dict, idx_by_route_stop_dict: dict, trip_transfer_dict: dict, trip_set: set) -> list:
+                    footpath_dict: dict, idx_by_route_stop_dict: dict, trip_transfer_dict: dict, trip_set: set,
+                    window_start=None, window_end=None, MAX_DURATION=None, PROFILE=0, lower_bound=None) -> list:
     """
     One to many rTBTR implementation
 
     Args:
         SOURCE (int): stop id of source stop.
         DESTINATION_LIST (list): list of stop ids of destination stop.
-        d_time_groups (pandas.group): all possible departures times from all stops.
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
         MAX_TRANSFER (int): maximum transfer limit.
         WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
         PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
@@ -26,78 +27,92 @@ def onetomany_rtbtr(SOURCE: int, DESTINATION_LIST: list, d_time_groups, MAX_TRAN
         trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
         of form (id of trip we are transferring to, stop number)}
         trip_set (set): set of trip ids from which trip-transfers are available.
+        window_start (pandas.datetime): optional. Earliest departure time to be considered.
+        window_end (pandas.datetime): optional. Latest departure time to be considered.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Arrivals later than the departure time + MAX_DURATION are pruned.
+        PROFILE (int): 1 or 0. 1 means collect profile records of the journeys instead of trips (OPTIMIZED is ignored).
+        The journeys of the window edge are also collected (with the edge time as departure time).
+        lower_bound (dict): optional. Lower bounds on travel time to the nearest destination (see get_lower_bounds with
+        DESTINATION_LIST). Transfers from stops that cannot improve any active destination even with these bounds are not enqueued.
 
     Returns:
         if OPTIMIZED==1:
             out (list):  list of trips required to cover all optimal journeys Format: [trip_id]
         elif OPTIMIZED==0:
             out (list):  list of routes required to cover all optimal journeys. Format: [route_id]
+        if PROFILE==1:
+            out (list): journeys found for every departure. Format: [(departure time, destination, round, arrival time, [trip ids])]
 
     Examples:
-        >>> output = onetomany_rtbtr(36, [52, 43], d_time_groups, 4, 1, 1, 0, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
+        >>> output = onetomany_rtbtr(36, [52, 43], departures_by_stop, 4, 1, 1, 0, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
         >>> print(output)
 
     See Also:
         HypTBTR, One-To-Many rRAPTOR
     """
-    d_time_list = d_time_groups.get_group(SOURCE)[["trip_id", 'arrival_time', 'stop_sequence']].values.tolist()
-    if WALKING_FROM_SOURCE == 1:
-        try:
-            source_footpaths = footpath_dict[SOURCE]
-            for connection in source_footpaths:
-                d_time_list.extend(d_time_groups.get_group(connection[0])[["trip_id", 'arrival_time', 'stop_sequence']].values.tolist())
-        except KeyError:
-            pass
-    d_time_list.sort(key=lambda x: x[1], reverse=True)
+    d_time_list, edge_time = get_departures(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, window_start, window_end)
+    if edge_time is not None:
+        d_time_list.insert(0, [None, edge_time, None])  # Window edge. Only seeds J and R_t.
 
     out = []
     J, inf_time = initialize_onemany(MAX_TRANSFER, DESTINATION_LIST)
     L = initialize_from_desti_onemany(routes_by_stop_dict, stops_dict, DESTINATION_LIST, footpath_dict, idx_by_route_stop_dict)
-    R_t = {x: defaultdict(lambda: 1000) for x in range(0, MAX_TRANSFER + 2)}  # assuming maximum route length is 1000
+    R_t = {}  # Format {route_id: np.ndarray of first reached stop index by [round, trip index]}
+    Q = initialize_queue(MAX_TRANSFER)  # Reused across departures
+    zero_time = pd.to_timedelta(0, unit="seconds")
 
     for dep_details in d_time_list:
+        if MAX_DURATION is not None:
+            for desti in DESTINATION_LIST:
+                for x in J[desti].keys():
+                    J[desti][x][0] = min(J[desti][x][0], dep_details[1] + pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
         rounds_desti_reached = {x: [] for x in DESTINATION_LIST}
         n = 1
-        Q = initialize_from_source_range(dep_details, MAX_TRANSFER, stoptimes_dict, R_t)
+        if dep_details[0] is None:
+            initialize_window_edge_range(footpath_dict, SOURCE, routes_by_stop_dict, stoptimes_dict, dep_details[1], MAX_TRANSFER,
+                                         WALKING_FROM_SOURCE, idx_by_route_stop_dict, R_t, Q)
+        else:
+            initialize_from_source_range(dep_details, MAX_TRANSFER, stoptimes_dict, R_t, Q)
         dest_list_prime = DESTINATION_LIST.copy()
         while n <= MAX_TRANSFER:
-            stop_mark_dict = {stop: 0 for stop in dest_list_prime}
-            scope = []
-            for counter, trip_segment in enumerate(Q[n]):
-                from_stop, tid, to_stop, trip_route, tid_idx = trip_segment[0: 5]
-                trip = stoptimes_dict[trip_route][tid_idx][from_stop:to_stop]
-                connection_list = []
-                for desti in dest_list_prime:
-                    try:
-                        L[desti][trip_route]
-                        stop_list, _ = zip(*trip)
-                        for last_leg in L[desti][trip_route]:
-                            idx = [x[0] for x in enumerate(stop_list) if x[1] == last_leg[2]]
-                            if idx and from_stop < last_leg[0] and trip[idx[0]][1] + last_leg[1] < J[desti][n][0]:
-                                if last_leg[1] == pd.to_timedelta(0, unit="seconds"):
-                                    walking = (0, 0)
-                                else:
-                                    walking = (1, stops_dict[trip_route][last_leg[0]])
-                                J[desti] = update_label(trip[idx[0]][1] + last_leg[1], n, (tid, walking, counter), J[desti], MAX_TRANSFER)
-                                rounds_desti_reached[desti].append(n)
-                    except KeyError:
-                        pass
-                    try:
-                        if tid in trip_set and trip[1][1] < J[desti][n][0]:
-                            if stop_mark_dict[desti]==0:
-                                scope.append(desti)
-                                stop_mark_dict[desti]=1
-                            connection_list.extend([connection for from_stop_idx, transfer_stop_id in enumerate(trip[1:], from_stop + 1)
-                                 for connection in trip_transfer_dict[tid][from_stop_idx]])
-                    except IndexError:
-                        pass
-                connection_list = list(set(connection_list))
-                enqueue_range(connection_list, n + 1, (tid, counter, 0), R_t, Q, stoptimes_dict, MAX_TRANSFER)
-            dest_list_prime = [*scope]
+            active_desti = set(dest_list_prime)
+            # A segment is only expanded if its first transfer can still improve some destination.
+            transfer_bound = max([J[x][n][0] for x in dest_list_prime], default=inf_time)
+            earliest_transfer = inf_time
+            queue = Q[n]
+            for counter in range(queue.size):
+                from_stop, to_stop, trip_route, tid_idx, tid = queue.from_idx[counter], queue.to_idx[counter], queue.route[counter], queue.trip_idx[counter], queue.tid[counter]
+                trip = stoptimes_dict[trip_route][tid_idx]
+                for last_leg in L.get(trip_route, ()):
+                    desti = last_leg[3]
+                    if desti in active_desti and from_stop < last_leg[0] < to_stop and trip[last_leg[0]][1] + last_leg[1] < J[desti][n][0]:
+                        if last_leg[1] == zero_time:
+                            walking = (0, 0)
+                        else:
+                            walking = (1, stops_dict[trip_route][last_leg[0]])
+                        old_label = J[desti][n][0]
+                        J[desti] = update_label(trip[last_leg[0]][1] + last_leg[1], n, (tid, walking, counter, last_leg[0]), J[desti], MAX_TRANSFER)
+                        rounds_desti_reached[desti].append(n)
+                        if old_label == transfer_bound:
+                            transfer_bound = max([J[x][n][0] for x in dest_list_prime])
+                if tid in trip_set and from_stop + 1 < to_stop and trip[from_stop + 1][1] < transfer_bound:
+                    earliest_transfer = min(earliest_transfer, trip[from_stop + 1][1])
+                    connection_list = [(*connection, from_stop_idx) for from_stop_idx in range(from_stop + 1, to_stop)
+                                       if lower_bound is None or (trip[from_stop_idx][0] in lower_bound and trip[from_stop_idx][1] + lower_bound[trip[from_stop_idx][0]] < transfer_bound)
+                                       for connection in trip_transfer_dict[tid][from_stop_idx]]
+                    enqueue_range(connection_list, n + 1, counter, R_t, Q, stoptimes_dict, MAX_TRANSFER)
+            # Later rounds arrive after earliest_transfer, so destinations already reached by then are dropped.
+            dest_list_prime = [desti for desti in dest_list_prime if earliest_transfer < J[desti][n][0]]
+            if not dest_list_prime:
+                break
             n = n + 1
+        if dep_details[0] is None and PROFILE == 0:
+            continue
         for desti in DESTINATION_LIST:
-            if rounds_desti_reached[desti]:
+            if rounds_desti_reached[desti] and PROFILE == 1:
+                out.extend(get_range_profile(J[desti], Q, rounds_desti_reached[desti], desti, SOURCE, footpath_dict, stoptimes_dict, dep_details[1]))
+            elif rounds_desti_reached[desti]:
                 out.extend(post_process_range_onemany(J, Q, rounds_desti_reached[desti], PRINT_ITINERARY, desti, SOURCE, footpath_dict, stops_dict, stoptimes_dict, dep_details[1], MAX_TRANSFER, trip_transfer_dict))
-    if OPTIMIZED == 0:
+    if OPTIMIZED == 0 and PROFILE == 0:
         out = [int(trip.split("_")[0]) for trip in out]
     return out
@@ -0,0 +1,160 @@
+"""
+Module contains One-To-All TBTR and One-To-All rTBTR implementation
+"""
+from TBTR.TBTR_functions import *
+
+
+def onetoall_tbtr(SOURCE: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, routes_by_stop_dict: dict, stops_dict: dict,
+                  stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, trip_transfer_dict: dict, trip_set: set,
+                  MAX_DURATION=None):
+    """
+    One-to-all TBTR implementation. Every trip-segment writes its arrival times to all the stops it covers and to their
+    footpath neighbours, so the earliest arrival at every stop is computed in a single search (e.g. for isochrones).
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        D_TIME (pandas.datetime): departure time.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
+        of form (id of trip we are transferring to, stop number)}
+        trip_set (set): set of trip ids from which trip-transfers are available.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Arrivals at or after D_TIME + MAX_DURATION are not written.
+
+    Returns:
+        label (np.ndarray): earliest arrival (int64 nanoseconds) at every stop using at most round trips. Format label[round, stop_index[stop id]].
+        Unreached stops hold inf_time (see initialize_onetoall).
+        stop_index (dict): column of every stop in label. Format {stop_id: column}.
+
+    Examples:
+        >>> label, stop_index = onetoall_tbtr(36, pd.to_datetime('2019-06-10 00:00:00'), 4, 1, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
+        >>> print(pd.to_datetime(label[-1, stop_index[52]]))
+
+    See Also:
+        TBTR, One-To-All rTBTR
+    """
+    label, trip_label, stop_index, inf_time = initialize_onetoall(MAX_TRANSFER, routes_by_stop_dict, footpath_dict)
+    budget = inf_time if MAX_DURATION is None else (D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds')).value  # Travel-duration budget
+    label[0, stop_index[SOURCE]] = D_TIME.value
+    if WALKING_FROM_SOURCE == 1:
+        for p_dash, to_pdash_time in footpath_dict.get(SOURCE, []):
+            p_dash = stop_index[p_dash]
+            label[0, p_dash] = min(label[0, p_dash], (D_TIME + to_pdash_time).value)
+    R_t, Q = initialize_from_source(footpath_dict, SOURCE, routes_by_stop_dict, stops_dict, stoptimes_dict, D_TIME,
+                                    MAX_TRANSFER, WALKING_FROM_SOURCE, idx_by_route_stop_dict)
+    n = 1
+    while n <= MAX_TRANSFER:
+        # A label with fewer trips is also a label with at most n trips.
+        np.minimum(label[n], label[n - 1], out=label[n])
+        np.minimum(trip_label[n], trip_label[n - 1], out=trip_label[n])
+        queue = Q[n]
+        for counter in range(queue.size):
+            from_stop, to_stop, tid = queue.from_idx[counter], queue.to_idx[counter], queue.tid[counter]
+            trip = stoptimes_dict[queue.route[counter]][queue.trip_idx[counter]]
+            update_stop_labels(trip, from_stop, to_stop, n, label, trip_label, footpath_dict, stop_index, budget)
+            if tid in trip_set and from_stop + 1 < to_stop and trip[from_stop + 1][1].value < budget:
+                connection_list = [(*connection, from_stop_idx) for from_stop_idx in range(from_stop + 1, to_stop)
+                                   for connection in trip_transfer_dict[tid][from_stop_idx]]
+                enqueue(connection_list, n + 1, counter, R_t, Q, stoptimes_dict)
+        n = n + 1
+    return label, stop_index
+
+
+def onetoall_rtbtr(SOURCE: int, departures_by_stop: dict, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, routes_by_stop_dict: dict,
+                   stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, trip_transfer_dict: dict,
+                   trip_set: set, window_start=None, window_end=None, MAX_DURATION=None) -> list:
+    """
+    One-to-all rTBTR implementation. Departures are processed latest first while the arrival arrays and R_t are shared
+    across departures (as in rTBTR), so every departure only scans the trip-segments that improve on later departures.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
+        of form (id of trip we are transferring to, stop number)}
+        trip_set (set): set of trip ids from which trip-transfers are available.
+        window_start (pandas.datetime): optional. Earliest departure time to be considered.
+        window_end (pandas.datetime): optional. Latest departure time to be considered.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Arrivals at or after the departure time + MAX_DURATION are not written.
+
+    Returns:
+        out (list): pareto-optimal (departure, arrival) profile of all stops for journeys with at least one trip, sorted by
+        decreasing departure time. Format [(departure time from SOURCE, round, np.ndarray of stop ids, np.ndarray of
+        arrival times in int64 nanoseconds)]
+
+    Examples:
+        >>> output = onetoall_rtbtr(36, departures_by_stop, 4, 1, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
+        >>> print(output[0])
+
+    See Also:
+        rTBTR, One-To-All TBTR
+    """
+    d_time_list, edge_time = get_departures(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, window_start, window_end)
+    source_footpaths = {int(p_dash): to_pdash_time for p_dash, to_pdash_time in footpath_dict.get(SOURCE, [])}
+    # Departures are grouped by the departure time from SOURCE (the boarding time minus the walk to the boarding stop),
+    # so that the profile is pareto-optimal in the departure time from SOURCE. Format {(departure time from SOURCE, 1 if reported else 0): [seeds]}
+    source_departures = defaultdict(lambda: [])
+    for tid, d_time, s_idx in d_time_list:
+        first_stop = stops_dict[int(tid.split("_")[0])][s_idx]
+        source_time = d_time if first_stop == SOURCE else d_time - source_footpaths[first_stop]
+        source_departures[(source_time, 1)].append((tid, s_idx, -1))
+    if edge_time is not None:
+        # Window edge. The first trips after the window only seed the labels and R_t. They are grouped by their departure
+        # time from SOURCE like the other departures and go first among equal departure times.
+        for tid, s_idx, first_stop, d_time in get_window_edge_trips(footpath_dict, SOURCE, routes_by_stop_dict, stoptimes_dict, edge_time,
+                                                                    WALKING_FROM_SOURCE, idx_by_route_stop_dict):
+            source_time = d_time if first_stop == SOURCE else d_time - source_footpaths[int(first_stop)]
+            source_departures[(source_time, 0)].append((tid, s_idx, -1))
+    source_departures = sorted(source_departures.items(), key=lambda x: (x[0][0], -x[0][1]), reverse=True)
+
+    out = []
+    label, trip_label, stop_index, inf_time = initialize_onetoall(MAX_TRANSFER, routes_by_stop_dict, footpath_dict)
+    stop_ids = np.array(list(stop_index.keys()))
+    source_columns = {stop_index[p_dash]: to_pdash_time for p_dash, to_pdash_time in source_footpaths.items()}
+    R_t = {}  # Format {route_id: np.ndarray of first reached stop index by [round, trip index]}
+    Q = initialize_queue(MAX_TRANSFER)  # Reused across departures
+
+    for (source_time, reported), seeds in source_departures:
+        for queue in Q:
+            queue.clear()
+        enqueue_range(seeds, 1, -1, R_t, Q, stoptimes_dict, MAX_TRANSFER)
+        budget = inf_time if MAX_DURATION is None else (source_time + pd.to_timedelta(MAX_DURATION, unit='seconds')).value  # Travel-duration budget
+        label[0, stop_index[SOURCE]] = min(label[0, stop_index[SOURCE]], source_time.value)
+        if WALKING_FROM_SOURCE == 1:
+            for p_dash, to_pdash_time in source_columns.items():
+                label[0, p_dash] = min(label[0, p_dash], (source_time + to_pdash_time).value)
+        written = [[] for x in range(MAX_TRANSFER + 1)]  # Format [[column]] by round
+        n = 1
+        while n <= MAX_TRANSFER:
+            # A label with fewer trips is also a label with at most n trips.
+            np.minimum(label[n], label[n - 1], out=label[n])
+            np.minimum(trip_label[n], trip_label[n - 1], out=trip_label[n])
+            queue = Q[n]
+            for counter in range(queue.size):
+                from_stop, to_stop, tid = queue.from_idx[counter], queue.to_idx[counter], queue.tid[counter]
+                trip = stoptimes_dict[queue.route[counter]][queue.trip_idx[counter]]
+                update_stop_labels(trip, from_stop, to_stop, n, label, trip_label, footpath_dict, stop_index, budget, written[n])
+                if tid in trip_set and from_stop + 1 < to_stop and trip[from_stop + 1][1].value < budget:
+                    connection_list = [(*connection, from_stop_idx) for from_stop_idx in range(from_stop + 1, to_stop)
+                                       for connection in trip_transfer_dict[tid][from_stop_idx]]
+                    enqueue_range(connection_list, n + 1, counter, R_t, Q, stoptimes_dict, MAX_TRANSFER)
+            n = n + 1
+        if reported == 0:
+            continue
+        for n in range(1, MAX_TRANSFER + 1):
+            if written[n]:
+                columns = np.unique(written[n])
+                out.append((source_time, n, stop_ids[columns], label[n, columns]))
+    return out
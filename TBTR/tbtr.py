@@ -6,7 +6,7 @@ from TBTR.TBTR_functions import *
 
 def tbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, PRINT_ITINERARY: int,
          routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict,
-         trip_transfer_dict: dict, trip_set: set) -> list:
+         trip_transfer_dict: dict, trip_set: set, lower_bound=None, MAX_DURATION=None, GET_JOURNEYS=0) -> list:
     """
     Standard TBTR implementation.
 
@@ -25,6 +25,11 @@ def tbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_
         trip_transfer_dict (nested dict): keys: id of trip we are transferring from, value: {stop number: list of tuples
         of form (id of trip we are transferring to, stop number)}
         trip_set (set): set of trip ids from which trip-transfers are available.
+        lower_bound (dict): optional. Lower bounds on travel time to DESTINATION (see get_lower_bounds). Transfers from stops
+        that cannot improve J even with these bounds are not enqueued.
+        MAX_DURATION (int): optional. Maximum travel duration in seconds. Arrivals later than D_TIME + MAX_DURATION are pruned.
+        GET_JOURNEYS (int): optional. 1 or 0. 1 means the output of post_process_dhanus (arrival timestamps, travel times
+        and Journey of every pareto-optimal journey) is returned instead of the arrival timestamps.
 
     Returns:
         out (list): List of pareto-optimal arrival Timestamps
@@ -39,37 +44,38 @@ def tbtr(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_
     """
     out = []
     J = initialize_tbtr(MAX_TRANSFER)
+    if MAX_DURATION is not None:
+        for x in J.keys():
+            J[x][0] = D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds')  # Travel-duration budget
     L = initialize_from_desti(routes_by_stop_dict, stops_dict, DESTINATION, footpath_dict, idx_by_route_stop_dict)
     R_t, Q = initialize_from_source(footpath_dict, SOURCE, routes_by_stop_dict, stops_dict, stoptimes_dict, D_TIME,
                                         MAX_TRANSFER, WALKING_FROM_SOURCE, idx_by_route_stop_dict)
     n = 1
     while n <= MAX_TRANSFER:
-        for counter, trip_segment in enumerate(Q[n]):
-            from_stop, tid, to_stop, trip_route, tid_idx = trip_segment[0: 5]
-            trip = stoptimes_dict[trip_route][tid_idx][from_stop:to_stop]
+        queue = Q[n]
+        for counter in range(queue.size):
+            from_stop, to_stop, trip_route, tid_idx, tid = queue.from_idx[counter], queue.to_idx[counter], queue.route[counter], queue.trip_idx[counter], queue.tid[counter]
+            trip = stoptimes_dict[trip_route][tid_idx]
             try:
-                L[trip_route]
-                stop_list, _ = zip(*trip)
                 for last_leg in L[trip_route]:
-                    idx = [x[0] for x in enumerate(stop_list) if x[1] == last_leg[2]]
-                    if idx and from_stop < last_leg[0] and trip[idx[0]][1] + last_leg[1] < J[n][0]:
+                    if from_stop < last_leg[0] < to_stop and trip[last_leg[0]][1] + last_leg[1] < J[n][0]:
                         if last_leg[1] == pd.to_timedelta(0, unit="seconds"):
                             walking = (0, 0)
                         else:
                             walking = (1, stops_dict[trip_route][last_leg[0]])
-                        J = update_label(trip[idx[0]][1] + last_leg[1], n, (tid, walking, counter), J, MAX_TRANSFER)
+                        J = update_label(trip[last_leg[0]][1] + last_leg[1], n, (tid, walking, counter, last_leg[0]), J, MAX_TRANSFER)
             except KeyError:
                 pass
-            try:
-                if tid in trip_set and trip[1][1] < J[n][0]:
-                    connection_list = [connection for from_stop_idx, transfer_stop_id in
-                                       enumerate(trip[1:], from_stop + 1)
-                                       for connection in trip_transfer_dict[tid][from_stop_idx]]
-                    enqueue(connection_list, n + 1, (tid, counter, 0), R_t, Q, stoptimes_dict)
-            except IndexError:
-                pass
+            if tid in trip_set and from_stop + 1 < to_stop and trip[from_stop + 1][1] < J[n][0]:
+                connection_list = [(*connection, from_stop_idx) for from_stop_idx in range(from_stop + 1, to_stop)
+                                   if lower_bound is None or (trip[from_stop_idx][0] in lower_bound and trip[from_stop_idx][1] + lower_bound[trip[from_stop_idx][0]] < J[n][0])
+                                   for connection in trip_transfer_dict[tid][from_stop_idx]]
+                enqueue(connection_list, n + 1, counter, R_t, Q, stoptimes_dict)
         n = n + 1
-    TBTR_out = post_process(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, PRINT_ITINERARY, D_TIME,
-                            MAX_TRANSFER, trip_transfer_dict)
+    if GET_JOURNEYS == 1:
+        _, _, TBTR_out = post_process_dhanus(J, Q, DESTINATION, SOURCE, footpath_dict, stoptimes_dict, PRINT_ITINERARY, D_TIME, MAX_TRANSFER)
+    else:
+        TBTR_out = post_process(J, Q, DESTINATION, SOURCE, footpath_dict, stops_dict, stoptimes_dict, PRINT_ITINERARY, D_TIME,
+                                MAX_TRANSFER, trip_transfer_dict)
     out.append(TBTR_out)
     return out
@@ -132,6 +132,89 @@ def algorithm3_parallel(trip_details: tuple)-> list:
             pass
     return removed_trans
 
+
+def algorithm4_parallel(trip_details: tuple) -> list:
+    """
+    Extra transfer reduction. Same labels as Algorithm 3, but all trip transfers from a stop are evaluated together
+    (bag of the stop). A transfer is kept only if it gives the earliest arrival at some stop that it improves. Algorithm 3
+    keeps a transfer as soon as it improves a label, so transfers at the same stop which are dominated by a transfer
+    scanned later (e.g. a later trip or a later stop of the same route) survive Algorithm 3 and are removed here.
+    Two labels are kept per stop: the arrival time and the time at which another trip can be boarded there (arrival time
+    + change_time when reached by a trip). A transfer to trip u of a route is also removed if a kept transfer from the same
+    or a later stop of the trip reaches an earlier (or the same) trip of that route at an earlier (or the same) stop index.
+
+    Args:
+        trip_details: tuple of form: (route_id, trip_id, trip)
+
+    Returns:
+        list of non-optimal trip transfers.
+
+    """
+    r_id, t_id, trip = trip_details
+    removed_trans = []
+    change_sec = change_time.total_seconds()
+    stop_labels = defaultdict(lambda: inf_time)
+    change_labels = defaultdict(lambda: inf_time)
+    tid = f"{r_id}_{t_id}"
+    trans_by_stop = defaultdict(lambda: [])
+    for trans in trip_transfer_dict.get(tid, []):
+        trans_by_stop[trans[0]].append((trans, [int(y) for y in trans[1].split("_")]))
+    reached_by_route = defaultdict(lambda: [])  # Format {route id: [(trip index, stop index) of kept transfers]}
+    for s_idx, stop_seq in reversed(list(enumerate(trip))):
+        stop_labels[stop_seq[0]] = min(stop_labels[stop_seq[0]], stop_seq[1])
+        change_labels[stop_seq[0]] = min(change_labels[stop_seq[0]], stop_seq[1] + change_sec)
+        if stop_seq[0] in footpath_keys:
+            for q in footpath_dict[stop_seq[0]]:
+                stop_labels[q[0]] = min(stop_labels[q[0]], stop_seq[1] + q[1])
+                change_labels[q[0]] = min(change_labels[q[0]], stop_seq[1] + q[1])
+        candidates = []
+        stop_reached = defaultdict(lambda: [])
+        for trans, breakdown in sorted(trans_by_stop[s_idx], key=lambda x: (x[1][1], x[0][2])):
+            if any(u <= breakdown[1] and j <= trans[2] for u, j in reached_by_route[breakdown[0]] + stop_reached[breakdown[0]]):
+                removed_trans.append((tid, trans))
+                continue
+            stop_reached[breakdown[0]].append((breakdown[1], trans[2]))
+            candidates.append((trans, breakdown))
+        stop_bag = {}  # Format {(stop id, label): (earliest time, position of the transfer in candidates)}. label 0: arrival, 1: change
+        for x, (trans, breakdown) in enumerate(candidates):
+            for stop_connect_0, stop_connect_1 in stoptimes_dict[breakdown[0]][breakdown[1]][trans[2] + 1:]:
+                reached = [((stop_connect_0, 0), stop_connect_1), ((stop_connect_0, 1), stop_connect_1 + change_sec)]
+                if stop_connect_0 in footpath_keys:
+                    for footpath_connect in footpath_dict[stop_connect_0]:
+                        reached.append(((footpath_connect[0], 0), stop_connect_1 + footpath_connect[1]))
+                        reached.append(((footpath_connect[0], 1), stop_connect_1 + footpath_connect[1]))
+                for key, label_time in reached:
+                    labels = stop_labels if key[1] == 0 else change_labels
+                    if label_time < labels[key[0]] and label_time < stop_bag.get(key, (inf_time, -1))[0]:
+                        stop_bag[key] = (label_time, x)
+        keep = set([x for _, x in stop_bag.values()])
+        for x, (trans, breakdown) in enumerate(candidates):
+            if x in keep:
+                reached_by_route[breakdown[0]].append((breakdown[1], trans[2]))
+            else:
+                removed_trans.append((tid, trans))
+        for (stop, label), (label_time, _) in stop_bag.items():
+            if label == 0:
+                stop_labels[stop] = label_time
+            else:
+                change_labels[stop] = label_time
+    return removed_trans
+
+
+def get_reduction(before: int, after: int) -> int:
+    """
+    Percentage reduction in the trip-transfer count (0 if there were no trip-transfers).
+
+    Args:
+        before (int): count before the reduction.
+        after (int): count after the reduction.
+
+    Returns:
+        int
+    """
+    return int(((before - after) / before) * 100) if before else 0
+
+
 def take_inputs() -> tuple:
     '''
     Takes the required inputs for building TBTR preprocessing
@@ -142,7 +225,8 @@ def take_inputs() -> tuple:
         f"trip-transfers can be build in parallel. Enter number of CORES (1 for serial). \nAvailable CORES (logical and physical):  {multiprocessing.cpu_count()}\n: "))
     change_time = pd.to_timedelta(0, unit='seconds')
     GENERATE_LOGFILE = int(input(f"Press 1 to redirect output to a log file in logs folder. Else press 0\n: "))
-    return breaker, CORES, change_time, GENERATE_LOGFILE
+    EXTRA_REDUCTION = int(input(f"Press 1 to run the extra transfer reduction (Algorithm 4). Else press 0\n: "))
+    return breaker, CORES, change_time, GENERATE_LOGFILE, EXTRA_REDUCTION
 
 
 if __name__ == "__main__":
@@ -152,7 +236,7 @@ if __name__ == "__main__":
     if BUILD_TBTR_FILES==1:
         # NETWORK_NAME = 'uk'
         # NETWORK_NAME = 'germany'
-        breaker, CORES, change_time, GENERATE_LOGFILE = take_inputs()
+        breaker, CORES, change_time, GENERATE_LOGFILE, EXTRA_REDUCTION = take_inputs()
         print(breaker)
         stops_file, trips_file, stop_times_file, transfers_file, stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict = read_testcase(
             NETWORK_NAME)
@@ -222,13 +306,26 @@ if __name__ == "__main__":
             for tid, trans in route_level_turns:
                 trip_transfer_dict[tid].remove(trans)
         final_trans = sum([len(x) for x in trip_transfer_dict.values()])
+        A4_time, extra_trans = 0, final_trans
+        if EXTRA_REDUCTION == 1:
+            print("Running Algorithm 4")
+            start = time_measure()
+            with Pool(CORES) as pool:
+                non_optimal_trans = pool.map(algorithm4_parallel, trip_list)
+            A4_time = time_measure() - start
+            for route_level_turns in non_optimal_trans:
+                for tid, trans in route_level_turns:
+                    trip_transfer_dict[tid].remove(trans)
+            extra_trans = sum([len(x) for x in trip_transfer_dict.values()])
         print(breaker)
         print(f"Algorithm 1 time - {round(A1_time, 2)},Triptransfer count = {len(Transfer_set_db)}")
         print(
-            f"Algorithm 2 time - {round(A2_time, 2)},Triptransfer count = {init_tans} (Reduction: {int(((len(Transfer_set_db) - init_tans) / len(Transfer_set_db)) * 100)})")
-        print(f"Algorithm 3 time - {round(A3_time, 2)},Triptransfer count = {final_trans} (Reduction: {int(((init_tans - final_trans) / init_tans) * 100)})")
-        print(f"Total time - {round(A1_time + A2_time + A3_time, 1)}")
-        print(f"Total time - {round((A1_time + A2_time + A3_time) * CORES, 1)}")
+            f"Algorithm 2 time - {round(A2_time, 2)},Triptransfer count = {init_tans} (Reduction: {get_reduction(len(Transfer_set_db), init_tans)})")
+        print(f"Algorithm 3 time - {round(A3_time, 2)},Triptransfer count = {final_trans} (Reduction: {get_reduction(init_tans, final_trans)})")
+        if EXTRA_REDUCTION == 1:
+            print(f"Algorithm 4 time - {round(A4_time, 2)},Triptransfer count = {extra_trans} (Reduction: {get_reduction(final_trans, extra_trans)})")
+        print(f"Total time - {round(A1_time + A2_time + A3_time + A4_time, 1)}")
+        print(f"Total time - {round((A1_time + A2_time + A3_time + A4_time) * CORES, 1)}")
         print(breaker)
         trip_transfer_dict_new = {}
         for tid, connections in trip_transfer_dict.items():
@@ -56,7 +56,7 @@ def parallel_func(source_info: tuple) -> list:
     return temp_list
 
 
-def post_process(transfer_file, WALKING_LIMIT: int, NETWORK_NAME: str) -> None:
+def post_process(transfer_file, WALKING_LIMIT: int, NETWORK_NAME: str, CLOSE_FOOTPATHS: int = 1) -> None:
     """
     Post process the transfer file. Following functionality are included:
         1. Checks if the transfers graph is transitively closed.
@@ -64,6 +64,9 @@ def post_process(transfer_file, WALKING_LIMIT: int, NETWORK_NAME: str) -> None:
         transfer_file: GTFS transfers.txt file
         WALKING_LIMIT (int): Maximum walking limit
         NETWORK_NAME (str): Network name
+        CLOSE_FOOTPATHS (int): 1 or 0. 1 saves the transitively closed graph as transfers.txt. 0 keeps the sparse walking
+        graph (only made symmetric) and saves it as transfers_sparse.txt, which can only be used by engines run with
+        UNRESTRICTED_WALKING=1.
 
     Returns:
         None
@@ -78,7 +81,7 @@ def post_process(transfer_file, WALKING_LIMIT: int, NETWORK_NAME: str) -> None:
     G = nx.Graph()  # Ensure transitive closure of footpath graph
     edges = list(zip(transfer_file.from_stop_id, transfer_file.to_stop_id, transfer_file.min_transfer_time))
     G.add_weighted_edges_from(edges)
-    connected = [c for c in nx.connected_components(G)]
+    connected = [c for c in nx.connected_components(G)] if CLOSE_FOOTPATHS == 1 else []
     for tree in tqdm(connected):
         for source in tree:
             for desti in tree:
@@ -91,8 +94,9 @@ def post_process(transfer_file, WALKING_LIMIT: int, NETWORK_NAME: str) -> None:
     transfer_file[2] = transfer_file[2].apply(lambda x: list(x.values())[0])
     transfer_file.rename(columns={0: "from_stop_id", 1: "to_stop_id", 2: "min_transfer_time"}, inplace=True)
     transfer_file.sort_values(by=['min_transfer_time', 'from_stop_id', 'to_stop_id']).reset_index(drop=True)
-    transfer_file.to_csv(f"./GTFS/{NETWORK_NAME}/transfers.csv", index=False)
-    transfer_file.to_csv(f"./GTFS/{NETWORK_NAME}/transfers.txt", index=False)
+    file_name = "transfers" if CLOSE_FOOTPATHS == 1 else "transfers_sparse"
+    transfer_file.to_csv(f"./GTFS/{NETWORK_NAME}/{file_name}.csv", index=False)
+    transfer_file.to_csv(f"./GTFS/{NETWORK_NAME}/{file_name}.txt", index=False)
     print(f"Total transfers: {len(transfer_file)}")
     print(f"Longest transfer: {transfer_file.iloc[-1].min_transfer_time} seconds")
     print(f"Time required: {round((time() - start_time) / 60, 1)} minutes")
@@ -110,6 +114,7 @@ def initialize() -> tuple:
         stops_list (list):
         CORES (int): Number of codes to be used
         WALKING_LIMIT (int): Maximum allowed walking time
+        CLOSE_FOOTPATHS (int): 1 or 0. 0 saves the sparse footpath graph (see post_process)
         start_time: timestamp object
 
     Warnings:
@@ -121,6 +126,7 @@ def initialize() -> tuple:
     WALKING_LIMIT = int(input("Enter maximum allowed walking limit in seconds. Format: YYYYMMDD. Example: 180\n: "))
     CORES = int(input(
         f"Transfer.txt can be build in parallel. Enter number of CORES (1 for serial). \nAvailable cores (logical and physical):  {multiprocessing.cpu_count()}\n: "))
+    CLOSE_FOOTPATHS = int(input("Enter 1 to build transitively closed footpaths (transfers.txt) or 0 for the sparse footpath graph (transfers_sparse.txt). Example: 1\n: "))
 
     print(f'RAM {round(psutil.virtual_memory().total / (1024.0 ** 3))} GB (% used:{psutil.virtual_memory()[2]})')
     start_time = time()
@@ -129,7 +135,7 @@ def initialize() -> tuple:
     # stops_db = stops_db.sort_values(by='stop_id').reset_index(drop=True).reset_index().rename(columns={"index": 'new_stop_id'})
     # stops_list = stops_list[:10]
     print(f"Running shortest path on {CORES} CORES")
-    return breaker, G, stops_list, CORES, WALKING_LIMIT, start_time
+    return breaker, G, stops_list, CORES, WALKING_LIMIT, CLOSE_FOOTPATHS, start_time
 
 
 if __name__ == '__main__':
@@ -140,14 +146,14 @@ if __name__ == '__main__':
     if BUILD_TRANSFER == 1:
         import osmnx as ox
         ox.config(use_cache=True, log_console=False)
-        breaker, G, stops_list, CORES, WALKING_LIMIT, start_time = initialize()
+        breaker, G, stops_list, CORES, WALKING_LIMIT, CLOSE_FOOTPATHS, start_time = initialize()
         with Pool(CORES) as pool:
             result = pool.map(parallel_func, stops_list)
         print(breaker)
         stops_db, osm_nodes, G = 0, 0, 0
         result = [item2 for item in result for item2 in item]
         transfer_file = pd.DataFrame(result, columns=['from_stop_id', 'to_stop_id', 'min_transfer_time'])
-        post_process(transfer_file, WALKING_LIMIT, NETWORK_NAME)
+        post_process(transfer_file, WALKING_LIMIT, NETWORK_NAME, CLOSE_FOOTPATHS)
     else:
         try:
             transfer_file = pd.read_csv(f'./GTFS/{NETWORK_NAME}/gtfs_o/transfers.txt')
@@ -4,6 +4,7 @@ This is done for easy/faster data lookup.
 """
 
 import pickle
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
@@ -136,3 +137,262 @@ def stop_idx_in_route(stop_times_file, NETWORK_NAME: str)-> dict:
         pickle.dump(idx_by_route_stop, pickle_file)
     print("idx_by_route_stop done")
     return idx_by_route_stop
+
+
+def build_save_departures_by_stop(stop_times_file, NETWORK_NAME: str) -> dict:
+    """
+    This function saves a dictionary to provide easy access to all the departures from a stop id. Departures are sorted
+    in the increasing order of departure time so that a time window can be sliced using bisection.
+
+    Args:
+        stop_times_file (pandas.dataframe): stop_times.txt file in GTFS.
+        NETWORK_NAME (str): path to network NETWORK_NAME.
+
+    Returns:
+        departures_by_stop (dict): keys: stop_id, values: tuple of sorted departure times and departures. Format-> dict[stop_id] = ([departure time], [(trip id, departure time, stop index)])
+    """
+    print("building departures_by_stop")
+    stop_times_file.arrival_time = pd.to_datetime(stop_times_file.arrival_time)
+    departures_by_stop = {}
+    for stop_id, departures in tqdm(stop_times_file.groupby("stop_id")):
+        departures = departures.sort_values(by="arrival_time", kind="mergesort")
+        departure_times = departures.arrival_time.tolist()
+        departures_by_stop[stop_id] = (departure_times, list(zip(departures.trip_id.tolist(), departure_times, departures.stop_sequence.tolist())))
+
+    with open(f'./dict_builder/{NETWORK_NAME}/departures_by_stop.pkl', 'wb') as pickle_file:
+        pickle.dump(departures_by_stop, pickle_file)
+    print("departures_by_stop done")
+    return departures_by_stop
+
+
+def build_save_min_time_graph(stoptimes_dict: dict, footpath_dict: dict, NETWORK_NAME: str) -> dict:
+    """
+    This function saves the reversed minimum-travel-time stop graph used to compute lower bounds on travel time. An edge is
+    added between consecutive stops of every route (weight: minimum travel time over all trips of the route) and for every
+    footpath (weight: footpath duration).
+
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        NETWORK_NAME (str): path to network NETWORK_NAME.
+
+    Returns:
+        min_time_graph (dict): keys: to stop_id, values: list of tuples of form (from stop id, minimum travel time in seconds). Format-> dict[stop_id]=[(stop_id, seconds)]
+    """
+    print("building min_time_graph")
+    min_time = {}
+    for route_trips in tqdm(stoptimes_dict.values()):
+        for trip in route_trips:
+            for (from_stop, from_time), (to_stop, to_time) in zip(trip[:-1], trip[1:]):
+                travel_time = (to_time - from_time).total_seconds()
+                if travel_time < min_time.get((from_stop, to_stop), float("inf")):
+                    min_time[(from_stop, to_stop)] = travel_time
+    for from_stop, connections in footpath_dict.items():
+        from_stop = int(from_stop)
+        for to_stop, footpath_time in connections:
+            to_stop = int(to_stop)
+            if footpath_time.total_seconds() < min_time.get((from_stop, to_stop), float("inf")):
+                min_time[(from_stop, to_stop)] = footpath_time.total_seconds()
+    min_time_graph = {}
+    for (from_stop, to_stop), travel_time in min_time.items():
+        min_time_graph.setdefault(to_stop, []).append((from_stop, travel_time))
+
+    with open(f'./dict_builder/{NETWORK_NAME}/min_time_graph.pkl', 'wb') as pickle_file:
+        pickle.dump(min_time_graph, pickle_file)
+    print("min_time_graph done")
+    return min_time_graph
+
+
+def build_save_dense_network(stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, routes_by_stop_dict: dict, NETWORK_NAME: str) -> dict:
+    """
+    This function saves a dense-index (NumPy) version of the network used by the vectorized RAPTOR engines. Stops and
+    routes are renumbered 0..n-1 and all timestamps are stored as int64 nanoseconds.
+
+    Args:
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        NETWORK_NAME (str): path to network NETWORK_NAME.
+
+    Returns:
+        dense_network (dict): keys and values:
+            stop_ids (np.ndarray): stop id of every dense stop index.
+            stop_index (dict): Format {stop_id: dense stop index}.
+            route_ids (np.ndarray): route id of every dense route index.
+            route_stops (list): dense stop indices of every route. Format [np.ndarray]
+            route_times (list): arrival times of every route. route_times[r][i, j] is the arrival of trip j at the i-th stop. Format [np.ndarray]
+            inc_stop, inc_route, inc_pos (np.ndarray): route/stop incidence sorted by stop, i.e. inc_route[e] visits stop inc_stop[e] at position inc_pos[e].
+            inc_ptr (np.ndarray): CSR pointer of the incidence arrays by stop.
+            fp_ptr, fp_to, fp_time (np.ndarray): footpaths in CSR format (time in nanoseconds).
+    """
+    print("building dense network")
+    stop_ids = np.array(sorted(routes_by_stop_dict.keys()), dtype=np.int64)
+    stop_index = {stop: idx for idx, stop in enumerate(stop_ids.tolist())}
+    route_ids = np.array(sorted(stops_dict.keys()), dtype=np.int64)
+    route_stops, route_times, incidence = [], [], []
+    for r_idx, route in enumerate(tqdm(route_ids.tolist())):
+        route_stops.append(np.array([stop_index[stop] for stop in stops_dict[route]], dtype=np.int64))
+        route_times.append(np.ascontiguousarray(np.array([[time.value for _, time in trip] for trip in stoptimes_dict[route]], dtype=np.int64).T))
+        incidence.extend([(stop_index[stop], r_idx, pos) for pos, stop in enumerate(stops_dict[route])])
+    incidence.sort()
+    inc_stop, inc_route, inc_pos = [np.array(x, dtype=np.int64) for x in zip(*incidence)]
+    inc_ptr = np.searchsorted(inc_stop, np.arange(len(stop_ids) + 1))
+    footpaths = sorted((stop_index[from_stop], stop_index[int(to_stop)], footpath_time.value)
+                       for from_stop, connections in footpath_dict.items() if from_stop in stop_index
+                       for to_stop, footpath_time in connections if int(to_stop) in stop_index)
+    fp_from = np.array([x[0] for x in footpaths], dtype=np.int64)
+    dense_network = {"stop_ids": stop_ids,
+                     "stop_index": stop_index,
+                     "route_ids": route_ids,
+                     "route_stops": route_stops,
+                     "route_times": route_times,
+                     "inc_stop": inc_stop,
+                     "inc_route": inc_route,
+                     "inc_pos": inc_pos,
+                     "inc_ptr": inc_ptr,
+                     "fp_ptr": np.searchsorted(fp_from, np.arange(len(stop_ids) + 1)),
+                     "fp_to": np.array([x[1] for x in footpaths], dtype=np.int64),
+                     "fp_time": np.array([x[2] for x in footpaths], dtype=np.int64)}
+
+    with open(f'./dict_builder/{NETWORK_NAME}/dense_network.pkl', 'wb') as pickle_file:
+        pickle.dump(dense_network, pickle_file)
+    print("dense network done")
+    return dense_network
+
+
+def _get_stop_cells(stops_file, stop_ids: list, no_of_cells: int) -> dict:
+    """
+    Splits the stops into no_of_cells cells by recursive coordinate bisection. The cell with the most stops is split at
+    the median of its longer side (latitude or longitude) until there are no_of_cells cells.
+
+    Args:
+        stops_file (pandas.dataframe): dataframe with stop details.
+        stop_ids (list): stop ids to be split.
+        no_of_cells (int): number of cells.
+
+    Returns:
+        stop_cell (dict): Format {stop_id: cell id}.
+    """
+    coordinates = stops_file.set_index("stop_id").loc[stop_ids, ["stop_lat", "stop_lon"]].to_numpy()
+    cells = [np.arange(len(stop_ids))]
+    while len(cells) < no_of_cells:
+        cell = cells.pop(max(range(len(cells)), key=lambda x: len(cells[x])))
+        if len(cell) < 2:
+            cells.append(cell)
+            break
+        axis = int(np.ptp(coordinates[cell], axis=0).argmax())
+        order = cell[np.argsort(coordinates[cell, axis], kind="stable")]
+        cells.extend([order[: len(order) // 2], order[len(order) // 2:]])
+    return {int(stop_ids[x]): cell_id for cell_id, cell in enumerate(cells) for x in cell.tolist()}
+
+
+def _backward_profile_routes(target: int, arrivals: list, dense_network: dict, rev_footpaths: dict, MAX_TRANSFER: int, change_time: int) -> set:
+    """
+    Backward (reverse rRAPTOR) profile search into target. Arrival times at target are processed earliest first and the
+    departure labels are reused across arrival times. Every route which improves a label is on some optimal journey into
+    target for that arrival time.
+
+    Args:
+        target (int): dense stop index of target stop.
+        arrivals (list): arrival times at target in nanoseconds, sorted in increasing order.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        rev_footpaths (dict): reversed footpaths. Format {dense to-stop index: [(dense from-stop index, time in ns)]}.
+        MAX_TRANSFER (int): maximum transfer limit.
+        change_time (int): change-time in nanoseconds.
+
+    Returns:
+        used_routes (set): dense route indices on optimal journeys into target.
+    """
+    route_stops, route_times = dense_network["route_stops"], dense_network["route_times"]
+    inc_ptr, inc_route, inc_pos = dense_network["inc_ptr"], dense_network["inc_route"], dense_network["inc_pos"]
+    neg_inf_time = np.iinfo(np.int64).min // 4
+    # label[k, p] is the latest departure from p with at most k trips. Labels are kept monotone in k, so a label reused
+    # from an earlier arrival time never prunes a label with fewer trips.
+    label = np.full((MAX_TRANSFER + 1, len(dense_network["stop_ids"])), neg_inf_time, dtype=np.int64)
+    used_routes = set()
+    for a_time in arrivals:
+        marked_stop = set()
+        for stop, fp_time in [(target, 0)] + rev_footpaths.get(target, []):
+            if a_time - fp_time + change_time > label[0, stop]:  # No change-time when alighting into target
+                label[:, stop] = np.maximum(label[:, stop], a_time - fp_time + change_time)
+                marked_stop.add(stop)
+        for k in range(1, MAX_TRANSFER + 1):
+            Q = {}  # Format {route index: latest marked stop index in route}
+            for p in marked_stop:
+                for e in range(inc_ptr[p], inc_ptr[p + 1]):
+                    Q[int(inc_route[e])] = max(int(inc_pos[e]), Q.get(int(inc_route[e]), -1))
+            marked_stop = set()
+            for route, current_stopindex_by_route in Q.items():
+                times, current_trip_t = route_times[route], -1
+                for p_i in route_stops[route][current_stopindex_by_route::-1].tolist():
+                    if current_trip_t != -1 and times[current_stopindex_by_route, current_trip_t] > label[k, p_i]:
+                        label[k:, p_i] = np.maximum(label[k:, p_i], times[current_stopindex_by_route, current_trip_t])
+                        used_routes.add(route)
+                        marked_stop.add(p_i)
+                    if label[k - 1, p_i] > neg_inf_time and (current_trip_t == -1 or label[k - 1, p_i] - change_time > times[current_stopindex_by_route, current_trip_t]):
+                        alightable = np.flatnonzero(times[current_stopindex_by_route] <= label[k - 1, p_i] - change_time)
+                        if alightable.size:
+                            current_trip_t = int(alightable[times[current_stopindex_by_route, alightable].argmax()])
+                    current_stopindex_by_route = current_stopindex_by_route - 1
+            for p in list(marked_stop):
+                for p_dash, fp_time in rev_footpaths.get(p, []):
+                    if label[k, p] - fp_time > label[k, p_dash]:
+                        label[k:, p_dash] = np.maximum(label[k:, p_dash], label[k, p] - fp_time)
+                        marked_stop.add(p_dash)
+            if not marked_stop:
+                break
+    return used_routes
+
+
+def build_save_route_arc_flags(stops_file, dense_network: dict, NETWORK_NAME: str, no_of_cells: int, MAX_TRANSFER: int, CHANGE_TIME_SEC: int) -> tuple:
+    """
+    This function saves route arc-flags. Stops are split into cells by recursive coordinate bisection (see _get_stop_cells).
+    The flag of a route for a cell is set if the route visits the cell or is on some optimal journey into one of the
+    cell's boundary stops, i.e. stops that can be entered from another cell by a route or a footpath. The latter routes
+    are found with backward profile searches from every boundary stop. A search only processes the arrival times at which
+    the boundary stop is entered from another cell.
+
+    Args:
+        stops_file (pandas.dataframe): dataframe with stop details.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        NETWORK_NAME (str): path to network NETWORK_NAME.
+        no_of_cells (int): number of cells.
+        MAX_TRANSFER (int): maximum transfer limit. Flags are valid for queries with at most MAX_TRANSFER rounds.
+        CHANGE_TIME_SEC (int): change-time in seconds. Flags are valid for queries with the same change-time.
+
+    Returns:
+        stop_cell (dict): Format {stop_id: cell id}.
+        arc_flags (dict): Format {cell id: set of route ids whose flag for the cell is set}.
+    """
+    print("building route arc-flags")
+    stop_ids, route_ids = dense_network["stop_ids"], dense_network["route_ids"]
+    stop_cell = _get_stop_cells(stops_file, stop_ids.tolist(), no_of_cells)
+    cell = np.array([stop_cell[stop] for stop in stop_ids.tolist()])
+    rev_footpaths = {}
+    for p in range(len(stop_ids)):
+        for e in range(dense_network["fp_ptr"][p], dense_network["fp_ptr"][p + 1]):
+            rev_footpaths.setdefault(int(dense_network["fp_to"][e]), []).append((p, int(dense_network["fp_time"][e])))
+    inc_ptr, inc_route, inc_pos = dense_network["inc_ptr"], dense_network["inc_route"], dense_network["inc_pos"]
+    route_times = dense_network["route_times"]
+    boundary_events = {}  # Format {boundary stop index: [arrival times (ns) at which the stop is entered from another cell]}
+    for p, connections in rev_footpaths.items():
+        for p_dash, fp_time in connections:
+            if cell[p] != cell[p_dash]:
+                boundary_events.setdefault(p, []).extend([route_times[inc_route[e]][inc_pos[e]] + fp_time for e in range(inc_ptr[p_dash], inc_ptr[p_dash + 1])])
+    arc_flags = {cell_id: set() for cell_id in range(no_of_cells)}
+    for route, stops in enumerate(dense_network["route_stops"]):
+        for x in range(1, len(stops)):
+            if cell[stops[x]] != cell[stops[x - 1]]:
+                boundary_events.setdefault(int(stops[x]), []).append(route_times[route][x])
+        for cell_id in set(cell[stops].tolist()):
+            arc_flags[cell_id].add(int(route_ids[route]))
+    for p in tqdm(sorted(boundary_events)):
+        arrivals = np.unique(np.concatenate(boundary_events[p])).tolist() if boundary_events[p] else []
+        used_routes = _backward_profile_routes(p, arrivals, dense_network, rev_footpaths, MAX_TRANSFER, CHANGE_TIME_SEC * 10 ** 9)
+        arc_flags[cell[p]].update([int(route_ids[route]) for route in used_routes])
+
+    with open(f'./dict_builder/{NETWORK_NAME}/route_arc_flags_{no_of_cells}.pkl', 'wb') as pickle_file:
+        pickle.dump((stop_cell, arc_flags), pickle_file)
+    print("route arc-flags done")
+    return stop_cell, arc_flags
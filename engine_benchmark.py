@@ -0,0 +1,75 @@
+"""
+Times the TBTR engines on random range queries. The outputs are saved so that two revisions of the code can be checked
+for identical results (run the script on both and compare the saved files).
+"""
+import pickle
+from time import time
+
+from engine_comparison import get_random_queries
+from miscellaneous_func import read_testcase, read_departures_by_stop
+from TBTR.one_many_tbtr import onetomany_rtbtr
+from TBTR.rtbtr import rtbtr
+from TBTR.tbtr import tbtr
+
+
+def time_engine(name: str, queries: list) -> tuple:
+    '''
+    Runs one engine on all queries.
+
+    Args:
+        name (str): 'tbtr', 'rtbtr' or 'onetomany_rtbtr'.
+        queries (list): Format [(SOURCE, DESTINATION, window_start, window_end)]
+
+    Returns:
+        run_time (float): total time in seconds.
+        outputs (list): output of every query.
+    '''
+    outputs = []
+    start = time()
+    for SOURCE, DESTINATION, window_start, window_end in queries:
+        if name == 'tbtr':
+            output = tbtr(SOURCE, DESTINATION, window_start, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, routes_by_stop_dict, stops_dict,
+                          stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
+        elif name == 'rtbtr':
+            output = rtbtr(SOURCE, DESTINATION, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, 1, routes_by_stop_dict,
+                           stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set,
+                           window_start, window_end)
+        else:
+            output = onetomany_rtbtr(SOURCE, [DESTINATION], departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, 1,
+                                     routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict,
+                                     trip_transfer_dict, trip_set, window_start, window_end)
+        outputs.append(output)
+    return time() - start, outputs
+
+
+def main():
+    first_time = stop_times_file.arrival_time.min()
+    queries = get_random_queries(NUM, list(routes_by_stop_dict.keys()), first_time)
+    results = {}
+    for name in ['tbtr', 'rtbtr', 'onetomany_rtbtr']:
+        run_time, results[name] = time_engine(name, queries)
+        print(f'{name}: {round(run_time, 2)} seconds for {NUM} queries')
+    with open(OUTPUT_FILE, 'wb') as file:
+        pickle.dump(results, file)
+    print(f'Outputs saved in {OUTPUT_FILE}')
+
+
+if __name__ == "__main__":
+    # ## global variables ## #
+    NETWORK_NAME = 'anaheim'
+    MAX_TRANSFER = 4
+    WALKING_FROM_SOURCE = 1
+    OUTPUT_FILE = f'./benchmark_{NETWORK_NAME}.pkl'
+
+    stops_file, trips_file, stop_times_file, transfers_file,\
+        stops_dict, stoptimes_dict, footpath_dict,\
+        routes_by_stop_dict, idx_by_route_stop_dict = \
+        read_testcase(f'./{NETWORK_NAME}')
+    departures_by_stop = read_departures_by_stop(stop_times_file, NETWORK_NAME)
+    with open(f'./GTFS/{NETWORK_NAME}/TBTR_trip_transfer_dict.pkl', 'rb') as file:
+        trip_transfer_dict = pickle.load(file)
+    trip_set = set(trip_transfer_dict.keys())
+    # ## global variables ## #
+
+    NUM = 50
+    main()
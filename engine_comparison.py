@@ -0,0 +1,152 @@
+"""
+Compares the outputs of engines which must give the same results (e.g. an optimized engine against its reference
+implementation) on random queries.
+"""
+import pickle
+from random import Random
+
+import numpy as np
+import pandas as pd
+
+from miscellaneous_func import read_testcase, read_departures_by_stop, read_dense_network, read_route_arc_flags
+from RAPTOR.batched_rraptor import batched_rraptor
+from RAPTOR.rraptor import rraptor
+from RAPTOR.std_raptor import raptor
+from TBTR.one_to_all_tbtr import onetoall_tbtr
+from TBTR.tbtr import tbtr
+
+
+def get_random_queries(NUM: int, stop_list: list, first_time, seed: int = 0) -> list:
+    '''
+    Generates random range queries.
+
+    Args:
+        NUM (int): number of queries.
+        stop_list (list): stop ids from which SOURCE and DESTINATION are drawn.
+        first_time (pandas.datetime): earliest window start.
+        seed (int): random seed.
+
+    Returns:
+        queries (list): Format [(SOURCE, DESTINATION, window_start, window_end)]
+    '''
+    rng = Random(seed)
+    queries = []
+    for _ in range(NUM):
+        SOURCE, DESTINATION = rng.sample(stop_list, 2)
+        window_start = first_time + pd.to_timedelta(rng.randrange(0, 12 * 60), unit='minutes')
+        queries.append((SOURCE, DESTINATION, window_start, window_start + pd.to_timedelta(90, unit='minutes')))
+    return queries
+
+
+def compare_batched_rraptor(queries: list, BATCH_SIZE: int = 32) -> list:
+    '''
+    Checks that batched_rraptor returns the same trips as rraptor.
+
+    Args:
+        queries (list): Format [(SOURCE, DESTINATION, window_start, window_end)]
+        BATCH_SIZE (int): number of departure times processed together by batched_rraptor.
+
+    Returns:
+        mismatches (list): queries with different outputs. Format [(query, trips only in rraptor, trips only in batched_rraptor)]
+    '''
+    mismatches = []
+    for SOURCE, DESTINATION, window_start, window_end in queries:
+        reference = set(rraptor(SOURCE, DESTINATION, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, 1,
+                                routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict,
+                                window_start, window_end))
+        output = set(batched_rraptor(SOURCE, DESTINATION, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, 1,
+                                     dense_network, footpath_dict, BATCH_SIZE, window_start, window_end))
+        if reference != output:
+            mismatches.append(((SOURCE, DESTINATION, window_start, window_end), reference - output, output - reference))
+    return mismatches
+
+
+def compare_arc_flags(queries: list) -> list:
+    '''
+    Checks that raptor with route arc-flag pruning returns the same arrivals as raptor without pruning. The departure
+    time of a query is its window_start.
+
+    Args:
+        queries (list): Format [(SOURCE, DESTINATION, window_start, window_end)]
+
+    Returns:
+        mismatches (list): queries with different outputs. Format [(query, output without pruning, output with pruning)]
+    '''
+    mismatches = []
+    for SOURCE, DESTINATION, D_TIME, _ in queries:
+        reference = raptor(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, routes_by_stop_dict,
+                           stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
+        output = raptor(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, routes_by_stop_dict,
+                        stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stop_cell=stop_cell, arc_flags=arc_flags)
+        if reference != output:
+            mismatches.append(((SOURCE, DESTINATION, D_TIME), reference, output))
+    return mismatches
+
+
+def compare_onetoall_tbtr(queries: list) -> list:
+    '''
+    Checks that onetoall_tbtr gives the same pareto-optimal arrivals as tbtr at every stop which is not reached by walking
+    from SOURCE. The departure time of a query is its window_start and its DESTINATION is not used.
+
+    Args:
+        queries (list): Format [(SOURCE, DESTINATION, window_start, window_end)]
+
+    Returns:
+        mismatches (list): stops with different outputs. Format [(SOURCE, D_TIME, stop id, tbtr output, onetoall_tbtr output)]
+    '''
+    mismatches = []
+    for SOURCE, _, D_TIME, _ in queries:
+        label, stop_index = onetoall_tbtr(SOURCE, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, routes_by_stop_dict, stops_dict, stoptimes_dict,
+                                          footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
+        for stop in routes_by_stop_dict.keys():
+            arrivals = label[:, stop_index[stop]]
+            if stop == SOURCE or arrivals[0] < np.iinfo(np.int64).max // 4:
+                continue
+            output = [pd.Timestamp(arrivals[n]) for n in range(MAX_TRANSFER, 0, -1) if arrivals[n] < arrivals[n - 1]]
+            reference = tbtr(SOURCE, stop, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, routes_by_stop_dict, stops_dict, stoptimes_dict,
+                             footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)[0]
+            if (reference or []) != output:
+                mismatches.append((SOURCE, D_TIME, stop, reference, output))
+    return mismatches
+
+
+def main():
+    first_time = stop_times_file.arrival_time.min()
+    queries = get_random_queries(NUM, list(routes_by_stop_dict.keys()), first_time)
+    for BATCH_SIZE in [1, 32]:
+        mismatches = compare_batched_rraptor(queries, BATCH_SIZE)
+        print(f'batched_rraptor (BATCH_SIZE={BATCH_SIZE}) vs rraptor: {len(mismatches)} mismatches in {NUM} queries')
+        for mismatch in mismatches:
+            print(mismatch)
+    mismatches = compare_arc_flags(queries)
+    print(f'raptor with arc-flags ({NO_OF_CELLS} cells) vs raptor: {len(mismatches)} mismatches in {NUM} queries')
+    for mismatch in mismatches:
+        print(mismatch)
+    mismatches = compare_onetoall_tbtr(queries[:10])
+    print(f'onetoall_tbtr vs tbtr: {len(mismatches)} mismatched stops in 10 queries')
+    for mismatch in mismatches:
+        print(mismatch)
+
+
+if __name__ == "__main__":
+    # ## global variables ## #
+    NETWORK_NAME = 'anaheim'
+    MAX_TRANSFER = 4
+    WALKING_FROM_SOURCE = 1
+    CHANGE_TIME_SEC = 0
+    NO_OF_CELLS = 8
+
+    stops_file, trips_file, stop_times_file, transfers_file,\
+        stops_dict, stoptimes_dict, footpath_dict,\
+        routes_by_stop_dict, idx_by_route_stop_dict = \
+        read_testcase(f'./{NETWORK_NAME}')
+    departures_by_stop = read_departures_by_stop(stop_times_file, NETWORK_NAME)
+    dense_network = read_dense_network(stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, NETWORK_NAME)
+    stop_cell, arc_flags = read_route_arc_flags(stops_file, dense_network, NETWORK_NAME, NO_OF_CELLS, MAX_TRANSFER, CHANGE_TIME_SEC)
+    with open(f'./GTFS/{NETWORK_NAME}/TBTR_trip_transfer_dict.pkl', 'rb') as file:
+        trip_transfer_dict = pickle.load(file)
+    trip_set = set(trip_transfer_dict.keys())
+    # ## global variables ## #
+
+    NUM = 50
+    main()
@@ -29,6 +29,64 @@ def load_all_dict(NETWORK_NAME: str):
     return stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict
 
 
+def load_departures_by_stop(NETWORK_NAME: str):
+    """
+    Args:
+        NETWORK_NAME (str): network NETWORK_NAME.
+
+    Returns:
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+    """
+    import pickle
+    with open(f'./dict_builder/{NETWORK_NAME}/departures_by_stop.pkl', 'rb') as file:
+        departures_by_stop = pickle.load(file)
+    return departures_by_stop
+
+
+def load_min_time_graph(NETWORK_NAME: str):
+    """
+    Args:
+        NETWORK_NAME (str): network NETWORK_NAME.
+
+    Returns:
+        min_time_graph (dict): preprocessed dict. Format {to_stop_id: [(from_stop_id, minimum travel time in seconds)]}.
+    """
+    import pickle
+    with open(f'./dict_builder/{NETWORK_NAME}/min_time_graph.pkl', 'rb') as file:
+        min_time_graph = pickle.load(file)
+    return min_time_graph
+
+
+def load_dense_network(NETWORK_NAME: str):
+    """
+    Args:
+        NETWORK_NAME (str): network NETWORK_NAME.
+
+    Returns:
+        dense_network (dict): dense-index network used by the vectorized RAPTOR engines (see build_save_dense_network).
+    """
+    import pickle
+    with open(f'./dict_builder/{NETWORK_NAME}/dense_network.pkl', 'rb') as file:
+        dense_network = pickle.load(file)
+    return dense_network
+
+
+def load_route_arc_flags(NETWORK_NAME: str, no_of_cells: int):
+    """
+    Args:
+        NETWORK_NAME (str): network NETWORK_NAME.
+        no_of_cells (int): number of cells.
+
+    Returns:
+        stop_cell (dict): Format {stop_id: cell id}.
+        arc_flags (dict): Format {cell id: set of route ids whose flag for the cell is set}.
+    """
+    import pickle
+    with open(f'./dict_builder/{NETWORK_NAME}/route_arc_flags_{no_of_cells}.pkl', 'rb') as file:
+        stop_cell, arc_flags = pickle.load(file)
+    return stop_cell, arc_flags
+
+
 def load_all_db(NETWORK_NAME: str):
     """
     Args:
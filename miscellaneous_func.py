@@ -2,10 +2,12 @@
 Module contains miscellaneous functions used for reading data, printing logo etc.
 """
 import pickle
+from collections import defaultdict
 from random import sample
 import os
 
 import networkx as nx
+import numpy as np
 import pandas as pd
 
 
@@ -48,6 +50,107 @@ def read_testcase(NETWORK_NAME: str) -> tuple:
     return stops_file, trips_file, stop_times_file, transfers_file, stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict
 
 
+def read_departures_by_stop(stop_times_file, NETWORK_NAME: str) -> dict:
+    """
+    Reads the per-stop departure index used by range queries. If it is not present, it is built using dict_builder_functions.
+
+    Args:
+        stop_times_file (pandas.dataframe): stop_times.txt file in GTFS.
+        NETWORK_NAME (str): GTFS path
+
+    Returns:
+        departures_by_stop (dict): keys: stop_id, values: tuple of sorted departure times and departures. Format-> dict[stop_id] = ([departure time], [(trip id, departure time, stop index)])
+
+    Examples:
+        >>> departures_by_stop = read_departures_by_stop(stop_times_file, './anaheim')
+    """
+    import gtfs_loader
+    from dict_builder import dict_builder_functions
+    try:
+        departures_by_stop = gtfs_loader.load_departures_by_stop(NETWORK_NAME)
+    except FileNotFoundError:
+        departures_by_stop = dict_builder_functions.build_save_departures_by_stop(stop_times_file, NETWORK_NAME)
+    return departures_by_stop
+
+
+def read_min_time_graph(stoptimes_dict: dict, footpath_dict: dict, NETWORK_NAME: str) -> dict:
+    """
+    Reads the reversed minimum-travel-time stop graph used for lower-bound pruning. If it is not present, it is built using dict_builder_functions.
+
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        NETWORK_NAME (str): GTFS path
+
+    Returns:
+        min_time_graph (dict): keys: to stop_id, values: list of tuples of form (from stop id, minimum travel time in seconds). Format-> dict[stop_id]=[(stop_id, seconds)]
+
+    Examples:
+        >>> min_time_graph = read_min_time_graph(stoptimes_dict, footpath_dict, './anaheim')
+    """
+    import gtfs_loader
+    from dict_builder import dict_builder_functions
+    try:
+        min_time_graph = gtfs_loader.load_min_time_graph(NETWORK_NAME)
+    except FileNotFoundError:
+        min_time_graph = dict_builder_functions.build_save_min_time_graph(stoptimes_dict, footpath_dict, NETWORK_NAME)
+    return min_time_graph
+
+
+def read_dense_network(stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, routes_by_stop_dict: dict, NETWORK_NAME: str) -> dict:
+    """
+    Reads the dense-index network used by the vectorized RAPTOR engines. If it is not present, it is built using dict_builder_functions.
+
+    Args:
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        NETWORK_NAME (str): GTFS path
+
+    Returns:
+        dense_network (dict): dense-index network (see build_save_dense_network).
+
+    Examples:
+        >>> dense_network = read_dense_network(stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, './anaheim')
+    """
+    import gtfs_loader
+    from dict_builder import dict_builder_functions
+    try:
+        dense_network = gtfs_loader.load_dense_network(NETWORK_NAME)
+    except FileNotFoundError:
+        dense_network = dict_builder_functions.build_save_dense_network(stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, NETWORK_NAME)
+    return dense_network
+
+
+def read_route_arc_flags(stops_file, dense_network: dict, NETWORK_NAME: str, no_of_cells: int, MAX_TRANSFER: int, CHANGE_TIME_SEC: int) -> tuple:
+    """
+    Reads the route arc-flags. If they are not present, they are built using dict_builder_functions.
+
+    Args:
+        stops_file (pandas.dataframe): dataframe with stop details.
+        dense_network (dict): dense-index network (see build_save_dense_network).
+        NETWORK_NAME (str): GTFS path
+        no_of_cells (int): number of cells.
+        MAX_TRANSFER (int): maximum transfer limit used while building the flags.
+        CHANGE_TIME_SEC (int): change-time in seconds used while building the flags.
+
+    Returns:
+        stop_cell (dict): Format {stop_id: cell id}.
+        arc_flags (dict): Format {cell id: set of route ids whose flag for the cell is set}.
+
+    Examples:
+        >>> stop_cell, arc_flags = read_route_arc_flags(stops_file, dense_network, './anaheim', 8, 4, 0)
+    """
+    import gtfs_loader
+    from dict_builder import dict_builder_functions
+    try:
+        stop_cell, arc_flags = gtfs_loader.load_route_arc_flags(NETWORK_NAME, no_of_cells)
+    except FileNotFoundError:
+        stop_cell, arc_flags = dict_builder_functions.build_save_route_arc_flags(stops_file, dense_network, NETWORK_NAME, no_of_cells, MAX_TRANSFER, CHANGE_TIME_SEC)
+    return stop_cell, arc_flags
+
+
 def print_logo() -> None:
     """
     Prints the logo
@@ -142,11 +245,21 @@ def read_partitions(stop_times_file, NETWORK_NAME: str, no_of_partitions: int, w
 
     Returns:
         stop_out (dict) : key: stop-id (int), value: stop-cell id (int). Note: if stop-cell id of -1 denotes cut stop.
-        route_groups (dict): key: tuple of all possible combinations of stop cell id, value: set of route ids belonging to the stop cell combination
+        route_groups (dict): bitsets of the routes in every partition (see build_partition_masks).
         cut_trips (set): set of trip ids that are part of fill-in.
-        trip_groups (dict): key: tuple of all possible combinations of stop cell id, value: set of trip ids belonging to the stop cell combination
+        trip_groups (dict): bitsets of the trips in every partition (see build_partition_masks).
     """
-    import itertools
+    partition_path = './partitions' if partitioning_algorithm == "hmetis" else './kpartitions'
+    masks_file = f'{partition_path}/{NETWORK_NAME}/partition_masks_{weighting_scheme}_{no_of_partitions}.pkl'
+    masks_key = get_partition_key([f'{partition_path}/{NETWORK_NAME}/{name}_{weighting_scheme}_{no_of_partitions}.csv'
+                                   for name in ['routeout', 'cutstops', 'fill_ins']], stop_times_file)
+    try:
+        with open(masks_file, 'rb') as file:
+            saved_key, partition_data = pickle.load(file)
+        if saved_key == masks_key:
+            return partition_data
+    except (FileNotFoundError, ValueError):
+        pass
     if partitioning_algorithm == "hmetis":
         route_out = pd.read_csv(f'./partitions/{NETWORK_NAME}/routeout_{weighting_scheme}_{no_of_partitions}.csv',
                                 usecols=['path_id', 'group']).groupby('group')
@@ -170,21 +283,11 @@ def read_partitions(stop_times_file, NETWORK_NAME: str, no_of_partitions: int, w
         route_partitions[g_id] = set((rotes['path_id']))
         trip_partitions[g_id] = set(stop_times_file[stop_times_file.route_id.isin(route_partitions[g_id])].trip_id)
     trip_partitions[-1] = set(fill_ins['trips'])
-    grups = list(itertools.combinations(trip_partitions.keys(), 2))
-    trip_groups = {}
-    for group in grups:
-        trip_groups[tuple(sorted(group))] = trip_partitions[group[0]].union(trip_partitions[group[1]]).union(
-            trip_partitions[-1])
-    for x in trip_partitions.keys():
-        trip_groups[(x, x)] = trip_partitions[x].union(trip_partitions[-1])
     route_partitions[-1] = set(fill_ins['routes'])
-    route_partitions[-1].remove(-1)
-    route_groups = {}
-    for group in grups:
-        route_groups[tuple(sorted(group))] = route_partitions[group[0]].union(route_partitions[group[1]]).union(
-            route_partitions[-1])
-    for x in route_partitions.keys():
-        route_groups[(x, x)] = route_partitions[x].union(route_partitions[-1])
+    route_partitions[-1].discard(-1)
+    route_groups, trip_groups = build_partition_masks(stop_times_file, route_partitions, trip_partitions)
+    with open(masks_file, 'wb') as pickle_file:
+        pickle.dump((masks_key, (stop_out, route_groups, cut_trips, trip_groups)), pickle_file)
     print(f"fill-in trips: {len(cut_trips)} ({round(len(cut_trips) / len(set(stop_times_file.trip_id)) * 100, 2)}%)")
     print(
         f'fill-in routes: {len(set(fill_ins.routes)) - 1} ({round((len(set(fill_ins.routes)) - 1) / len(set(stop_times_file.route_id)) * 100, 2)}%)')
@@ -204,14 +307,23 @@ def read_nested_partitions(stop_times_file, NETWORK_NAME: str, no_of_partitions:
 
     Returns:
         stop_out (dict) : key: stop-id (int), value: stop-cell id (int). Note: if stop-cell id of -1 denotes cut stop.
-        route_groups (dict): key: tuple of all possible combinations of stop cell id, value: set of route ids belonging to the stop cell combination
+        route_groups (dict): bitsets of the routes in every partition (see build_partition_masks).
         cut_trips (set): set of trip ids that are part of fill-in.
-        trip_groups (dict): key: tuple of all possible combinations of stop cell id, value: set of trip ids belonging to the stop cell combination
+        trip_groups (dict): bitsets of the trips in every partition (see build_partition_masks).
     """
+    masks_file = f'./kpartitions/{NETWORK_NAME}/nested/nested_partition_masks_{weighting_scheme}_{no_of_partitions}.pkl'
+    masks_key = get_partition_key([f'./kpartitions/{NETWORK_NAME}/nested/nested_{name}_{weighting_scheme}_{no_of_partitions}.csv'
+                                   for name in ['route_out', 'cutstops', 'fill_ins']], stop_times_file)
+    try:
+        with open(masks_file, 'rb') as file:
+            saved_key, partition_data = pickle.load(file)
+        if saved_key == masks_key:
+            return partition_data
+    except (FileNotFoundError, ValueError):
+        pass
     import warnings
     from pandas.core.common import SettingWithCopyWarning
     warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
-    import itertools
     main_partitions = no_of_partitions
     route_out = pd.read_csv(f'./kpartitions/{NETWORK_NAME}/nested/nested_route_out_{weighting_scheme}_{main_partitions}.csv')
     stop_out = pd.read_csv(f'./kpartitions/{NETWORK_NAME}/nested/nested_cutstops_{weighting_scheme}_{main_partitions}.csv')
@@ -236,28 +348,70 @@ def read_nested_partitions(stop_times_file, NETWORK_NAME: str, no_of_partitions:
         route_partitions[g_id] = set((rotes['path_id']))
         trip_partitions[g_id] = set(stop_times_file[stop_times_file.route_id.isin(route_partitions[g_id])].trip_id)
     trip_partitions[-1] = set(fill_ins['trips'])
-    grups = list(itertools.combinations(trip_partitions.keys(), 2))
-    trip_groups = {}
-    for group in grups:
-        trip_groups[tuple(sorted(group))] = trip_partitions[group[0]].union(trip_partitions[group[1]]).union(
-            trip_partitions[-1])
-    for x in trip_partitions.keys():
-        trip_groups[(x, x)] = trip_partitions[x].union(trip_partitions[-1])
-
     route_partitions[-1] = set(fill_ins['routes'])
-    route_partitions[-1].remove(-1)
-    grups = list(itertools.combinations(route_partitions.keys(), 2))
-    route_groups = {}
-    for group in grups:
-        route_groups[tuple(sorted(group))] = route_partitions[group[0]].union(route_partitions[group[1]]).union(
-            route_partitions[-1])
-    for x in route_partitions.keys():
-        route_groups[(x, x)] = route_partitions[x].union(route_partitions[-1])
+    route_partitions[-1].discard(-1)
+    route_groups, trip_groups = build_partition_masks(stop_times_file, route_partitions, trip_partitions)
 
     cut_trips = set(fill_ins['trips'])
+    with open(masks_file, 'wb') as pickle_file:
+        pickle.dump((masks_key, (stop_out, route_groups, cut_trips, trip_groups)), pickle_file)
     return stop_out, route_groups, cut_trips, trip_groups
 
 
+def get_partition_key(partition_files: list, stop_times_file) -> tuple:
+    """
+    Key of the saved partition bitsets. The bitsets are rebuilt when a partition file or the number of trips changes.
+
+    Args:
+        partition_files (list): paths of the partition files the bitsets are built from.
+        stop_times_file (pandas.dataframe): dataframe with stoptimes details
+
+    Returns:
+        masks_key (tuple): Format ((file path, modification time, size) of every partition file, number of trips)
+    """
+    file_stats = tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in partition_files)
+    return file_stats, stop_times_file.trip_id.nunique()
+
+
+def build_partition_masks(stop_times_file, route_partitions: dict, trip_partitions: dict) -> tuple:
+    """
+    Encodes partition membership as bitsets (one row per partition, packed with np.packbits). Routes are indexed by route id
+    and trips by a dense trip index (trip_offset[route id] + trip index). The routes/trips of a stop-cell pair (a, b) are
+    rows a, b and -1 (fill-in) OR-ed together (see get_partition_mask), so memory grows linearly with the number of partitions
+    (plus at most PARTITION_MASK_CACHE_SIZE unpacked pair masks cached by get_partition_mask).
+
+    Args:
+        stop_times_file (pandas.dataframe): dataframe with stoptimes details
+        route_partitions (dict): key: partition id (-1 for fill-in), value: set of route ids in the partition.
+        trip_partitions (dict): key: partition id (-1 for fill-in), value: set of trip ids in the partition.
+
+    Returns:
+        route_groups (dict): Format {"rows": {partition id: row}, "masks": np.ndarray of packed bits by [row, route id], "size": number of route ids}
+        trip_groups (dict): Format {"rows": {partition id: row}, "masks": np.ndarray of packed bits by [row, dense trip index],
+        "size": number of dense trip indices, "offset": np.ndarray of first dense trip index by route id}
+    """
+    trips_by_route = defaultdict(lambda: 0)
+    for trip in stop_times_file.trip_id.unique():
+        route, t_idx = [int(x) for x in trip.split("_")]
+        trips_by_route[route] = max(trips_by_route[route], t_idx + 1)
+    no_of_routes = max(max(trips_by_route.keys()), max([max(routes, default=0) for routes in route_partitions.values()])) + 1
+    trip_offset = np.zeros(no_of_routes + 1, dtype=np.int64)
+    for route, no_of_trips in trips_by_route.items():
+        trip_offset[route + 1] = no_of_trips
+    trip_offset = np.cumsum(trip_offset)
+
+    rows = {g_id: row for row, g_id in enumerate(sorted(route_partitions.keys()))}
+    route_masks = np.zeros((len(rows), no_of_routes), dtype=bool)
+    trip_masks = np.zeros((len(rows), int(trip_offset[-1])), dtype=bool)
+    for g_id, row in rows.items():
+        route_masks[row, list(route_partitions[g_id])] = True
+        trip_idx = [[int(x) for x in trip.split("_")] for trip in trip_partitions.get(g_id, set()) if isinstance(trip, str)]
+        trip_masks[row, [trip_offset[route] + t_idx for route, t_idx in trip_idx if t_idx < trips_by_route.get(route, 0)]] = True
+    route_groups = {"rows": rows, "masks": np.packbits(route_masks, axis=1), "size": no_of_routes}
+    trip_groups = {"rows": rows, "masks": np.packbits(trip_masks, axis=1), "size": int(trip_offset[-1]), "offset": trip_offset}
+    return route_groups, trip_groups
+
+
 def check_nonoverlap(stoptimes_dict: dict, stops_dict: dict) -> set:
     '''
     Check for non overlapping trips in stoptimes_dict. If found, it reduces the timestamp of the earlier trip by 1 second.
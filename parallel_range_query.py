@@ -0,0 +1,189 @@
+"""
+Module contains the parallel range mode of rRAPTOR, rTBTR and One-To-Many rTBTR. The departures of the query are split
+into contiguous blocks, every block is solved in a separate process (with its own labels and R_t) and the per-block
+profiles are merged with a pareto filter.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from inspect import signature
+from multiprocessing import Pool
+
+from RAPTOR.raptor_functions import get_departures
+
+
+def get_departure_blocks(departures_by_stop: dict, SOURCE: int, WALKING_FROM_SOURCE: int, footpath_dict: dict, NO_OF_BLOCKS: int,
+                         window_start=None, window_end=None) -> list:
+    '''
+    Splits the departure times of a range query into contiguous blocks. Departures with the same departure time are
+    always put in the same block.
+
+    Args:
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+        SOURCE (int): stop id of source stop.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means departures from stops walkable from SOURCE are also collected.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        NO_OF_BLOCKS (int): number of blocks.
+        window_start (pandas.datetime): optional. Earliest departure time to be considered.
+        window_end (pandas.datetime): optional. Latest departure time to be considered.
+
+    Returns:
+        blocks (list): blocks sorted by decreasing departure time (latest block first). Format [(block start, block end)]
+
+    Examples:
+        >>> output = get_departure_blocks(departures_by_stop, 36, 1, footpath_dict, 8)
+    '''
+    d_time_list, _ = get_departures(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, window_start, window_end)
+    departure_times = sorted(set([dep_details[1] for dep_details in d_time_list]), reverse=True)
+    block_size = max(-(-len(departure_times) // max(NO_OF_BLOCKS, 1)), 1)
+    return [(departure_times[min(x + block_size, len(departure_times)) - 1], departure_times[x]) for x in range(0, len(departure_times), block_size)]
+
+
+def get_block_departures(departures_by_stop: dict, SOURCE: int, WALKING_FROM_SOURCE: int, footpath_dict: dict, block_start, block_end,
+                         SEEDING: int) -> dict:
+    '''
+    Restricts the departure index to the stops and departure times needed for one block, so that only a small dict is
+    sent to the worker process.
+
+    Args:
+        departures_by_stop (dict): preprocessed dict. Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+        SOURCE (int): stop id of source stop.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 means walking from SOURCE is allowed.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        block_start (pandas.datetime): earliest departure time of the block.
+        block_end (pandas.datetime): latest departure time of the block.
+        SEEDING (int): 1 or 0. 1 means the first departure after the block is kept (window edge of the block).
+
+    Returns:
+        block_departures (dict): Format {stop_id: ([departure time], [(trip id, departure time, stop index)])}.
+    '''
+    stops = [SOURCE]
+    if WALKING_FROM_SOURCE == 1:
+        stops.extend([connection[0] for connection in footpath_dict.get(SOURCE, [])])
+    block_departures = {}
+    for stop in stops:
+        try:
+            departure_times, departures = departures_by_stop[stop]
+        except KeyError:
+            continue
+        first = bisect_left(departure_times, block_start)
+        last = bisect_right(departure_times, block_end) + SEEDING
+        block_departures[stop] = (departure_times[first:last], departures[first:last])
+    return block_departures
+
+
+def pareto_filter_profiles(block_profiles: list, blocks: list) -> list:
+    '''
+    Merges the profiles of the departure blocks. A journey is dropped if a journey from a later block reaches the same
+    destination no later and with at most as many trips. Journeys departing after their block (window edge) are only
+    used for dominance, except in the latest block, whose window edge is the window edge of the query (the sequential
+    query reports these journeys too).
+
+    Args:
+        block_profiles (list): profiles of the blocks, latest block first. Format [[(departure time, destination, round, arrival time, [trip ids])]]
+        blocks (list): blocks sorted by decreasing departure time. Format [(block start, block end)]
+
+    Returns:
+        profile (list): pareto-optimal journeys. Format [(departure time, destination, round, arrival time, [trip ids])]
+
+    Examples:
+        >>> output = pareto_filter_profiles([[(d_time_2, 52, 1, arrival_2, ['5_1'])], [(d_time_1, 52, 2, arrival_1, ['3_2', '5_1'])]], blocks)
+    '''
+    best_arrival = defaultdict(lambda: {})  # Format {destination: {round: earliest arrival in the later blocks}}
+    profile = []
+    for block_no, ((_, block_end), block_profile) in enumerate(zip(blocks, block_profiles)):
+        kept = [record for record in block_profile
+                if all(record[3] < arrival_time for x, arrival_time in best_arrival[record[1]].items() if x <= record[2])]
+        for record in kept:
+            best_arrival[record[1]][record[2]] = min(best_arrival[record[1]].get(record[2], record[3]), record[3])
+        profile.extend([record for record in kept if block_no == 0 or record[0] <= block_end])
+    return profile
+
+
+_block_query = {}  # Query shared by the worker processes. Format {"range_algorithm": function, "arguments": dict}
+
+
+def _init_block_worker(range_algorithm, arguments: dict) -> None:
+    '''
+    Stores the query in the worker process, so that the network dicts are sent once per worker and not once per block.
+    arguments does not contain departures_by_stop (every block gets its own departures, see get_block_departures).
+    '''
+    _block_query["range_algorithm"], _block_query["arguments"] = range_algorithm, arguments
+
+
+def _range_block(block_start, block_end, block_departures: dict) -> list:
+    '''
+    Solves one departure block. Runs in the worker process.
+    '''
+    return _block_query["range_algorithm"](**{**_block_query["arguments"], "window_start": block_start, "window_end": block_end,
+                                              "departures_by_stop": block_departures})
+
+
+def parallel_range_query(range_algorithm, query_args: tuple, NO_OF_BLOCKS: int, CORES: int, SEEDING: int = 1, **query_kwargs) -> list:
+    '''
+    Parallel range mode. The departures of the query are split into NO_OF_BLOCKS contiguous blocks which are solved in a
+    process pool. Every block uses its own labels (J) and R_t.
+        SEEDING==1 (latest-first): every block is seeded from the first departure after the block, exactly as a window
+        edge. Block results are then dominated only by journeys from the same block, and the merged result equals the
+        sequential query (including the window-edge journeys which the sequential query reports with PROFILE==1).
+        SEEDING==0: blocks are independent (no seeding work) and dominated journeys are removed by the pareto filter.
+        Journeys that the sequential query prunes through labels/R_t of later departures (rather than by dominance)
+        are kept, so the result can contain a few more journeys than the sequential query.
+
+    Args:
+        range_algorithm (function): rraptor, rtbtr or onetomany_rtbtr.
+        query_args (tuple): positional arguments of range_algorithm.
+        NO_OF_BLOCKS (int): number of departure blocks.
+        CORES (int): number of worker processes.
+        SEEDING (int): 1 or 0. 1 means latest-first seeding of the blocks.
+        **query_kwargs: keyword arguments of range_algorithm (e.g. window_start, window_end, MAX_DURATION, PROFILE).
+
+    Returns:
+        if PROFILE==1:
+            out (list): pareto-optimal journeys sorted by decreasing departure time. Format: [(departure time, destination, round, arrival time, [trip ids])]
+        elif OPTIMIZED==1:
+            out (list):  list of trips required to cover all optimal journeys Format: [trip_id]
+        elif OPTIMIZED==0:
+            out (list):  list of routes required to cover all optimal journeys. Format: [route_id]
+
+    Examples:
+        >>> output = parallel_range_query(rtbtr, (36, 52, departures_by_stop, 4, 1, 0, 1, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set), 8, 4)
+        >>> print(output)
+
+    See Also:
+        rRAPTOR, rTBTR, One-To-Many rTBTR
+    '''
+    arguments = signature(range_algorithm).bind(*query_args, **query_kwargs).arguments
+    SOURCE, departures_by_stop = arguments["SOURCE"], arguments["departures_by_stop"]
+    WALKING_FROM_SOURCE, footpath_dict = arguments["WALKING_FROM_SOURCE"], arguments["footpath_dict"]
+    PROFILE, OPTIMIZED = arguments.get("PROFILE", 0), arguments["OPTIMIZED"]
+    blocks = get_departure_blocks(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, NO_OF_BLOCKS,
+                                  arguments.get("window_start"), arguments.get("window_end"))
+    if blocks == [] and arguments.get("window_end") is not None:
+        # No departure inside the window. The window edge is still solved, as in the sequential query.
+        blocks = [(arguments["window_end"], arguments["window_end"])]
+
+    block_arguments = []
+    for x, (block_start, block_end) in enumerate(blocks):
+        # The latest block is always seeded from the departures after the query window.
+        block_departures = get_block_departures(departures_by_stop, SOURCE, WALKING_FROM_SOURCE, footpath_dict, block_start, block_end,
+                                                1 if x == 0 else SEEDING)
+        block_arguments.append((block_start, block_end, block_departures))
+    shared_arguments = {key: value for key, value in arguments.items() if key != "departures_by_stop"}
+    shared_arguments.update({"PRINT_ITINERARY": 0, "PROFILE": 1})
+    with Pool(CORES, initializer=_init_block_worker, initargs=(range_algorithm, shared_arguments)) as pool:
+        block_profiles = pool.starmap(_range_block, block_arguments)
+    profile = pareto_filter_profiles(block_profiles, blocks)
+    if PROFILE == 1:
+        return profile
+
+    # Trips are collected once per departure and destination (as in the sequential query). Window-edge journeys are not
+    # part of the window.
+    trips_by_departure = defaultdict(lambda: set())
+    for d_time, desti, _, _, trips in profile:
+        if d_time > blocks[0][1]:
+            continue
+        trips_by_departure[(d_time, desti)].update(trips)
+    out = [trip for trips in trips_by_departure.values() for trip in trips]
+    if OPTIMIZED == 0:
+        out = [int(trip.split("_")[0]) for trip in out]
+    return out
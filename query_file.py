@@ -3,7 +3,7 @@ Runs the query algorithm
 """
 
 from RAPTOR.hypraptor import hypraptor
-# from RAPTOR.one_to_many_rraptor import onetomany_rraptor
+from RAPTOR.one_to_many_rraptor import onetomany_rraptor
 from RAPTOR.rraptor import rraptor
 from RAPTOR.std_raptor import raptor
 from TBTR.hyptbtr import hyptbtr
@@ -54,19 +54,19 @@ def main() -> None:
                             routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
             print(f"Optimal arrival time are: {output}")
         elif variant == 1:
-            output = rraptor(SOURCE, DESTINATION, d_time_groups, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
+            output = rraptor(SOURCE, DESTINATION, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
                              OPTIMIZED, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
             if OPTIMIZED == 1:
                 print(f"Trips required to cover optimal journeys are {output}")
             else:
                 print(f"Routes required to cover optimal journeys are {output}")
         elif variant == 2:
-            pass
-            # output = onetomany_rraptor(SOURCE, DESTINATION_LIST, d_time_groups, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY, OPTIMIZED, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
-            # if OPTIMIZED == 1:
-            #     print(f"Trips required to cover optimal journeys are {output}")
-            # else:
-            #     print(f"Routes required to cover optimal journeys are {output}")
+            output = onetomany_rraptor(SOURCE, DESTINATION_LIST, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
+                                       OPTIMIZED, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
+            if OPTIMIZED == 1:
+                print(f"Trips required to cover optimal journeys are {output}")
+            else:
+                print(f"Routes required to cover optimal journeys are {output}")
         elif variant == 3:
             output = hypraptor(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
                                stop_out, route_groups, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict)
@@ -81,14 +81,14 @@ def main() -> None:
                           footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
             print(f"Optimal arrival times are: {output[0]}")
         elif variant == 1:
-            output = rtbtr(SOURCE, DESTINATION, d_time_groups, MAX_TRANSFER, WALKING_FROM_SOURCE, PRINT_ITINERARY, OPTIMIZED,
+            output = rtbtr(SOURCE, DESTINATION, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, PRINT_ITINERARY, OPTIMIZED,
                            routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict, trip_set)
             if OPTIMIZED == 1:
                 print(f"Trips required to cover optimal journeys are {output}")
             else:
                 print(f"Routes required to cover optimal journeys are {output}")
         elif variant == 2:
-            output = onetomany_rtbtr(SOURCE, DESTINATION_LIST, d_time_groups, MAX_TRANSFER, WALKING_FROM_SOURCE, PRINT_ITINERARY,
+            output = onetomany_rtbtr(SOURCE, DESTINATION_LIST, departures_by_stop, MAX_TRANSFER, WALKING_FROM_SOURCE, PRINT_ITINERARY,
                                      OPTIMIZED, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, trip_transfer_dict,
                                      trip_set)
             if OPTIMIZED == 1:
@@ -164,5 +164,5 @@ if __name__ == "__main__":
                                                                                                  weighting_scheme=WEIGHING_SCHEME)
 
     # main function
-    d_time_groups = stop_times_file.groupby("stop_id")
+    departures_by_stop = read_departures_by_stop(stop_times_file, NETWORK_NAME)
     main()
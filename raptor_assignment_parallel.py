@@ -1,8 +1,9 @@
 from multiprocessing import pool
-from miscellaneous_func import read_testcase
+from miscellaneous_func import read_testcase, read_dense_network
 from multiprocessing import Pool
 from time import time
 from RAPTOR.raptor_functions import *
+from RAPTOR.many_source_raptor import many_source_raptor
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
@@ -42,6 +43,8 @@ def raptor_dhanus_par(SOURCE: int, DESTINATION: int, D_TIME) -> list:
     marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
     change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
     (label[0][SOURCE], star_label[SOURCE]) = (D_TIME, D_TIME)
+    if MAX_DURATION is not None:
+        star_label[DESTINATION] = min(star_label[DESTINATION], D_TIME + pd.to_timedelta(MAX_DURATION, unit='seconds'))  # Travel-duration budget
     Q = {}  # Format of Q is {route:stop index}
     if WALKING_FROM_SOURCE == 1:
         try:
@@ -123,6 +126,21 @@ def raptor_dhanus_par(SOURCE: int, DESTINATION: int, D_TIME) -> list:
     return out
 
 
+def raptor_dhanus_batch(od_batch: list) -> list:
+    '''
+    Batched counterpart of raptor_dhanus_par. Runs all o-d pairs of od_batch together with many_source_raptor.
+
+    Args:
+        od_batch (list): list of (SOURCE, DESTINATION, D_TIME) tuples.
+
+    Returns:
+        out (list): one entry per o-d pair in the format of raptor_dhanus_par.
+    '''
+    SOURCE_LIST, DESTINATION_LIST, D_TIME_LIST = zip(*od_batch)
+    return many_source_raptor(SOURCE_LIST, DESTINATION_LIST, D_TIME_LIST, MAX_TRANSFER, WALKING_FROM_SOURCE,
+                              CHANGE_TIME_SEC, PRINT_ITINERARY, dense_network, MAX_DURATION)
+
+
 def generate_od_matrix_with_time(size: int) -> np.ndarray:
     """
     Generates random origin destination pairs
@@ -201,6 +219,39 @@ def get_available_options_par(od_mat: list) -> list:
     return pareto_journeys
 
 
+def get_available_options_batched(od_mat: list) -> list:
+    """
+    Same as get_available_options_par, but o-d pairs are sorted by departure
+    time and cut into batches of BATCH_SIZE (pairs in a batch share a
+    departure time bucket). Each batch is one many_source_raptor call.
+
+    Params:
+    od_mat (np.ndarray): each row is an origin destination pair.
+
+    Returns:
+    pareto_journeys (list): same as get_available_options_par, in the
+                            order of od_mat.
+    """
+    pareto_journeys = []
+    order = sorted(range(len(od_mat)), key=lambda i: od_mat[i][2])
+    od_batches = [[od_mat[i] for i in order[start: start + BATCH_SIZE]]
+                  for start in range(0, len(order), BATCH_SIZE)]
+
+    with Pool(CORES) as pool:
+        batch_outputs = pool.map(raptor_dhanus_batch, od_batches)
+
+    outputs = [None] * len(od_mat)
+    for i, output in zip(order, [output for batch in batch_outputs for output in batch]):
+        outputs[i] = output
+
+    for output in outputs:
+        if output[0] is not None:
+            choices = output[0]['journeys']
+            pareto_journeys.append(choices)
+
+    return pareto_journeys
+
+
 def _make_choice(util_list):
     """
     Picks the journey using the choice model, i.e, by
@@ -251,7 +302,10 @@ def get_optimal_choices(od_mat, beta):
     bT, bN = beta[0], beta[1]
 
     print("getting pareto optimal journeys")
-    list_of_pareto_journeys = get_available_options_par(od_mat)
+    if BATCHED == 1:
+        list_of_pareto_journeys = get_available_options_batched(od_mat)
+    else:
+        list_of_pareto_journeys = get_available_options_par(od_mat)
     selected_journeys = []
 
     print("making choice")
@@ -352,12 +406,16 @@ if __name__ == "__main__":
     WALKING_FROM_SOURCE = 0
     CHANGE_TIME_SEC = 0
     PRINT_ITINERARY = 0
+    MAX_DURATION = 7200  # journeys longer than 2 hours are not used by the choice model
     CORES = 4
+    BATCHED = 0
+    BATCH_SIZE = 32
 
     stops_file, trips_file, stop_times_file, transfers_file,\
         stops_dict, stoptimes_dict, footpath_dict,\
         routes_by_stop_dict, idx_by_route_stop_dict = \
         read_testcase(f'./{NETWORK_NAME}')
+    dense_network = read_dense_network(stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, NETWORK_NAME)
     # ## global variables ## #
 
     beta = [-0.1, -2]